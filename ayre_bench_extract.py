@@ -0,0 +1,116 @@
+"""Benchmark the HTML extractors on a corpus of saved pages.
+
+Usage:
+    python ayre_bench_extract.py [pages_dir] [--repeat N]
+
+pages_dir holds saved pages (*.html / *.htm). Without it, synthetic pages
+of ~100 KB, ~1 MB and ~4 MB are generated.
+"""
+import argparse
+import tempfile
+import time
+from difflib import SequenceMatcher
+from pathlib import Path
+
+from rich.console import Console
+from rich.table import Table
+
+from ayre_modules import ayre_config as config
+from ayre_modules.ayre_extract import available_parsers, extract_page
+from ayre_modules.ayre_web_handler import WebContentHandler
+
+console = Console()
+
+
+def synthetic_page(paragraphs):
+    """Blog-like page with nav, sidebar, comments and an article body"""
+    nav = "".join(f'<li><a href="/section/{i}">Section {i}</a></li>' for i in range(40))
+    sidebar = "".join(f'<div class="widget"><a href="/ad/{i}">Sponsored offer {i}</a></div>' for i in range(30))
+    body = "".join(
+        f"<p>Paragraph {i} of the article, with some commas, numbers like {i * 7}, "
+        f"and a <a href=\"/ref/{i}\">reference</a> to keep it realistic.</p>"
+        for i in range(paragraphs)
+    )
+    comments = "".join(f'<div class="comment"><p>Nice post #{i}!</p></div>' for i in range(paragraphs // 10))
+    return (
+        "<html><head><title>Synthetic page</title>"
+        '<meta name="description" content="Benchmark page"><style>p{color:red}</style></head>'
+        f'<body><header><nav><ul>{nav}</ul></nav></header><aside class="sidebar">{sidebar}</aside>'
+        f'<div id="main"><article class="post-content"><h1>Synthetic page</h1>{body}</article></div>'
+        f'<div class="comments">{comments}</div><footer>Footer text</footer>'
+        '<script>var tracking = "<p>not content</p>";</script></body></html>'
+    ).encode("utf-8")
+
+
+def load_corpus(pages_dir):
+    if pages_dir:
+        files = sorted(p for p in Path(pages_dir).iterdir() if p.suffix.lower() in (".html", ".htm"))
+        return [(p.name, p.read_bytes()) for p in files]
+    return [(f"synthetic-{n}p", synthetic_page(n)) for n in (500, 5000, 20000)]
+
+
+def best_time(func, repeat):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Ayre's HTML extractors")
+    parser.add_argument("pages_dir", nargs="?", help="directory of saved .html pages")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per page (best time is reported)")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.pages_dir)
+    if not corpus:
+        console.print("[red]❌ No .html files found[/red]")
+        return
+
+    with tempfile.TemporaryDirectory(prefix="ayre-bench-") as cache_dir:
+        # WebContentHandler opens the HTTP and summary caches; keep them out of the working directory
+        config.CACHE_DIR = cache_dir
+        run(corpus, WebContentHandler(console), args.repeat)
+
+
+def run(corpus, legacy, repeat):
+    parsers = available_parsers()
+
+    table = Table(title="HTML extraction benchmark (best of %d)" % repeat)
+    table.add_column("Page", style="cyan")
+    table.add_column("Size", justify="right")
+    table.add_column("bs4 (ms)", justify="right")
+    for name in parsers:
+        table.add_column(f"{name} (ms)", justify="right")
+        table.add_column("Speedup", justify="right", style="green")
+    table.add_column("Content overlap", justify="right")
+
+    totals = {"bs4": 0.0, **{name: 0.0 for name in parsers}}
+    for name, html in corpus:
+        url = f"https://example.com/{name}"
+        legacy_time, legacy_page = best_time(lambda: legacy.parse_page_bs4(html, url), repeat)
+        totals["bs4"] += legacy_time
+        row = [name, f"{len(html) / 1024:.0f} KB", f"{legacy_time * 1000:.1f}"]
+
+        page = None
+        for parser_name in parsers:
+            elapsed, page = best_time(lambda: extract_page(html, url, parser_name), repeat)
+            totals[parser_name] += elapsed
+            row += [f"{elapsed * 1000:.1f}", f"{legacy_time / elapsed:.1f}x"]
+
+        # How much of the legacy main content the new extractor also found
+        legacy_text = legacy_page["content"][:5000]
+        overlap = SequenceMatcher(None, legacy_text, page["content"][:5000], autojunk=False).ratio()
+        row.append(f"{overlap:.0%}")
+        table.add_row(*row)
+
+    console.print(table)
+    summary = ", ".join(f"{name}: {elapsed * 1000:.0f} ms" for name, elapsed in totals.items())
+    console.print(f"[bold]Total:[/bold] {summary}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,498 +1,777 @@
-import os
-import sys
-import re
-import webbrowser  # Add this import
-import dotenv
-import google.generativeai as genai
-from rich.console import Console
-from rich.markdown import Markdown
-from rich.panel import Panel
-from pyfiglet import Figlet
-from pathlib import Path
-import threading
-import queue
-from rich.table import Table
-
-from ayre_modules.ayre_file_handler import FileHandler
-from ayre_modules.ayre_gui import start_gui
-from ayre_modules.ayre_chat_manager import ChatManager
-from ayre_modules.ayre_web_handler import WebContentHandler
-
-File_uploads = False
-# Load environment variables
-dotenv.load_dotenv()
-
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-if not GEMINI_API_KEY:
-    raise RuntimeError("GEMINI_API_KEY not found in environment variables.")
-
-genai.configure(api_key=GEMINI_API_KEY)
-console = Console()
-
-# Global state
-file_queue = queue.Queue()
-gui_thread = None
-
-
-#non-func req
-def display_ans_file(filepath):
-    """Display ANSI art file"""
-    try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            ansi_content = f.read().replace("\\x1b", "\x1b").replace("\\e", "\x1b")
-            print(ansi_content)
-    except:
-        pass
-
-def print_header():
-    """Print stylized header"""
-    figlet = Figlet(font='slant')
-    header = figlet.renderText("AYRE")
-    from rich.text import Text
-    
-    text = Text()
-    for char in header:
-        if char in "_|":
-            text.append(char, style="#ff4b4b")
-        elif char in "/\\-":
-            text.append(char, style="#800000")
-        elif char.strip() == "":
-            text.append(char)
-        else:
-            text.append(char, style="#b22222")
-    
-    console.print(text)
-    console.print("[italic #ff4b4b]Your Resonant AI Companion (Gemini)[/italic #ff4b4b]\n")
-
-def print_tips():
-    """Print usage tips"""
-    tips = (
-        "[bold #ff4b4b]Welcome, Raven.[/bold #ff4b4b]\n"
-        "1. Ask questions about Armored Core, Ayre, or anything else.\n"
-        "2. [bold]Drag & drop[/bold] files into terminal or use [bold]gui[/bold] command\n"
-        "3. Commands: [bold]upload[/bold], [bold]analyze[/bold], [bold]context[/bold], [bold]gui[/bold]\n"
-        "4. Chat commands: [bold]chats[/bold], [bold]newchat[/bold], [bold]loadchat[/bold], [bold]deletechat[/bold], [bold]history[/bold]\n"
-        "5. Link commands: [bold]open <url>[/bold] or paste URLs directly to open them\n"
-        "6. Type [bold]help[/bold] for detailed command reference or [bold]exit[/bold] to leave the resonance."
-    )
-    console.print(Panel(tips, title="[bold #b22222]Getting Started[/bold #b22222]", border_style="#ff4b4b"))
-
-
-#func req
-
-# chat
-def chat_with_gemini(user_input, message_history):
-    """Chat with Gemini AI"""
-    prompt = ""
-    for msg in message_history:
-        if msg["role"] == "system":
-            prompt += f"{msg['content']}\n"
-        elif msg["role"] == "user":
-            prompt += f"Raven: {msg['content']}\n"
-        elif msg["role"] == "assistant":
-            prompt += f"Ayre: {msg['content']}\n"
-    prompt += f"Raven: {user_input}\nAyre:"
-
-    model = genai.GenerativeModel("gemini-2.5-flash")
-    response = model.generate_content(prompt)
-    reply = response.text.strip()
-    
-    message_history.append({"role": "user", "content": user_input})
-    message_history.append({"role": "assistant", "content": reply})
-    
-    # Check for links in the response
-    detect_and_open_links(reply)
-    
-    return reply
-
-# show help page
-def show_help():
-    """Display comprehensive help for all commands"""
-    console.print("\n")
-    console.print(Panel(
-        "[bold #ff4b4b]AYRE Command Reference[/bold #ff4b4b]\n[italic]Your guide to resonating with the AI companion[/italic]",
-        border_style="#ff4b4b"
-    ))
-    
-    # Chat Management Commands
-    chat_table = Table(title="💬 Chat Management", border_style="#ff4b4b")
-    chat_table.add_column("Command", style="#ffffff", no_wrap=True)
-    chat_table.add_column("Arguments", style="#00ff00")
-    chat_table.add_column("Description", style="#888888")
-    
-    chat_table.add_row("chats", "", "List all available chat sessions")
-    chat_table.add_row("newchat", "[name]", "Create new chat (optional custom name)")
-    chat_table.add_row("loadchat", "<name>", "Load an existing chat session")
-    chat_table.add_row("deletechat", "<name>", "Delete a chat (with confirmation)")
-    chat_table.add_row("history", "[limit]", "Show recent messages (default: 10)")
-    
-    console.print(chat_table)
-    console.print()
-    
-    # File Management Commands
-    file_table = Table(title="📁 File Management", border_style="#ff4b4b")
-    file_table.add_column("Command", style="#ffffff", no_wrap=True)
-    file_table.add_column("Arguments", style="#00ff00")
-    file_table.add_column("Description", style="#888888")
-    
-    file_table.add_row("upload", "<file_path>", "Upload and analyze a file")
-    file_table.add_row("analyze", "<file_path>", "Deep analysis of file content")
-    file_table.add_row("context", "<file_path>", "Add file to conversation context")
-    file_table.add_row("gui", "", "Open graphical file interface")
-    file_table.add_row("drag & drop", "file_path", "Drop files directly into terminal")
-    
-    console.print(file_table)
-    console.print()
-    
-    link_table = Table(title="🔗 Link Management", border_style="#ff4b4b")
-    link_table.add_column("Command", style="#ffffff", no_wrap=True)
-    link_table.add_column("Arguments", style="#00ff00")
-    link_table.add_column("Description", style="#888888")
-    
-    link_table.add_row("open", "<url>", "Open URL (option to analyze content)")
-    link_table.add_row("analyze", "<url> [question]", "Analyze web page content with AI")
-    link_table.add_row("https://...", "", "Auto-detect URLs (choose open/analyze)")
-    link_table.add_row("Auto-detect", "", "Links in responses are auto-detected")
-    
-    console.print(link_table)
-    console.print()
-    
-    # System Commands
-    system_table = Table(title="⚙️ System Commands", border_style="#ff4b4b")
-    system_table.add_column("Command", style="#ffffff", no_wrap=True)
-    system_table.add_column("Arguments", style="#00ff00")
-    system_table.add_column("Description", style="#888888")
-    
-    system_table.add_row("help", "", "Show this command reference")
-    system_table.add_row("exit", "", "Save and exit AYRE")
-    system_table.add_row("quit", "", "Save and exit AYRE")
-    
-    console.print(system_table)
-    console.print()
-    
-    # Usage Examples
-    examples = """[bold #ff4b4b]📝 Usage Examples:[/bold #ff4b4b]
-
-[bold green]Chat Management:[/bold green]
-• [cyan]newchat project_analysis[/cyan] - Create chat named "project_analysis"
-• [cyan]chats[/cyan] - List all chats
-• [cyan]loadchat project_analysis[/cyan] - Switch to that chat
-• [cyan]history 20[/cyan] - Show last 20 messages
-• [cyan]deletechat old_chat[/cyan] - Delete "old_chat"
-
-[bold green]File Operations:[/bold green]
-• [cyan]upload C:\\Users\\me\\document.pdf[/cyan] - Upload and analyze PDF
-• [cyan]analyze code.py[/cyan] - Deep analysis of Python file
-• [cyan]context data.json[/cyan] - Add JSON to conversation context
-• [cyan]gui[/cyan] - Open file browser interface
-
-[bold green]Web Analysis:[/bold green]
-• [cyan]analyze https://github.com/user/repo[/cyan] - Analyze GitHub repo page
-• [cyan]analyze https://docs.python.org What is asyncio?[/cyan] - Ask specific question
-• [cyan]https://stackoverflow.com/questions/123[/cyan] - Auto-detect and choose action
-• [cyan]open https://example.com[/cyan] - Open with option to analyze
-
-[bold green]General Usage:[/bold green]
-• Simply type questions: [cyan]"How does this code work?"[/cyan]
-• Drag files directly into the terminal window
-• Chat naturally - Ayre understands context from uploaded files
-• Web content is automatically integrated into conversation context"""
-    
-    console.print(Panel(examples, border_style="#888888"))
-    
-    # File Types
-    file_types = """[bold #ff4b4b]📋 Supported File Types:[/bold #ff4b4b]
-
-[bold green]Images:[/bold green] .jpg, .jpeg, .png, .gif, .webp, .bmp
-[bold green]Code:[/bold green] .py, .js, .html, .css, .cpp, .java, .c, .go, .rs
-[bold green]Documents:[/bold green] .pdf, .txt, .md, .doc, .docx
-[bold green]Data:[/bold green] .json, .xml, .csv, .yaml, .yml
-[bold green]Archives:[/bold green] .zip (contents will be analyzed)"""
-    
-    console.print(Panel(file_types, border_style="#888888"))
-
-def process_gui_queue(file_handler, message_history):
-    """Process files from GUI queue"""
-    try:
-        while not file_queue.empty():
-            action, file_path = file_queue.get_nowait()
-            if action == "process":
-                file_handler.process_file_auto(file_path, message_history)
-    except queue.Empty:
-        pass
-
-def detect_and_open_links(text):
-    """Detect and open links in text"""
-    # URL regex pattern
-    url_pattern = r'https?://(?:[-\w.])+(?:[:\d]+)?(?:/(?:[\w/_.])*(?:\?(?:[\w&=%.])*)?(?:#(?:\w)*)?)?'
-    
-    urls = re.findall(url_pattern, text, re.IGNORECASE)
-    
-    if urls:
-        console.print(f"[cyan]🔗 Found {len(urls)} link(s):[/cyan]")
-        for i, url in enumerate(urls, 1):
-            console.print(f"[cyan]{i}. {url}[/cyan]")
-        
-        if len(urls) == 1:
-            # Auto-open single link with confirmation
-            response = console.input(f"[yellow]Open this link? (y/N): [/yellow]")
-            if response.lower() == 'y':
-                try:
-                    webbrowser.open(urls[0])
-                    console.print(f"[green]✓ Opened: {urls[0]}[/green]")
-                except Exception as e:
-                    console.print(f"[red]❌ Failed to open link: {e}[/red]")
-        else:
-            # Multiple links - let user choose
-            response = console.input(f"[yellow]Open which link? (1-{len(urls)}, 'all', or Enter to skip): [/yellow]")
-            
-            if response.lower() == 'all':
-                for url in urls:
-                    try:
-                        webbrowser.open(url)
-                        console.print(f"[green]✓ Opened: {url}[/green]")
-                    except Exception as e:
-                        console.print(f"[red]❌ Failed to open {url}: {e}[/red]")
-            elif response.isdigit():
-                try:
-                    index = int(response) - 1
-                    if 0 <= index < len(urls):
-                        webbrowser.open(urls[index])
-                        console.print(f"[green]✓ Opened: {urls[index]}[/green]")
-                    else:
-                        console.print("[red]Invalid link number[/red]")
-                except Exception as e:
-                    console.print(f"[red]❌ Failed to open link: {e}[/red]")
-
-def open_link_command(url):
-    """Open a specific link via command"""
-    # Clean up the URL
-    url = url.strip()
-    
-    # Add protocol if missing
-    if not url.startswith(('http://', 'https://')):
-        url = 'https://' + url
-    
-    try:
-        webbrowser.open(url)
-        console.print(f"[green]✓ Opened: {url}[/green]")
-        return True
-    except Exception as e:
-        console.print(f"[red]❌ Failed to open link: {e}[/red]")
-        return False
-
-
-def analyze_web_content(url, user_question=None):
-    """Analyze web content with AI"""
-    web_handler = WebContentHandler(console)
-    model = genai.GenerativeModel("gemini-2.5-flash")
-    
-    # Get current message history from chat manager
-    # This is a simplified version - you might need to pass message_history as parameter
-    temp_history = []
-    
-    result = web_handler.analyze_url_with_ai(url, user_question, temp_history, model)
-    
-    if result:
-        console.print(Panel(Markdown(result), title="Web Content Analysis", border_style="cyan"))
-    
-    return result
-
-def handle_commands(user_input, file_handler, message_history, chat_manager):
-    """Handle special commands"""
-    global gui_thread
-    
-    cmd = user_input.strip().lower()
-    cmd_parts = user_input.strip().split()
-    
-    
-
-    # Help command
-    if cmd == "help":
-        show_help()
-        return True
-    # Web analysis commands
-    if cmd.startswith("analyze ") and any(user_input.strip().split()[1].startswith(proto) for proto in ['http://', 'https://']):
-        if len(cmd_parts) > 1:
-            url = cmd_parts[1]
-            question = " ".join(cmd_parts[2:]) if len(cmd_parts) > 2 else None
-            
-            web_handler = WebContentHandler(console)
-            model = genai.GenerativeModel("gemini-2.5-flash")
-            result = web_handler.analyze_url_with_ai(url, question, message_history, model)
-            
-            if result:
-                console.print(Panel(Markdown(result), title="Web Content Analysis", border_style="cyan"))
-        return True
-    
-    # Link commands with analysis option
-    if cmd.startswith("open "):
-        if len(cmd_parts) > 1:
-            url = " ".join(cmd_parts[1:])
-            
-            # Ask if user wants to analyze the content too
-            response = console.input("[yellow]Also analyze the content? (y/N): [/yellow]")
-            if response.lower() == 'y':
-                web_handler = WebContentHandler(console)
-                model = genai.GenerativeModel("gemini-2.5-flash")
-                web_handler.analyze_url_with_ai(url, None, message_history, model)
-            
-            open_link_command(url)
-        else:
-            console.print("[red]Usage: open <url>[/red]")
-        return True
-    
-    # Check if input looks like a URL
-    if re.match(r'https?://', user_input.strip(), re.IGNORECASE):
-        url = user_input.strip()
-        
-        # Ask what to do with the URL
-        console.print(f"[cyan]🔗 URL detected: {url}[/cyan]")
-        action = console.input("[yellow]Choose action - [O]pen, [A]nalyze, or [B]oth (O/A/B): [/yellow]").lower()
-        
-        if action == 'a':
-            web_handler = WebContentHandler(console)
-            model = genai.GenerativeModel("gemini-2.5-flash")
-            result = web_handler.analyze_url_with_ai(url, None, message_history, model)
-            if result:
-                console.print(Panel(Markdown(result), title="Web Content Analysis", border_style="cyan"))
-        elif action == 'b':
-            open_link_command(url)
-            web_handler = WebContentHandler(console)
-            model = genai.GenerativeModel("gemini-2.5-flash")
-            web_handler.analyze_url_with_ai(url, None, message_history, model)
-        else:  # Default to open
-            open_link_command(url)
-        
-        return True
-    
-    # Chat management commands
-    if cmd == "chats":
-        chat_manager.list_chats()
-        return True
-    
-    elif cmd == "newchat":
-        chat_name = None
-        if len(cmd_parts) > 1:
-            chat_name = " ".join(cmd_parts[1:])
-        new_history = chat_manager.create_new_chat(chat_name)
-        if new_history:
-            message_history.clear()
-            message_history.extend(new_history)
-        return True
-    
-    elif cmd.startswith("loadchat "):
-        if len(cmd_parts) > 1:
-            chat_name = " ".join(cmd_parts[1:])
-            loaded_history = chat_manager.load_chat(chat_name)
-            if loaded_history:
-                message_history.clear()
-                message_history.extend(loaded_history)
-        else:
-            console.print("[red]Usage: loadchat <chat_name>[/red]")
-        return True
-    
-    elif cmd.startswith("deletechat "):
-        if len(cmd_parts) > 1:
-            chat_name = " ".join(cmd_parts[1:])
-            delete_result = chat_manager.delete_chat(chat_name)
-            if delete_result == "load_latest":
-                # Deleted current chat, load the latest remaining one
-                new_history = chat_manager.load_latest_chat()
-                message_history.clear()
-                message_history.extend(new_history)
-        else:
-            console.print("[red]Usage: deletechat <chat_name>[/red]")
-        return True
-    
-    elif cmd == "history":
-        limit = 10
-        if len(cmd_parts) > 1:
-            try:
-                limit = int(cmd_parts[1])
-            except ValueError:
-                console.print("[red]Invalid number for history limit[/red]")
-                return True
-        chat_manager.show_chat_history(limit)
-        return True
-    
-    # GUI command
-    if cmd == "gui" and File_uploads:
-        if gui_thread is None or not gui_thread.is_alive():
-            console.print("[cyan]🖥️ Opening GUI interface...[/cyan]")
-            gui_thread = threading.Thread(target=start_gui, args=(file_queue,), daemon=True)
-            gui_thread.start()
-        else:
-            console.print("[yellow]GUI is already running![/yellow]")
-        return True
-    elif cmd == "gui":
-        console.print(f"[red]File upload is disabled.[/red]")
-        return True
-    
-    # File commands
-    if user_input.startswith(("upload ", "analyze ", "context ")):
-        return file_handler.handle_command(user_input, message_history)
-    
-    # Check for drag & drop
-    return file_handler.handle_file_input(user_input, message_history)
-
-def main():
-    # Initialize
-    display_ans_file("ayre_img.ans")
-    print_header()
-    print_tips()
-    console.print("")
-    
-    # Initialize chat manager
-    chat_manager = ChatManager(console)
-    
-    # Load the latest chat instead of creating new one
-    message_history = chat_manager.load_latest_chat()
-    file_handler = FileHandler(console)
-    
-    while True:
-        try:
-            # Process GUI files
-            process_gui_queue(file_handler, message_history)
-            
-            # Save current chat after each interaction
-            chat_manager.save_current_chat(message_history)
-            
-            user_input = console.input("[bold green]Raven >[/bold green] ")
-            
-            if user_input.strip().lower() in {"exit", "quit"}:
-                # Save before exiting
-                chat_manager.save_current_chat(message_history)
-                console.print("\n[bold red]Ayre's resonance fades. Until next time, Raven.[/bold red]")
-                break
-            
-            # Skip empty inputs
-            if not user_input.strip():
-                continue
-            
-            # Handle commands and files
-            if handle_commands(user_input, file_handler, message_history, chat_manager):
-                continue
-            
-            # Regular chat with improved error handling
-            try:
-                reply = chat_with_gemini(user_input, message_history)
-                if reply:
-                    console.print(Panel(Markdown(reply), title="Ayre", border_style="magenta"))
-                else:
-                    console.print("[yellow]⚠️ No response received. Please try again.[/yellow]")
-            except Exception as chat_error:
-                console.print(f"[red]❌ Chat error: {chat_error}[/red]")
-                console.print("[yellow]💡 Try checking your internet connection and API key[/yellow]")
-            
-        except KeyboardInterrupt:
-            # Save before exiting
-            chat_manager.save_current_chat(message_history)
-            console.print("\n[bold magenta]Ayre's resonance interrupted. Farewell, Raven.[/bold magenta]")
-            break
-        except Exception as e:
-            console.print(f"[red]Error: {e}[/red]")
-            console.print("[yellow]💡 The conversation continues...[/yellow]")
-
-if __name__ == "__main__":
-    main()
\ No newline at end of file
+import asyncio
+import functools
+import os
+import sys
+import re
+import webbrowser  # Add this import
+import dotenv
+import google.generativeai as genai
+from rich.console import Console
+from rich.markup import escape
+from rich.markdown import Markdown
+from rich.panel import Panel
+from pyfiglet import Figlet
+from pathlib import Path
+import threading
+import queue
+from rich.table import Table
+
+from ayre_modules.ayre_file_handler import FileHandler
+from ayre_modules.ayre_file_pool import FilePool, FileQueueConsumer
+from ayre_modules.ayre_gui import start_gui
+from ayre_modules.ayre_chat_manager import ChatManager
+from ayre_modules.ayre_web_handler import WebContentHandler
+from ayre_modules.ayre_crawler import SiteCrawler
+from ayre_modules.ayre_context_manager import ContextManager
+from ayre_modules.ayre_context_cache import ContextCache
+from ayre_modules.ayre_stream import stream_to_panel
+from ayre_modules.ayre_model_registry import get_model
+from ayre_modules.ayre_gemini_client import get_gemini_client
+from ayre_modules.ayre_response_cache import get_response_cache
+from ayre_modules.ayre_repl import Repl, ReplConsole, raise_if_cancelled
+from ayre_modules import ayre_config as config
+
+File_uploads = False
+STREAM_REPLIES = config.STREAM_REPLIES
+# Load environment variables
+dotenv.load_dotenv()
+
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+if not GEMINI_API_KEY:
+    raise RuntimeError("GEMINI_API_KEY not found in environment variables.")
+
+genai.configure(api_key=GEMINI_API_KEY)
+# Prompts (console.input) go through the REPL's single input reader
+console = ReplConsole()
+
+# Global state
+file_queue = queue.Queue()
+# Processing status sent back to the GUI window
+status_queue = queue.Queue()
+gui_thread = None
+
+
+#non-func req
+def display_ans_file(filepath):
+    """Display ANSI art file"""
+    try:
+        with open(filepath, 'r', encoding='utf-8') as f:
+            ansi_content = f.read().replace("\\x1b", "\x1b").replace("\\e", "\x1b")
+            print(ansi_content)
+    except:
+        pass
+
+def print_header():
+    """Print stylized header"""
+    figlet = Figlet(font='slant')
+    header = figlet.renderText("AYRE")
+    from rich.text import Text
+    
+    text = Text()
+    for char in header:
+        if char in "_|":
+            text.append(char, style="#ff4b4b")
+        elif char in "/\\-":
+            text.append(char, style="#800000")
+        elif char.strip() == "":
+            text.append(char)
+        else:
+            text.append(char, style="#b22222")
+    
+    console.print(text)
+    console.print("[italic #ff4b4b]Your Resonant AI Companion (Gemini)[/italic #ff4b4b]\n")
+
+def print_tips():
+    """Print usage tips"""
+    tips = (
+        "[bold #ff4b4b]Welcome, Raven.[/bold #ff4b4b]\n"
+        "1. Ask questions about Armored Core, Ayre, or anything else.\n"
+        "2. [bold]Drag & drop[/bold] files into terminal or use [bold]gui[/bold] command\n"
+        "3. Commands: [bold]upload[/bold], [bold]analyze[/bold], [bold]context[/bold], [bold]gui[/bold]\n"
+        "4. Chat commands: [bold]chats[/bold], [bold]newchat[/bold], [bold]loadchat[/bold], [bold]deletechat[/bold], [bold]history[/bold]\n"
+        "5. Link commands: [bold]open <url>[/bold] or paste URLs directly to open them\n"
+        "6. Type [bold]help[/bold] for detailed command reference or [bold]exit[/bold] to leave the resonance."
+    )
+    console.print(Panel(tips, title="[bold #b22222]Getting Started[/bold #b22222]", border_style="#ff4b4b"))
+
+
+#func req
+
+# chat
+def chat_with_gemini(user_input, message_history, context, stream=False, context_state=None):
+    """Chat with Gemini AI (streamed replies are rendered live as they arrive)"""
+    # Persona goes in system_instruction (or a cached prefix); turns are sent as role-tagged
+    # contents kept within the token budget, with older turns folded into a summary
+    model, contents = context.build_request(message_history, user_input, context_state)
+
+    if stream:
+        response = get_gemini_client().generate(model, contents, stream=True, call="chat")
+        reply = stream_to_panel(console, response, title="Ayre", border_style="magenta")
+    else:
+        response = get_gemini_client().generate(model, contents, call="chat")
+        reply = response.text.strip()
+    
+    # A reply that arrives after Ctrl-C is dropped
+    raise_if_cancelled()
+    message_history.append({"role": "user", "content": user_input})
+    message_history.append({"role": "assistant", "content": reply})
+    
+    # Check for links in the response
+    detect_and_open_links(reply)
+    
+    return reply
+
+# show help page
+def show_help():
+    """Display comprehensive help for all commands"""
+    console.print("\n")
+    console.print(Panel(
+        "[bold #ff4b4b]AYRE Command Reference[/bold #ff4b4b]\n[italic]Your guide to resonating with the AI companion[/italic]",
+        border_style="#ff4b4b"
+    ))
+    
+    # Chat Management Commands
+    chat_table = Table(title="💬 Chat Management", border_style="#ff4b4b")
+    chat_table.add_column("Command", style="#ffffff", no_wrap=True)
+    chat_table.add_column("Arguments", style="#00ff00")
+    chat_table.add_column("Description", style="#888888")
+    
+    chat_table.add_row("chats", "", "List all available chat sessions")
+    chat_table.add_row("newchat", "[name]", "Create new chat (optional custom name)")
+    chat_table.add_row("loadchat", "<name>", "Load an existing chat session")
+    chat_table.add_row("deletechat", "<name>", "Delete a chat (with confirmation)")
+    chat_table.add_row("history", "\\[limit] [--page]", "Show recent messages (default: 10); --page goes further back")
+    chat_table.add_row("search", "<query> [--chat name]", "Full-text search across chats (sqlite backend)")
+    
+    console.print(chat_table)
+    console.print()
+    
+    # File Management Commands
+    file_table = Table(title="📁 File Management", border_style="#ff4b4b")
+    file_table.add_column("Command", style="#ffffff", no_wrap=True)
+    file_table.add_column("Arguments", style="#00ff00")
+    file_table.add_column("Description", style="#888888")
+    
+    file_table.add_row("upload", "<file_path>", "Upload and analyze a file")
+    file_table.add_row("analyze", "<file_path> [--fresh]", "Deep analysis of file content (--fresh skips the response cache)")
+    file_table.add_row("context", "<file_path>", "Add file to conversation context")
+    file_table.add_row("contextdir", "<dir_path>", "Index a codebase; relevant code joins each question")
+    file_table.add_row("gui", "", "Open graphical file interface")
+    file_table.add_row("drag & drop", "file_path", "Drop files directly into terminal")
+    file_table.add_row("files", "", "List cached uploads (reused until they expire)")
+    file_table.add_row("files evict", "<#|name|all>", "Forget cached uploads and delete them remotely")
+    
+    console.print(file_table)
+    console.print()
+    
+    link_table = Table(title="🔗 Link Management", border_style="#ff4b4b")
+    link_table.add_column("Command", style="#ffffff", no_wrap=True)
+    link_table.add_column("Arguments", style="#00ff00")
+    link_table.add_column("Description", style="#888888")
+    
+    link_table.add_row("open", "<url>", "Open URL (option to analyze content)")
+    link_table.add_row("analyze", "<url> [question]", "Analyze web page content with AI")
+    link_table.add_row("analyze", "<url1> <url2> ... [--fresh] [-- question]", "Fetch pages in parallel and compare them")
+    link_table.add_row("crawl", "<url> [--depth N] [--max-pages M] [-- question]", "Crawl a site and digest its pages")
+    link_table.add_row("https://...", "", "Auto-detect URLs (choose open/analyze)")
+    link_table.add_row("Auto-detect", "", "Links in responses are auto-detected")
+    
+    console.print(link_table)
+    console.print()
+    
+    # System Commands
+    system_table = Table(title="⚙️ System Commands", border_style="#ff4b4b")
+    system_table.add_column("Command", style="#ffffff", no_wrap=True)
+    system_table.add_column("Arguments", style="#00ff00")
+    system_table.add_column("Description", style="#888888")
+    
+    system_table.add_row("help", "", "Show this command reference")
+    system_table.add_row("sync", "", "Write pending chat changes to disk now")
+    system_table.add_row("jobs", "", "List background jobs (web analysis, crawls, file analysis)")
+    system_table.add_row("cancel", "<job #>", "Cancel a background job (Ctrl-C cancels the current request)")
+    system_table.add_row("cache", "[clear]", "Response cache hits/misses (AYRE_RESPONSE_CACHE=1), or empty it")
+    system_table.add_row("calls", "", "Gemini call attempts, retries, latency and circuit breaker state")
+    system_table.add_row("exit", "", "Save and exit AYRE")
+    system_table.add_row("quit", "", "Save and exit AYRE")
+    
+    console.print(system_table)
+    console.print()
+    
+    # Usage Examples
+    examples = """[bold #ff4b4b]📝 Usage Examples:[/bold #ff4b4b]
+
+[bold green]Chat Management:[/bold green]
+• [cyan]newchat project_analysis[/cyan] - Create chat named "project_analysis"
+• [cyan]chats[/cyan] - List all chats
+• [cyan]loadchat project_analysis[/cyan] - Switch to that chat
+• [cyan]history 20[/cyan] - Show last 20 messages
+• [cyan]history --page[/cyan] - Show the 10 messages before those
+• [cyan]deletechat old_chat[/cyan] - Delete "old_chat"
+• [cyan]search coral resonance --chat lore[/cyan] - Find messages in "lore"
+
+[bold green]File Operations:[/bold green]
+• [cyan]upload C:\\Users\\me\\document.pdf[/cyan] - Upload and analyze PDF
+• [cyan]analyze code.py[/cyan] - Deep analysis of Python file
+• [cyan]context data.json[/cyan] - Add JSON to conversation context
+• [cyan]contextdir ./src[/cyan] - Chat about a whole codebase
+• [cyan]gui[/cyan] - Open file browser interface
+
+[bold green]Web Analysis:[/bold green]
+• [cyan]analyze https://github.com/user/repo[/cyan] - Analyze GitHub repo page
+• [cyan]analyze https://docs.python.org What is asyncio?[/cyan] - Ask specific question
+• [cyan]analyze https://a.com https://b.com -- Which is cheaper?[/cyan] - Compare several pages
+• [cyan]crawl https://docs.example.com --depth 2 --max-pages 30[/cyan] - Digest a docs site
+• [cyan]https://stackoverflow.com/questions/123[/cyan] - Auto-detect and choose action
+• [cyan]open https://example.com[/cyan] - Open with option to analyze
+
+[bold green]General Usage:[/bold green]
+• Simply type questions: [cyan]"How does this code work?"[/cyan]
+• Drag files directly into the terminal window
+• Chat naturally - Ayre understands context from uploaded files
+• Web content is automatically integrated into conversation context"""
+    
+    console.print(Panel(examples, border_style="#888888"))
+    
+    # File Types
+    file_types = """[bold #ff4b4b]📋 Supported File Types:[/bold #ff4b4b]
+
+[bold green]Images:[/bold green] .jpg, .jpeg, .png, .gif, .webp, .bmp
+[bold green]Code:[/bold green] .py, .js, .html, .css, .cpp, .java, .c, .go, .rs
+[bold green]Documents:[/bold green] .pdf, .txt, .md, .doc, .docx
+[bold green]Data:[/bold green] .json, .xml, .csv, .yaml, .yml
+[bold green]Archives:[/bold green] .zip (contents will be analyzed)"""
+    
+    console.print(Panel(file_types, border_style="#888888"))
+
+def detect_and_open_links(text):
+    """Detect and open links in text"""
+    # URL regex pattern
+    url_pattern = r'https?://(?:[-\w.])+(?:[:\d]+)?(?:/(?:[\w/_.])*(?:\?(?:[\w&=%.])*)?(?:#(?:\w)*)?)?'
+    
+    urls = re.findall(url_pattern, text, re.IGNORECASE)
+    
+    if urls:
+        console.print(f"[cyan]🔗 Found {len(urls)} link(s):[/cyan]")
+        for i, url in enumerate(urls, 1):
+            console.print(f"[cyan]{i}. {url}[/cyan]")
+        
+        if len(urls) == 1:
+            # Auto-open single link with confirmation
+            response = console.input(f"[yellow]Open this link? (y/N): [/yellow]")
+            if response.lower() == 'y':
+                try:
+                    webbrowser.open(urls[0])
+                    console.print(f"[green]✓ Opened: {urls[0]}[/green]")
+                except Exception as e:
+                    console.print(f"[red]❌ Failed to open link: {e}[/red]")
+        else:
+            # Multiple links - let user choose
+            response = console.input(f"[yellow]Open which link? (1-{len(urls)}, 'all', or Enter to skip): [/yellow]")
+            
+            if response.lower() == 'all':
+                for url in urls:
+                    try:
+                        webbrowser.open(url)
+                        console.print(f"[green]✓ Opened: {url}[/green]")
+                    except Exception as e:
+                        console.print(f"[red]❌ Failed to open {url}: {e}[/red]")
+            elif response.isdigit():
+                try:
+                    index = int(response) - 1
+                    if 0 <= index < len(urls):
+                        webbrowser.open(urls[index])
+                        console.print(f"[green]✓ Opened: {urls[index]}[/green]")
+                    else:
+                        console.print("[red]Invalid link number[/red]")
+                except Exception as e:
+                    console.print(f"[red]❌ Failed to open link: {e}[/red]")
+
+def open_link_command(url):
+    """Open a specific link via command"""
+    # Clean up the URL
+    url = url.strip()
+    
+    # Add protocol if missing
+    if not url.startswith(('http://', 'https://')):
+        url = 'https://' + url
+    
+    try:
+        webbrowser.open(url)
+        console.print(f"[green]✓ Opened: {url}[/green]")
+        return True
+    except Exception as e:
+        console.print(f"[red]❌ Failed to open link: {e}[/red]")
+        return False
+
+
+def analyze_url(url, question, message_history, fresh=False, stream=STREAM_REPLIES):
+    """Analyze a URL with AI and render the result"""
+    web_handler = WebContentHandler(console, stream=stream)
+    model = get_model(config.ANALYSIS_MODEL)
+    result = web_handler.analyze_url_with_ai(url, question, message_history, model, fresh)
+    
+    # Streamed replies were already rendered live
+    if result and not stream:
+        console.print(Panel(Markdown(result), title="Web Content Analysis", border_style="cyan"))
+    
+    return result
+
+def analyze_urls(urls, question, message_history, fresh=False, stream=STREAM_REPLIES):
+    """Analyze several URLs together (fetched concurrently) and render the result"""
+    web_handler = WebContentHandler(console, stream=stream)
+    model = get_model(config.ANALYSIS_MODEL)
+    result = web_handler.analyze_urls_with_ai(urls, question, message_history, model, fresh)
+    
+    if result and not stream:
+        console.print(Panel(Markdown(result), title="Web Content Analysis", border_style="cyan"))
+    
+    return result
+
+def crawl_site(url, depth, max_pages, question, message_history, stream=STREAM_REPLIES):
+    """Crawl a site, summarize each page and render a digest"""
+    web_handler = WebContentHandler(console, stream=stream)
+    crawler = SiteCrawler(console, web_handler)
+    console.print(f"[cyan]🕸️ Crawling {url} (depth {depth}, up to {max_pages} pages)...[/cyan]")
+    
+    results = crawler.crawl(url, depth, max_pages)
+    if not results:
+        console.print("[red]❌ No pages could be crawled[/red]")
+        return None
+    
+    prompt = crawler.build_digest_prompt(url, results, question)
+    message_history.append({"role": "user", "content": prompt})
+    try:
+        model = get_model(config.ANALYSIS_MODEL)
+        if stream:
+            response = get_gemini_client().generate(model, prompt, stream=True, call="crawl_digest")
+            reply = stream_to_panel(console, response, title="Site Digest", border_style="cyan")
+        else:
+            reply = get_gemini_client().generate(model, prompt, call="crawl_digest").text.strip()
+            console.print(Panel(Markdown(reply), title="Site Digest", border_style="cyan"))
+        message_history.append({"role": "assistant", "content": reply})
+        return reply
+    except Exception as e:
+        console.print(f"[red]❌ Error building site digest: {escape(str(e))}[/red]")
+        return None
+
+def show_response_cache(clear=False):
+    """Show response cache counters (or empty the cache)"""
+    cache = get_response_cache()
+    if cache is None:
+        console.print("[yellow]Response cache is off. Set AYRE_RESPONSE_CACHE=1 in your .env to enable it.[/yellow]")
+        return
+    if clear:
+        cache.clear()
+        console.print("[green]✓ Response cache cleared[/green]")
+        return
+    
+    stats = cache.stats()
+    lookups = stats["hits"] + stats["misses"]
+    table = Table(title="⚡ Response Cache", border_style="#ff4b4b")
+    table.add_column("Hits", style="#00ff00", justify="right")
+    table.add_column("Misses", style="#ff4b4b", justify="right")
+    table.add_column("Hit rate", justify="right")
+    table.add_column("Entries", justify="right")
+    table.add_column("Size", justify="right")
+    table.add_column("All-time hits", style="#888888", justify="right")
+    table.add_row(
+        str(stats["hits"]), str(stats["misses"]),
+        f"{stats['hits'] / lookups:.0%}" if lookups else "-",
+        str(stats["entries"]), f"{stats['bytes'] / 1024:.1f} KB", str(stats["total_hits"])
+    )
+    console.print(table)
+
+def show_gemini_calls():
+    """Show per-call-type attempt counters and latency, plus circuit breaker states"""
+    summary, breakers = get_gemini_client().stats()
+    if not summary:
+        console.print("[yellow]No Gemini calls yet this session[/yellow]")
+        return
+    
+    table = Table(title="📡 Gemini Calls", border_style="#ff4b4b")
+    table.add_column("Call", style="#ffffff")
+    table.add_column("Attempts", justify="right")
+    table.add_column("OK", style="#00ff00", justify="right")
+    table.add_column("Retried", style="#ffff00", justify="right")
+    table.add_column("Failed", style="#ff4b4b", justify="right")
+    table.add_column("Fast-failed", style="#ff4b4b", justify="right")
+    table.add_column("p50", justify="right")
+    table.add_column("p95", justify="right")
+    for call, row in sorted(summary.items()):
+        table.add_row(
+            call, str(row["attempts"]), str(row["ok"]), str(row["retry"]), str(row["error"]),
+            str(row["circuit_open"]),
+            f"{row['p50_ms'] / 1000:.1f}s" if row["p50_ms"] is not None else "-",
+            f"{row['p95_ms'] / 1000:.1f}s" if row["p95_ms"] is not None else "-"
+        )
+    console.print(table)
+    for model_name, (state, failures) in sorted(breakers.items()):
+        color = {"closed": "green", "half-open": "yellow"}.get(state, "red")
+        console.print(f"[{color}]Circuit for {model_name}: {state} ({failures} failures in a row)[/{color}]")
+
+def analyze_web_content(url, user_question=None):
+    """Analyze web content with AI"""
+    # Get current message history from chat manager
+    # This is a simplified version - you might need to pass message_history as parameter
+    temp_history = []
+    
+    return analyze_url(url, user_question, temp_history)
+
+def handle_commands(user_input, file_handler, message_history, chat_manager, stream=STREAM_REPLIES):
+    """Handle special commands"""
+    global gui_thread
+    
+    cmd = user_input.strip().lower()
+    cmd_parts = user_input.strip().split()
+    
+    
+
+    # Help command
+    if cmd == "help":
+        show_help()
+        return True
+    # Web analysis commands
+    if cmd.startswith("analyze ") and any(user_input.strip().split()[1].startswith(proto) for proto in ['http://', 'https://']):
+        # analyze <url1> <url2> ... [--fresh] [-- question]
+        args = cmd_parts[1:]
+        urls = []
+        while args and args[0].startswith(('http://', 'https://')):
+            urls.append(args.pop(0))
+        fresh = bool(args) and args[0] == "--fresh"
+        if fresh:
+            args.pop(0)
+        if args and args[0] == "--":
+            args.pop(0)
+        question = " ".join(args) or None
+        
+        if len(urls) == 1:
+            analyze_url(urls[0], question, message_history, fresh, stream)
+        else:
+            analyze_urls(list(dict.fromkeys(urls)), question, message_history, fresh, stream)
+        return True
+    
+    # crawl <url> [--depth N] [--max-pages M] [-- question]
+    if cmd.startswith("crawl "):
+        args = cmd_parts[1:]
+        question = None
+        if "--" in args:
+            index = args.index("--")
+            question = " ".join(args[index + 1:]) or None
+            args = args[:index]
+        
+        depth = config.CRAWL_DEPTH
+        max_pages = config.CRAWL_MAX_PAGES
+        try:
+            if "--depth" in args:
+                index = args.index("--depth")
+                depth = int(args[index + 1])
+                del args[index:index + 2]
+            if "--max-pages" in args:
+                index = args.index("--max-pages")
+                max_pages = int(args[index + 1])
+                del args[index:index + 2]
+        except (IndexError, ValueError):
+            console.print("[red]Usage: crawl <url> \\[--depth N] \\[--max-pages M] \\[-- question][/red]")
+            return True
+        
+        if len(args) != 1:
+            console.print("[red]Usage: crawl <url> \\[--depth N] \\[--max-pages M] \\[-- question][/red]")
+            return True
+        crawl_site(args[0], max(depth, 0), max(max_pages, 1), question, message_history, stream)
+        return True
+    
+    # Link commands with analysis option
+    if cmd.startswith("open "):
+        if len(cmd_parts) > 1:
+            url = " ".join(cmd_parts[1:])
+            
+            # Ask if user wants to analyze the content too
+            response = console.input("[yellow]Also analyze the content? (y/N): [/yellow]")
+            if response.lower() == 'y':
+                analyze_url(url, None, message_history)
+            
+            open_link_command(url)
+        else:
+            console.print("[red]Usage: open <url>[/red]")
+        return True
+    
+    # Check if input looks like a URL
+    if re.match(r'https?://', user_input.strip(), re.IGNORECASE):
+        url = user_input.strip()
+        
+        # Ask what to do with the URL
+        console.print(f"[cyan]🔗 URL detected: {url}[/cyan]")
+        action = console.input("[yellow]Choose action - [O]pen, [A]nalyze, or [B]oth (O/A/B): [/yellow]").lower()
+        
+        if action == 'a':
+            analyze_url(url, None, message_history)
+        elif action == 'b':
+            open_link_command(url)
+            analyze_url(url, None, message_history)
+        else:  # Default to open
+            open_link_command(url)
+        
+        return True
+    
+    # Chat management commands
+    if cmd in ("cache", "cache clear"):
+        show_response_cache(clear=cmd == "cache clear")
+        return True
+    
+    if cmd == "calls":
+        show_gemini_calls()
+        return True
+    
+    if cmd == "sync":
+        chat_manager.save_current_chat(message_history)
+        if chat_manager.flush():
+            console.print("[green]✓ Chat saved to disk[/green]")
+        else:
+            console.print("[red]❌ Some chat changes could not be saved yet[/red]")
+        return True
+    
+    if cmd == "chats":
+        chat_manager.list_chats()
+        return True
+    
+    elif cmd == "newchat":
+        chat_name = None
+        if len(cmd_parts) > 1:
+            chat_name = " ".join(cmd_parts[1:])
+        new_history = chat_manager.create_new_chat(chat_name)
+        if new_history:
+            message_history.clear()
+            message_history.extend(new_history)
+        return True
+    
+    elif cmd.startswith("loadchat "):
+        if len(cmd_parts) > 1:
+            chat_name = " ".join(cmd_parts[1:])
+            loaded_history = chat_manager.load_chat(chat_name)
+            if loaded_history:
+                message_history.clear()
+                message_history.extend(loaded_history)
+        else:
+            console.print("[red]Usage: loadchat <chat_name>[/red]")
+        return True
+    
+    elif cmd.startswith("deletechat "):
+        if len(cmd_parts) > 1:
+            chat_name = " ".join(cmd_parts[1:])
+            delete_result = chat_manager.delete_chat(chat_name)
+            if delete_result == "load_latest":
+                # Deleted current chat, load the latest remaining one
+                new_history = chat_manager.load_latest_chat()
+                message_history.clear()
+                message_history.extend(new_history)
+        else:
+            console.print("[red]Usage: deletechat <chat_name>[/red]")
+        return True
+    
+    elif cmd == "history" or cmd.startswith("history "):
+        limit = 10
+        page = "--page" in cmd_parts
+        args = [part for part in cmd_parts[1:] if part != "--page"]
+        if args:
+            try:
+                limit = int(args[0])
+            except ValueError:
+                console.print("[red]Invalid number for history limit[/red]")
+                return True
+        chat_manager.show_chat_history(limit, page)
+        return True
+    
+    elif cmd.startswith("search "):
+        query_parts = cmd_parts[1:]
+        chat_name = None
+        if "--chat" in query_parts:
+            index = query_parts.index("--chat")
+            chat_name = " ".join(query_parts[index + 1:]) or None
+            query_parts = query_parts[:index]
+        if query_parts:
+            chat_manager.search_chats(" ".join(query_parts), chat_name)
+        else:
+            console.print("[red]Usage: search <query> [--chat name][/red]")
+        return True
+    
+    # GUI command
+    if cmd == "gui" and File_uploads:
+        if gui_thread is None or not gui_thread.is_alive():
+            console.print("[cyan]🖥️ Opening GUI interface...[/cyan]")
+            gui_thread = threading.Thread(target=start_gui, args=(file_queue, status_queue), daemon=True)
+            gui_thread.start()
+        else:
+            console.print("[yellow]GUI is already running![/yellow]")
+        return True
+    elif cmd == "gui":
+        console.print(f"[red]File upload is disabled.[/red]")
+        return True
+    
+    # File commands
+    if user_input.startswith(("upload ", "analyze ", "context ", "contextdir ", "files evict ")) or cmd == "files":
+        return file_handler.handle_command(user_input, message_history)
+    
+    # Check for drag & drop
+    return file_handler.handle_file_input(user_input, message_history)
+
+def is_background_command(user_input):
+    """Slow commands that run as background jobs while the chat continues"""
+    if user_input.strip().lower().startswith(("analyze ", "crawl ")):
+        return True
+    # Dropped files
+    cleaned = user_input.strip().strip('"').strip("'")
+    return Path(cleaned).is_file()
+
+def run_background_command(user_input, file_handler, chat_manager):
+    """Run a command against a private history; its messages join the chat when the job ends"""
+    job_history = []
+    # Live panels would interleave with the foreground chat, so results are rendered whole
+    handle_commands(user_input, file_handler, job_history, chat_manager, stream=False)
+    return job_history
+
+def process_input(user_input, file_handler, message_history, context_state, chat_manager, context_manager):
+    """Handle one line in the foreground (runs on a worker thread; Ctrl-C cancels it)
+
+    message_history and context_state are private copies: run_repl merges them back only
+    when this returns True, so an abandoned worker that finishes late changes nothing.
+    """
+    # Handle commands and files
+    if handle_commands(user_input, file_handler, message_history, chat_manager):
+        return True
+    
+    # Regular chat with improved error handling
+    try:
+        reply = chat_with_gemini(user_input, message_history, context_manager, stream=STREAM_REPLIES,
+                                 context_state=context_state)
+        if reply:
+            if not STREAM_REPLIES:
+                console.print(Panel(Markdown(reply), title="Ayre", border_style="magenta"))
+        else:
+            console.print("[yellow]⚠️ No response received. Please try again.[/yellow]")
+    except Exception as chat_error:
+        console.print(f"[red]❌ Chat error: {escape(str(chat_error))}[/red]")
+        console.print("[yellow]💡 Try checking your internet connection and API key[/yellow]")
+    return True
+
+async def run_repl():
+    # Initialize chat manager
+    chat_manager = ChatManager(console)
+    
+    # Load the latest chat instead of creating new one
+    message_history = chat_manager.load_latest_chat()
+    file_handler = FileHandler(console, stream=STREAM_REPLIES)
+    background_files = FileHandler(console)
+    file_pool = FilePool(console, file_handler)
+    context_cache = ContextCache(console) if config.CONTEXT_CACHE else None
+    context_manager = ContextManager(console, chat_manager, context_cache=context_cache)
+    
+    repl = Repl(console, "[bold green]Raven >[/bold green] ")
+    await repl.start()
+    loop = asyncio.get_running_loop()
+    
+    def collect_files():
+        shown = file_consumer.collect(message_history)
+        chat_manager.save_current_chat(message_history)
+        return shown
+    
+    def file_ready():
+        # Worker thread: collect on the loop (right away if the prompt is waiting)
+        try:
+            loop.call_soon_threadsafe(repl.post, collect_files)
+        except RuntimeError:
+            # Loop already closed (REPL exited)
+            pass
+    
+    file_consumer = FileQueueConsumer(file_pool, file_queue, status_queue, on_ready=file_ready)
+    
+    def add_job_result(chat_name, job_history):
+        if chat_manager.current_chat != chat_name:
+            console.print(f"[dim]Background result not added: switched away from '{chat_name}'[/dim]")
+            return
+        message_history.extend(job_history)
+        chat_manager.save_current_chat(message_history)
+    
+    try:
+        while True:
+            try:
+                # Results of background jobs and GUI files that finished during the last request
+                repl.apply_completed()
+                
+                # Queue changes for the background saver (no-op when nothing changed)
+                chat_manager.save_current_chat(message_history)
+                
+                user_input = await repl.read_line()
+                
+                if user_input is None:
+                    # Ctrl-C at the prompt or end of input
+                    console.print("\n[bold magenta]Ayre's resonance interrupted. Farewell, Raven.[/bold magenta]")
+                    break
+                
+                if user_input.strip().lower() in {"exit", "quit"}:
+                    console.print("\n[bold red]Ayre's resonance fades. Until next time, Raven.[/bold red]")
+                    break
+                
+                # Skip empty inputs
+                if not user_input.strip():
+                    continue
+                
+                cmd = user_input.strip().lower()
+                if cmd == "jobs":
+                    repl.show_jobs()
+                    continue
+                if cmd.startswith("cancel "):
+                    job = cmd[7:].strip()
+                    if job.isdigit():
+                        repl.cancel_job(int(job))
+                    else:
+                        console.print("[red]Usage: cancel <job #>[/red]")
+                    continue
+                
+                if is_background_command(user_input):
+                    repl.start_background(
+                        user_input.strip(), run_background_command, user_input, background_files, chat_manager,
+                        on_done=functools.partial(add_job_result, chat_manager.current_chat)
+                    )
+                    continue
+                
+                # The task works on copies; they replace the chat state only if it was not cancelled
+                work_history = list(message_history)
+                chat_state = chat_manager.context_state
+                work_state = dict(chat_state)
+                finished = await repl.run_foreground(
+                    process_input, user_input, file_handler, work_history, work_state, chat_manager, context_manager
+                )
+                if finished:
+                    message_history[:] = work_history
+                    # Chat commands replace context_state themselves when they switch chats
+                    if chat_manager.context_state is chat_state:
+                        chat_state.update(work_state)
+            
+            except Exception as e:
+                console.print(f"[red]Error: {escape(str(e))}[/red]")
+                console.print("[yellow]💡 The conversation continues...[/yellow]")
+    finally:
+        # Save before exiting
+        repl.close()
+        chat_manager.save_current_chat(message_history)
+        chat_manager.close()
+        file_consumer.close()
+        file_pool.close()
+
+def main():
+    # Initialize
+    display_ans_file("ayre_img.ans")
+    print_header()
+    print_tips()
+    console.print("")
+    
+    asyncio.run(run_repl())
+    
+    # The stdin reader thread is still blocked in input(); with piped stdin, interpreter
+    # shutdown aborts on the stdin buffer lock it holds. Chats are flushed by now, so leave directly.
+    sys.stdout.flush()
+    sys.stderr.flush()
+    os._exit(0)
+
+if __name__ == "__main__":
+    main()
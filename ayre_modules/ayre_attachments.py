@@ -0,0 +1,116 @@
+import hashlib
+import json
+import mmap
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from ayre_modules import ayre_config as config
+from ayre_modules.ayre_retrieval import BM25Index
+
+
+class AttachmentStore:
+    """Oversized context files kept on disk as line-aligned chunks and retrieved by relevance
+
+    Chunks live in ayre_cache/attachments/<sha256>.jsonl; the BM25 index is built
+    in the background right after ingestion (or on first use after a restart).
+    """
+    def __init__(self, cache_dir=None, chunk_bytes=None):
+        self.dir = Path(cache_dir or Path(config.CACHE_DIR) / "attachments")
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.chunk_bytes = chunk_bytes or config.ATTACHMENT_CHUNK_KB * 1024
+        # digest -> Future of (index, line offsets into the chunk file)
+        self.indexes = {}
+        self._lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ayre-index")
+
+    def chunk_path(self, digest):
+        return self.dir / f"{digest}.jsonl"
+
+    def ingest(self, filename):
+        """Split a file into chunks through mmap; returns (digest, chunk_count, line_count)"""
+        size = os.path.getsize(filename)
+        sha = hashlib.sha256()
+        chunk_count = 0
+        line = 1
+
+        fd, tmp_name = tempfile.mkstemp(dir=self.dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as out, open(filename, 'rb') as f, \
+                    mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                start = 0
+                while start < size:
+                    end = min(start + self.chunk_bytes, size)
+                    if end < size:
+                        # Cut at a line boundary when there is one
+                        newline = mm.rfind(b"\n", start, end)
+                        if newline > start:
+                            end = newline + 1
+                    piece = mm[start:end]
+                    sha.update(piece)
+                    lines = piece.count(b"\n")
+                    out.write(json.dumps({
+                        "first_line": line,
+                        "last_line": line + max(lines - 1, 0),
+                        "text": piece.decode('utf-8', errors='replace')
+                    }, ensure_ascii=False) + "\n")
+                    line += lines
+                    chunk_count += 1
+                    start = end
+
+            digest = sha.hexdigest()
+            os.replace(tmp_name, self.chunk_path(digest))
+        except BaseException:
+            if os.path.exists(tmp_name):
+                os.remove(tmp_name)
+            raise
+
+        self.index_async(digest)
+        return digest, chunk_count, line - 1
+
+    def index_async(self, digest):
+        """Start (or reuse) the background index build for a chunk file"""
+        with self._lock:
+            future = self.indexes.get(digest)
+            if future is None:
+                future = self.executor.submit(self.build_index, digest)
+                self.indexes[digest] = future
+            return future
+
+    def build_index(self, digest):
+        index = BM25Index()
+        offsets = []
+        with open(self.chunk_path(digest), 'rb') as f:
+            for number, raw in enumerate(iter(f.readline, b'')):
+                offsets.append(f.tell() - len(raw))
+                index.add(str(number), json.loads(raw)["text"])
+        return index, offsets
+
+    def search(self, digest, query, k=None):
+        """Most relevant chunks of an attachment, in file order"""
+        if not self.chunk_path(digest).exists():
+            return []
+        index, offsets = self.index_async(digest).result()
+        hits = sorted(int(doc_id) for doc_id, _ in index.search(query, k or config.ATTACHMENT_TOP_K))
+
+        chunks = []
+        with open(self.chunk_path(digest), 'rb') as f:
+            for number in hits:
+                f.seek(offsets[number])
+                chunks.append(json.loads(f.readline()))
+        return chunks
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def get_attachment_store():
+    """Process-wide attachment store"""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = AttachmentStore()
+        return _shared
@@ -0,0 +1,308 @@
+import json
+import re
+import sqlite3
+import threading
+from pathlib import Path
+
+from ayre_modules.ayre_chat_store import JournalChatStore, EAGER_MESSAGES
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS chats (
+    name TEXT PRIMARY KEY,
+    created TEXT,
+    last_modified TEXT,
+    message_count INTEGER NOT NULL DEFAULT 0,
+    bytes INTEGER NOT NULL DEFAULT 0,
+    meta TEXT NOT NULL DEFAULT '{}'
+);
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    chat TEXT NOT NULL REFERENCES chats(name) ON DELETE CASCADE,
+    seq INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS messages_chat_seq ON messages(chat, seq);
+CREATE TABLE IF NOT EXISTS settings (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+    content, content='messages', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS messages_ai AFTER INSERT ON messages BEGIN
+    INSERT INTO messages_fts(rowid, content) VALUES (new.id, new.content);
+END;
+CREATE TRIGGER IF NOT EXISTS messages_ad AFTER DELETE ON messages BEGIN
+    INSERT INTO messages_fts(messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+END;
+"""
+
+# Markers swapped for rich markup after escaping the snippet text
+HIGHLIGHT_START = "\x02"
+HIGHLIGHT_END = "\x03"
+
+
+class SqliteChatStore:
+    """Chats stored in SQLite (WAL mode) with an FTS5 index over message content
+
+    Exposes the same interface as JournalChatStore so ChatManager can use either.
+    """
+    def __init__(self, db_path, chats_dir):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.chats_dir = Path(chats_dir)
+        self._lock = threading.RLock()
+
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self.conn.executescript(SCHEMA)
+
+        try:
+            self.conn.executescript(FTS_SCHEMA)
+            self.has_fts = True
+        except sqlite3.OperationalError:
+            # SQLite built without FTS5
+            self.has_fts = False
+        self.conn.commit()
+
+    def exists(self, name):
+        with self._lock:
+            return self.conn.execute("SELECT 1 FROM chats WHERE name = ?", (name,)).fetchone() is not None
+
+    def names(self):
+        with self._lock:
+            return [row["name"] for row in self.conn.execute("SELECT name FROM chats")]
+
+    def get_setting(self, key):
+        row = self.conn.execute("SELECT value FROM settings WHERE key = ?", (key,)).fetchone()
+        return row["value"] if row else None
+
+    def put_setting(self, key, value):
+        self.conn.execute(
+            "INSERT INTO settings(key, value) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, value)
+        )
+
+    def latest(self):
+        """Current chat, else the most recently modified one"""
+        with self._lock:
+            current = self.get_setting("current")
+            if current and self.exists(current):
+                return current
+            row = self.conn.execute(
+                "SELECT name FROM chats ORDER BY last_modified DESC LIMIT 1"
+            ).fetchone()
+            return row["name"] if row else None
+
+    def set_current(self, name):
+        with self._lock, self.conn:
+            self.put_setting("current", name)
+
+    def catalog(self):
+        """Summary rows for all chats (same shape as the journal catalog)"""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT name, created, last_modified, message_count, bytes FROM chats"
+            ).fetchall()
+            return {
+                "current": self.get_setting("current"),
+                "chats": {row["name"]: dict(row) for row in rows}
+            }
+
+    def read_meta(self, name):
+        with self._lock:
+            row = self.conn.execute("SELECT meta FROM chats WHERE name = ?", (name,)).fetchone()
+            if row is None:
+                raise FileNotFoundError(f"Chat '{name}' not found")
+            return json.loads(row["meta"])
+
+    def write_meta(self, name, meta):
+        with self._lock, self.conn:
+            self.update_chat_row(name, meta)
+
+    def update_chat_row(self, name, meta, added_bytes=0, recount=False):
+        """Write the chat header; `bytes` grows by added_bytes, or is summed again after a recount"""
+        self.conn.execute(
+            "UPDATE chats SET created = ?, last_modified = ?, message_count = ?, meta = ?, bytes = bytes + ? "
+            "WHERE name = ?",
+            (meta.get("created"), meta.get("last_modified"), meta.get("message_count", 0),
+             json.dumps(meta, ensure_ascii=False), added_bytes, name)
+        )
+        if recount:
+            self.conn.execute(
+                "UPDATE chats SET bytes = (SELECT COALESCE(SUM(LENGTH(content)), 0) FROM messages WHERE chat = ?) "
+                "WHERE name = ?",
+                (name, name)
+            )
+
+    @staticmethod
+    def count_chat_messages(messages):
+        """Messages shown to the user (system prompts excluded)"""
+        return sum(1 for msg in messages if msg.get("role") != "system")
+
+    def insert_messages(self, name, messages, first_seq):
+        """Insert rows for messages; returns their content length (what `bytes` counts)"""
+        self.conn.executemany(
+            "INSERT INTO messages(chat, seq, role, content, data) VALUES (?, ?, ?, ?, ?)",
+            [
+                (name, first_seq + offset, msg.get("role", ""), msg.get("content", ""),
+                 json.dumps(msg, ensure_ascii=False))
+                for offset, msg in enumerate(messages)
+            ]
+        )
+        return sum(len(msg.get("content", "")) for msg in messages)
+
+    def create(self, name, meta, messages):
+        """Create a chat with its initial messages"""
+        meta["message_count"] = self.count_chat_messages(messages)
+        with self._lock, self.conn:
+            self.conn.execute("INSERT INTO chats(name) VALUES (?)", (name,))
+            self.update_chat_row(name, meta, self.insert_messages(name, messages, 0))
+
+    def load(self, name, min_messages=EAGER_MESSAGES):
+        """Load the system prompt plus recent messages; returns (meta, messages, elided)"""
+        with self._lock:
+            meta = self.read_meta(name)
+            total = self.total_messages(name)
+            rows = self.conn.execute(
+                "SELECT data FROM messages WHERE chat = ? AND seq > 0 ORDER BY seq DESC LIMIT ?",
+                (name, min_messages)
+            ).fetchall()
+            recent = [json.loads(row["data"]) for row in reversed(rows)]
+            head = self.read_range(name, 0, 1)
+
+            elided = max(total - 1 - len(recent), 0)
+            return meta, head + recent, elided
+
+    def load_all(self, name):
+        """Load every message; returns (meta, messages)"""
+        with self._lock:
+            return self.read_meta(name), self.read_range(name, 0, self.total_messages(name))
+
+    def total_messages(self, name, meta=None):
+        """Number of messages in the chat, system prompt included"""
+        with self._lock:
+            return self.conn.execute(
+                "SELECT COALESCE(MAX(seq) + 1, 0) FROM messages WHERE chat = ?", (name,)
+            ).fetchone()[0]
+
+    def read_range(self, name, start, end):
+        """Messages with absolute indices [start, end)"""
+        with self._lock:
+            return [
+                json.loads(row["data"])
+                for row in self.conn.execute(
+                    "SELECT data FROM messages WHERE chat = ? AND seq >= ? AND seq < ? ORDER BY seq",
+                    (name, start, end)
+                )
+            ]
+
+    def append(self, name, meta, messages, start=None):
+        """Insert new messages after the existing ones (any already stored from `start` on are skipped)"""
+        with self._lock, self.conn:
+            next_seq = self.conn.execute(
+                "SELECT COALESCE(MAX(seq) + 1, 0) FROM messages WHERE chat = ?", (name,)
+            ).fetchone()[0]
+            if start is not None:
+                messages = messages[min(max(next_seq - start, 0), len(messages)):]
+            added_bytes = 0
+            if messages:
+                added_bytes = self.insert_messages(name, messages, next_seq)
+                meta["message_count"] = meta.get("message_count", 0) + self.count_chat_messages(messages)
+            self.update_chat_row(name, meta, added_bytes)
+
+    def reset(self, name, meta, messages, elided=0):
+        """Replace the loaded messages of a chat (elided ones are kept)"""
+        keep = elided + 1 if elided else 0
+        replacement = messages[1:] if elided else messages
+        meta["message_count"] = elided + self.count_chat_messages(messages)
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM messages WHERE chat = ? AND seq >= ?", (name, keep))
+            self.insert_messages(name, replacement, keep)
+            self.update_chat_row(name, meta, recount=True)
+
+    def delete(self, name):
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM messages WHERE chat = ?", (name,))
+            self.conn.execute("DELETE FROM chats WHERE name = ?", (name,))
+            if self.get_setting("current") == name:
+                self.put_setting("current", None)
+
+    @staticmethod
+    def fts_query(query):
+        """Turn free text into an FTS5 query of quoted terms (all must match)"""
+        terms = re.findall(r"\w+", query)
+        return " ".join(f'"{term}"' for term in terms)
+
+    def search(self, query, chat_name=None, limit=20):
+        """Ranked (bm25) snippets of messages matching the query"""
+        match = self.fts_query(query)
+        if not match:
+            return []
+
+        sql = (
+            "SELECT m.chat AS chat, m.role AS role, m.seq AS seq, "
+            "snippet(messages_fts, 0, ?, ?, '…', 16) AS snippet "
+            "FROM messages_fts JOIN messages m ON m.id = messages_fts.rowid "
+            "WHERE messages_fts MATCH ?"
+        )
+        params = [HIGHLIGHT_START, HIGHLIGHT_END, match]
+        if chat_name:
+            sql += " AND m.chat = ?"
+            params.append(chat_name)
+        sql += " ORDER BY bm25(messages_fts) LIMIT ?"
+        params.append(limit)
+
+        with self._lock:
+            return [dict(row) for row in self.conn.execute(sql, params)]
+
+    def migrate_legacy(self):
+        """One-shot import of `<name>.json` chats (and journal chats) into the database
+
+        Source files are left in place so switching back to the JSON backend still finds
+        them; the names already imported are recorded in settings instead.
+        """
+        journals = JournalChatStore(self.chats_dir)
+        migrated = []
+
+        with self._lock:
+            imported = set(json.loads(self.get_setting("legacy_imported") or "[]"))
+        for legacy_file in journals.legacy_files():
+            name = legacy_file.stem
+            if name in imported:
+                continue
+            with open(legacy_file, 'r', encoding='utf-8') as f:
+                chat_data = json.load(f)
+
+            messages = chat_data.pop("message_history", [])
+            chat_data["name"] = name
+            if not self.exists(name):
+                self.create(name, chat_data, messages)
+                migrated.append(name)
+            imported.add(name)
+            with self._lock, self.conn:
+                self.put_setting("legacy_imported", json.dumps(sorted(imported)))
+
+        with self._lock:
+            journals_imported = self.get_setting("journals_imported")
+        if not journals_imported:
+            # Journal files are left in place so the JSON backend keeps working
+            for name in journals.names():
+                if self.exists(name):
+                    continue
+                meta, messages = journals.load_all(name)
+                self.create(name, meta, messages)
+                migrated.append(name)
+            with self._lock, self.conn:
+                self.put_setting("journals_imported", "1")
+
+        return migrated
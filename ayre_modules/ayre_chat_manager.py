@@ -1,253 +1,388 @@
-import json
-import os
-from datetime import datetime
-from pathlib import Path
-from rich.console import Console
-from rich.table import Table
-from rich.panel import Panel
-from rich.markdown import Markdown
-
-class ChatManager:
-    def __init__(self, console):
-        self.console = console
-        self.chats_dir = Path("ayre_chats")
-        self.chats_dir.mkdir(exist_ok=True)
-        self.current_chat = None
-        self.current_chat_file = None
-    
-    def get_latest_chat(self):
-        """Get the most recently modified chat"""
-        chat_files = list(self.chats_dir.glob("*.json"))
-        
-        if not chat_files:
-            return None
-        
-        # Sort by modification time (most recent first)
-        latest_file = max(chat_files, key=lambda f: f.stat().st_mtime)
-        
-        try:
-            with open(latest_file, 'r', encoding='utf-8') as f:
-                chat_data = json.load(f)
-            
-            return latest_file, chat_data
-        except Exception as e:
-            self.console.print(f"[red]❌ Error reading latest chat: {e}[/red]")
-            return None
-    
-    def load_latest_chat(self):
-        """Load the most recently modified chat"""
-        latest_chat = self.get_latest_chat()
-        
-        if not latest_chat:
-            # No existing chats, create a new one
-            return self.create_new_chat("default")
-        
-        chat_file, chat_data = latest_chat
-        chat_name = chat_data.get("name", chat_file.stem)
-        
-        self.current_chat = chat_name
-        self.current_chat_file = chat_file
-        
-        self.console.print(f"[green]✓ Loaded latest chat: '{chat_name}'[/green]")
-        return chat_data["message_history"]
-    
-    def create_new_chat(self, chat_name=None):
-        """Create a new chat session"""
-        if not chat_name:
-            timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-            chat_name = f"chat_{timestamp}"
-        
-        # Sanitize chat name
-        chat_name = "".join(c for c in chat_name if c.isalnum() or c in (' ', '-', '_')).rstrip()
-        chat_name = chat_name.replace(' ', '_')
-        
-        chat_file = self.chats_dir / f"{chat_name}.json"
-        
-        # Check if chat already exists
-        counter = 1
-        original_name = chat_name
-        while chat_file.exists():
-            chat_name = f"{original_name}_{counter}"
-            chat_file = self.chats_dir / f"{chat_name}.json"
-            counter += 1
-        
-        # Load system prompt
-        try:
-            with open("ayre_gemini.txt", "r", encoding="utf-8") as f:
-                system_prompt = f.read().strip()
-        except FileNotFoundError:
-            system_prompt = "You are Ayre, an AI companion from Armored Core 6."
-        
-        # Create new chat data
-        chat_data = {
-            "name": chat_name,
-            "created": datetime.now().isoformat(),
-            "last_modified": datetime.now().isoformat(),
-            "message_history": [{"role": "system", "content": system_prompt}]
-        }
-        
-        # Save chat
-        with open(chat_file, 'w', encoding='utf-8') as f:
-            json.dump(chat_data, f, indent=2, ensure_ascii=False)
-        
-        self.current_chat = chat_name
-        self.current_chat_file = chat_file
-        
-        self.console.print(f"[green]✓ Created new chat: '{chat_name}'[/green]")
-        return chat_data["message_history"]
-    
-    def load_chat(self, chat_name):
-        """Load an existing chat"""
-        chat_file = self.chats_dir / f"{chat_name}.json"
-        
-        if not chat_file.exists():
-            self.console.print(f"[red]❌ Chat '{chat_name}' not found![/red]")
-            return None
-        
-        try:
-            with open(chat_file, 'r', encoding='utf-8') as f:
-                chat_data = json.load(f)
-            
-            self.current_chat = chat_name
-            self.current_chat_file = chat_file
-            
-            self.console.print(f"[green]✓ Loaded chat: '{chat_name}'[/green]")
-            return chat_data["message_history"]
-        
-        except Exception as e:
-            self.console.print(f"[red]❌ Error loading chat: {e}[/red]")
-            return None
-    
-    def save_current_chat(self, message_history):
-        """Save current chat to file"""
-        if not self.current_chat_file:
-            return
-        
-        try:
-            with open(self.current_chat_file, 'r', encoding='utf-8') as f:
-                chat_data = json.load(f)
-            
-            chat_data["message_history"] = message_history
-            chat_data["last_modified"] = datetime.now().isoformat()
-            
-            with open(self.current_chat_file, 'w', encoding='utf-8') as f:
-                json.dump(chat_data, f, indent=2, ensure_ascii=False)
-        
-        except Exception as e:
-            self.console.print(f"[red]❌ Error saving chat: {e}[/red]")
-    
-    def list_chats(self):
-        """Display all available chats"""
-        chat_files = list(self.chats_dir.glob("*.json"))
-        
-        if not chat_files:
-            self.console.print("[yellow]No chats found. Use 'newchat' to create one![/yellow]")
-            return
-        
-        table = Table(title="💬 Available Chats", border_style="#ff4b4b")
-        table.add_column("Name", style="#ffffff", no_wrap=True)
-        table.add_column("Created", style="#888888")
-        table.add_column("Last Modified", style="#888888")
-        table.add_column("Messages", style="#00ff00", justify="right")
-        table.add_column("Current", style="#ff4b4b", justify="center")
-        
-        for chat_file in sorted(chat_files, key=lambda f: f.stat().st_mtime, reverse=True):
-            try:
-                with open(chat_file, 'r', encoding='utf-8') as f:
-                    chat_data = json.load(f)
-                
-                name = chat_data.get("name", chat_file.stem)
-                created = chat_data.get("created", "Unknown")
-                if created != "Unknown":
-                    created = datetime.fromisoformat(created).strftime("%Y-%m-%d %H:%M")
-                
-                last_modified = chat_data.get("last_modified", "Unknown")
-                if last_modified != "Unknown":
-                    last_modified = datetime.fromisoformat(last_modified).strftime("%Y-%m-%d %H:%M")
-                
-                # Count non-system messages
-                message_count = len([msg for msg in chat_data.get("message_history", []) 
-                                   if msg.get("role") != "system"])
-                
-                is_current = "●" if self.current_chat == name else ""
-                
-                table.add_row(name, created, last_modified, str(message_count), is_current)
-            
-            except Exception as e:
-                table.add_row(chat_file.stem, "Error", "Error", "?", "")
-        
-        self.console.print(table)
-    
-    def delete_chat(self, chat_name):
-        """Delete a chat"""
-        chat_file = self.chats_dir / f"{chat_name}.json"
-        
-        if not chat_file.exists():
-            self.console.print(f"[red]❌ Chat '{chat_name}' not found![/red]")
-            return False
-        
-        # Confirm deletion
-        response = self.console.input(f"[yellow]⚠️  Delete chat '{chat_name}'? (y/N): [/yellow]")
-        if response.lower() != 'y':
-            self.console.print("[cyan]Deletion cancelled.[/cyan]")
-            return False
-        
-        try:
-            chat_file.unlink()
-            
-            # If we deleted the current chat, load the latest remaining chat
-            if self.current_chat == chat_name:
-                self.current_chat = None
-                self.current_chat_file = None
-                # Try to load the next most recent chat
-                return "load_latest"
-            
-            self.console.print(f"[green]✓ Deleted chat: '{chat_name}'[/green]")
-            return True
-        
-        except Exception as e:
-            self.console.print(f"[red]❌ Error deleting chat: {e}[/red]")
-            return False
-    
-    def show_chat_history(self, limit=10):
-        """Show recent messages from current chat"""
-        if not self.current_chat:
-            self.console.print("[yellow]No chat loaded. Use 'chats' to see available chats or 'newchat' to create one.[/yellow]")
-            return
-        
-        try:
-            with open(self.current_chat_file, 'r', encoding='utf-8') as f:
-                chat_data = json.load(f)
-            
-            messages = chat_data.get("message_history", [])
-            # Filter out system messages for display
-            user_messages = [msg for msg in messages if msg.get("role") != "system"]
-            
-            if not user_messages:
-                self.console.print("[yellow]No messages in current chat yet.[/yellow]")
-                return
-            
-            # Show last N messages
-            recent_messages = user_messages[-limit:]
-            
-            self.console.print(Panel(
-                f"[bold #ff4b4b]Chat History: {self.current_chat}[/bold #ff4b4b]",
-                border_style="#ff4b4b"
-            ))
-            
-            for msg in recent_messages:
-                role = msg.get("role", "unknown")
-                content = msg.get("content", "")
-                
-                if role == "user":
-                    self.console.print(f"[bold green]Raven:[/bold green] {content}")
-                elif role == "assistant":
-                    self.console.print(Panel(
-                        Markdown(content), 
-                        title="Ayre", 
-                        border_style="magenta"
-                    ))
-                self.console.print()
-        
-        except Exception as e:
-            self.console.print(f"[red]❌ Error reading chat history: {e}[/red]")
\ No newline at end of file
+import atexit
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+from rich.console import Console
+from rich.table import Table
+from rich.panel import Panel
+from rich.markdown import Markdown
+from rich.markup import escape
+
+from ayre_modules.ayre_context_manager import empty_context_state
+from ayre_modules.ayre_chat_store import JournalChatStore
+from ayre_modules.ayre_chat_db import SqliteChatStore, HIGHLIGHT_START, HIGHLIGHT_END
+from ayre_modules.ayre_chat_saver import ChatSaver
+from ayre_modules.ayre_recall import TurnIndex
+from ayre_modules import ayre_config as config
+
+class ChatManager:
+    def __init__(self, console):
+        self.console = console
+        self.chats_dir = Path("ayre_chats")
+        if config.CHAT_BACKEND == "sqlite":
+            self.store = SqliteChatStore(config.CHAT_DB, self.chats_dir)
+        else:
+            self.store = JournalChatStore(self.chats_dir)
+        self.current_chat = None
+        self.context_state = empty_context_state()
+        # Retrieval index over the current chat's past turns (stored in ayre_chats/.recall/)
+        self.recall_index = None
+        # Older messages of the current chat left on disk (between the system prompt and index 1)
+        self.elided = 0
+        # Where `history --page` continues from (absolute message index)
+        self.history_cursor = None
+        # What has already been handed to the saver
+        self.saved_count = 0
+        self.last_saved_message = None
+        self.saved_context = None
+        
+        self.migrate_legacy_chats()
+        
+        # Saves are written behind the REPL; direct store access flushes first
+        self.saver = ChatSaver(console, self.store)
+        atexit.register(self.close)
+    
+    def migrate_legacy_chats(self):
+        """Import old single-file JSON chats into the active storage backend"""
+        try:
+            migrated = self.store.migrate_legacy()
+            if migrated:
+                self.console.print(f"[cyan]📦 Migrated {len(migrated)} chat(s) to {config.CHAT_BACKEND} storage[/cyan]")
+        except Exception as e:
+            self.console.print(f"[red]❌ Error migrating old chats: {e}[/red]")
+    
+    def set_current_chat(self, chat_name, meta, message_history, elided=0):
+        """Make a chat current and mark its messages as saved"""
+        self.current_chat = chat_name
+        self.elided = elided
+        self.history_cursor = None
+        
+        # The summary index is stored as an absolute message index
+        self.context_state = dict(meta.get("context_summary") or empty_context_state())
+        summarized_upto = self.context_state["summarized_upto"]
+        self.context_state["summarized_upto"] = summarized_upto - elided if summarized_upto > elided else 0
+        
+        self.recall_index = TurnIndex(self.recall_path(chat_name)) if config.RECALL else None
+        
+        self.mark_saved(message_history)
+        self.store.set_current(chat_name)
+    
+    def mark_saved(self, message_history):
+        """Remember how much of the history is on disk (or queued for it)"""
+        self.saved_count = len(message_history)
+        self.last_saved_message = message_history[-1] if message_history else None
+        self.saved_context = json.dumps(self.context_state, sort_keys=True)
+    
+    def get_latest_chat(self):
+        """Get the most recently modified chat"""
+        self.flush()
+        chat_name = self.store.latest()
+        
+        if not chat_name:
+            return None
+        
+        try:
+            meta, message_history, elided = self.store.load(chat_name)
+            return chat_name, meta, message_history, elided
+        except Exception as e:
+            self.console.print(f"[red]❌ Error reading latest chat: {e}[/red]")
+            return None
+    
+    def load_latest_chat(self):
+        """Load the most recently modified chat"""
+        latest_chat = self.get_latest_chat()
+        
+        if not latest_chat:
+            # No existing chats, create a new one
+            return self.create_new_chat("default")
+        
+        chat_name, meta, message_history, elided = latest_chat
+        self.set_current_chat(chat_name, meta, message_history, elided)
+        
+        self.console.print(f"[green]✓ Loaded latest chat: '{chat_name}'[/green]")
+        return message_history
+    
+    def create_new_chat(self, chat_name=None):
+        """Create a new chat session"""
+        self.flush()
+        if not chat_name:
+            timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+            chat_name = f"chat_{timestamp}"
+        
+        # Sanitize chat name
+        chat_name = "".join(c for c in chat_name if c.isalnum() or c in (' ', '-', '_')).rstrip()
+        chat_name = chat_name.replace(' ', '_')
+        
+        # Check if chat already exists
+        counter = 1
+        original_name = chat_name
+        while self.store.exists(chat_name):
+            chat_name = f"{original_name}_{counter}"
+            counter += 1
+        
+        # Load system prompt
+        try:
+            with open("ayre_gemini.txt", "r", encoding="utf-8") as f:
+                system_prompt = f.read().strip()
+        except FileNotFoundError:
+            system_prompt = "You are Ayre, an AI companion from Armored Core 6."
+        
+        # Create new chat data
+        meta = {
+            "name": chat_name,
+            "created": datetime.now().isoformat(),
+            "last_modified": datetime.now().isoformat(),
+            "context_summary": empty_context_state()
+        }
+        message_history = [{"role": "system", "content": system_prompt}]
+        
+        # Save chat
+        self.store.create(chat_name, meta, message_history)
+        self.set_current_chat(chat_name, meta, message_history)
+        
+        self.console.print(f"[green]✓ Created new chat: '{chat_name}'[/green]")
+        return message_history
+    
+    def load_chat(self, chat_name):
+        """Load an existing chat"""
+        self.flush()
+        if not self.store.exists(chat_name):
+            self.console.print(f"[red]❌ Chat '{chat_name}' not found![/red]")
+            return None
+        
+        try:
+            meta, message_history, elided = self.store.load(chat_name)
+            self.set_current_chat(chat_name, meta, message_history, elided)
+            
+            self.console.print(f"[green]✓ Loaded chat: '{chat_name}'[/green]")
+            return message_history
+        
+        except Exception as e:
+            self.console.print(f"[red]❌ Error loading chat: {e}[/red]")
+            return None
+    
+    def save_current_chat(self, message_history):
+        """Queue new messages for the background saver"""
+        if not self.current_chat:
+            return
+        
+        try:
+            saved = self.saved_count
+            # Messages are only ever appended; anything else is journaled as a reset
+            appended_only = saved <= len(message_history) and (
+                saved == 0 or message_history[saved - 1] is self.last_saved_message
+            )
+            context_json = json.dumps(self.context_state, sort_keys=True)
+            
+            if appended_only and saved == len(message_history) and context_json == self.saved_context:
+                return
+            
+            context_summary = dict(self.context_state)
+            if context_summary["summarized_upto"]:
+                context_summary["summarized_upto"] += self.elided
+            
+            # Snapshot on this thread; the saver only sees copies (and reads the chat header itself)
+            self.saver.submit({
+                "kind": "append" if appended_only else "reset",
+                "chat": self.current_chat,
+                # Absolute index of the first message (loaded index i > 0 is elided + i)
+                "start": saved + self.elided if saved else 0,
+                "updates": {
+                    "context_summary": context_summary,
+                    "last_modified": datetime.now().isoformat()
+                },
+                "messages": message_history[saved:] if appended_only else list(message_history),
+                "elided": self.elided
+            })
+            
+            self.mark_saved(message_history)
+            self.history_cursor = None
+        
+        except Exception as e:
+            self.console.print(f"[red]❌ Error saving chat: {e}[/red]")
+    
+    def recall_path(self, chat_name):
+        """Journal of a chat's recall index"""
+        return self.chats_dir / ".recall" / f"{chat_name}.jsonl"
+    
+    def read_messages(self, start, end):
+        """Messages of the current chat with absolute indices [start, end), from storage"""
+        self.flush()
+        return self.store.read_range(self.current_chat, start, end)
+    
+    def flush(self):
+        """Block until queued saves are on disk"""
+        return self.saver.flush() if hasattr(self, "saver") else True
+    
+    def close(self):
+        """Flush pending saves and stop the saver (safe to call more than once)"""
+        if hasattr(self, "saver"):
+            self.saver.close()
+        if hasattr(self.store, "close"):
+            # The journal store saves its catalog lazily
+            self.store.close()
+    
+    def list_chats(self):
+        """Display all available chats"""
+        self.flush()
+        # Everything shown comes from the catalog; no chat file is opened
+        catalog = self.store.catalog()["chats"]
+        
+        if not catalog:
+            self.console.print("[yellow]No chats found. Use 'newchat' to create one![/yellow]")
+            return
+        
+        table = Table(title="💬 Available Chats", border_style="#ff4b4b")
+        table.add_column("Name", style="#ffffff", no_wrap=True)
+        table.add_column("Created", style="#888888")
+        table.add_column("Last Modified", style="#888888")
+        table.add_column("Messages", style="#00ff00", justify="right")
+        table.add_column("Size", style="#888888", justify="right")
+        table.add_column("Current", style="#ff4b4b", justify="center")
+        
+        for chat_data in sorted(catalog.values(), key=lambda entry: entry.get("last_modified") or "", reverse=True):
+            try:
+                name = chat_data["name"]
+                created = chat_data.get("created") or "Unknown"
+                if created != "Unknown":
+                    created = datetime.fromisoformat(created).strftime("%Y-%m-%d %H:%M")
+                
+                last_modified = chat_data.get("last_modified") or "Unknown"
+                if last_modified != "Unknown":
+                    last_modified = datetime.fromisoformat(last_modified).strftime("%Y-%m-%d %H:%M")
+                
+                # Count of non-system messages
+                message_count = chat_data.get("message_count")
+                if message_count is None:
+                    message_count = "?"
+                
+                size = chat_data.get("bytes")
+                size = f"{size / 1024:.1f} KB" if size is not None else "?"
+                
+                is_current = "●" if self.current_chat == name else ""
+                
+                table.add_row(name, created, last_modified, str(message_count), size, is_current)
+            
+            except Exception as e:
+                table.add_row(chat_data.get("name", "?"), "Error", "Error", "?", "?", "")
+        
+        self.console.print(table)
+    
+    def delete_chat(self, chat_name):
+        """Delete a chat"""
+        self.flush()
+        if not self.store.exists(chat_name):
+            self.console.print(f"[red]❌ Chat '{chat_name}' not found![/red]")
+            return False
+        
+        # Confirm deletion
+        response = self.console.input(f"[yellow]⚠️  Delete chat '{chat_name}'? (y/N): [/yellow]")
+        if response.lower() != 'y':
+            self.console.print("[cyan]Deletion cancelled.[/cyan]")
+            return False
+        
+        try:
+            self.store.delete(chat_name)
+            self.recall_path(chat_name).unlink(missing_ok=True)
+            
+            # If we deleted the current chat, load the latest remaining chat
+            if self.current_chat == chat_name:
+                self.current_chat = None
+                self.context_state = empty_context_state()
+                self.recall_index = None
+                # Try to load the next most recent chat
+                return "load_latest"
+            
+            self.console.print(f"[green]✓ Deleted chat: '{chat_name}'[/green]")
+            return True
+        
+        except Exception as e:
+            self.console.print(f"[red]❌ Error deleting chat: {e}[/red]")
+            return False
+    
+    def show_chat_history(self, limit=10, page=False):
+        """Show recent messages from current chat (page=True continues further back)"""
+        self.flush()
+        if not self.current_chat:
+            self.console.print("[yellow]No chat loaded. Use 'chats' to see available chats or 'newchat' to create one.[/yellow]")
+            return
+        
+        try:
+            # Only the segments covering the requested range are read
+            total = self.store.total_messages(self.current_chat)
+            end = total
+            if page and self.history_cursor is not None:
+                end = self.history_cursor
+            # Index 0 is the system prompt
+            start = max(end - limit, 1)
+            
+            if start >= end:
+                if total <= 1:
+                    self.console.print("[yellow]No messages in current chat yet.[/yellow]")
+                else:
+                    self.console.print("[yellow]Reached the beginning of this chat.[/yellow]")
+                return
+            
+            recent_messages = self.store.read_range(self.current_chat, start, end)
+            self.history_cursor = start
+            
+            self.console.print(Panel(
+                f"[bold #ff4b4b]Chat History: {self.current_chat}[/bold #ff4b4b]\n"
+                f"[#888888]Messages {start}–{end - 1} of {total - 1}"
+                f"{' · history --page for older' if start > 1 else ''}[/#888888]",
+                border_style="#ff4b4b"
+            ))
+            
+            for msg in recent_messages:
+                role = msg.get("role", "unknown")
+                content = msg.get("content", "")
+                
+                if role == "user":
+                    self.console.print(f"[bold green]Raven:[/bold green] {content}")
+                elif role == "assistant":
+                    self.console.print(Panel(
+                        Markdown(content), 
+                        title="Ayre", 
+                        border_style="magenta"
+                    ))
+                self.console.print()
+        
+        except Exception as e:
+            self.console.print(f"[red]❌ Error reading chat history: {e}[/red]")
+    
+    def search_chats(self, query, chat_name=None, limit=20):
+        """Full-text search across chats (sqlite backend)"""
+        self.flush()
+        if not hasattr(self.store, "search") or not self.store.has_fts:
+            self.console.print("[yellow]Search needs the sqlite chat backend with FTS5. "
+                               "Set AYRE_CHAT_BACKEND=sqlite in your .env[/yellow]")
+            return
+        
+        if chat_name and not self.store.exists(chat_name):
+            self.console.print(f"[red]❌ Chat '{chat_name}' not found![/red]")
+            return
+        
+        try:
+            results = self.store.search(query, chat_name, limit)
+        except Exception as e:
+            self.console.print(f"[red]❌ Search failed: {e}[/red]")
+            return
+        
+        if not results:
+            self.console.print(f"[yellow]No messages match '{query}'.[/yellow]")
+            return
+        
+        table = Table(title=f"🔍 Search: {query}", border_style="#ff4b4b")
+        table.add_column("Chat", style="#ffffff", no_wrap=True)
+        table.add_column("#", style="#888888", justify="right")
+        table.add_column("From", style="#00ff00")
+        table.add_column("Snippet", style="#cccccc")
+        
+        for result in results:
+            snippet = escape(result["snippet"])
+            snippet = snippet.replace(HIGHLIGHT_START, "[bold #ff4b4b]").replace(HIGHLIGHT_END, "[/bold #ff4b4b]")
+            speaker = {"user": "Raven", "assistant": "Ayre"}.get(result["role"], result["role"])
+            table.add_row(result["chat"], str(result["seq"]), speaker, snippet)
+        
+        self.console.print(table)
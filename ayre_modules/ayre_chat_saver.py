@@ -0,0 +1,102 @@
+import threading
+
+# How long to wait for more changes before writing a batch
+COALESCE_SECONDS = 0.5
+
+
+class ChatSaver:
+    """Write-behind persistence: coalesces chat saves and writes them on a background thread
+
+    Ops are dicts with "kind" ("append" or "reset"), "chat", "start", "updates",
+    "messages" and "elided". The chat header is read from the store for every write,
+    so a failed write leaves no half-updated counters behind and a retry starts clean.
+    """
+    def __init__(self, console, store, delay=COALESCE_SECONDS):
+        self.console = console
+        self.store = store
+        self.delay = delay
+        self.pending = []
+        self.busy = False
+        self.stalled = False
+        self.flush_requested = False
+        self.closed = False
+        self.cond = threading.Condition()
+        self.thread = threading.Thread(target=self.run, name="ayre-chat-saver", daemon=True)
+        self.thread.start()
+
+    def submit(self, op):
+        """Queue an op, merging it with pending ops for the same chat"""
+        with self.cond:
+            if op["kind"] == "reset":
+                # A reset supersedes anything still queued for that chat
+                self.pending = [queued for queued in self.pending if queued["chat"] != op["chat"]]
+                self.pending.append(op)
+            elif self.pending and self.pending[-1]["chat"] == op["chat"]:
+                last = self.pending[-1]
+                last["messages"] = last["messages"] + op["messages"]
+                last["updates"] = op["updates"]
+            else:
+                self.pending.append(op)
+            self.stalled = False
+            self.cond.notify_all()
+
+    def run(self):
+        while True:
+            with self.cond:
+                self.cond.wait_for(lambda: self.closed or (self.pending and not self.stalled))
+                if self.closed and (not self.pending or self.stalled):
+                    return
+
+                # Let a burst of changes land in the same batch
+                self.cond.wait_for(lambda: self.flush_requested or self.closed, timeout=self.delay)
+                ops, self.pending = self.pending, []
+                self.busy = True
+
+            failed = self.write(ops)
+
+            with self.cond:
+                if failed:
+                    # Keep unwritten ops; retried on the next save or flush
+                    self.pending = failed + self.pending
+                    self.stalled = True
+                self.busy = False
+                self.cond.notify_all()
+
+    def write(self, ops):
+        """Apply ops to the store, returning the ones that failed"""
+        for index, op in enumerate(ops):
+            try:
+                meta = self.store.read_meta(op["chat"])
+                meta.update(op["updates"])
+                if op["kind"] == "reset":
+                    self.store.reset(op["chat"], meta, op["messages"], op.get("elided", 0))
+                else:
+                    self.store.append(op["chat"], meta, op["messages"], op.get("start"))
+            except Exception as e:
+                self.console.print(f"[red]❌ Error saving chat '{op['chat']}': {e}[/red]")
+                return ops[index:]
+        return []
+
+    def flush(self, timeout=10):
+        """Write everything pending now; True if it all reached disk"""
+        with self.cond:
+            self.stalled = False
+            self.flush_requested = True
+            self.cond.notify_all()
+            done = self.cond.wait_for(
+                lambda: (not self.pending and not self.busy) or (self.stalled and not self.busy),
+                timeout=timeout
+            )
+            self.flush_requested = False
+            return done and not self.pending
+
+    def close(self):
+        """Flush and stop the saver thread"""
+        if self.closed:
+            return True
+        flushed = self.flush()
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+        self.thread.join(timeout=5)
+        return flushed
@@ -0,0 +1,443 @@
+import json
+import os
+import shutil
+import threading
+from pathlib import Path
+
+# Compact a journal once dead records outnumber live messages by this much
+COMPACT_MIN_DEAD_RECORDS = 200
+# Seal the tail journal into read-only segments of this many messages once it holds that many
+SEGMENT_MESSAGES = 500
+# Load older segments at startup until at least this many recent messages are in memory
+EAGER_MESSAGES = 100
+CATALOG_FILE = ".catalog.json"
+CATALOG_FIELDS = ("name", "created", "last_modified", "message_count")
+# Header writes between catalog saves (listing, switching and closing also save it)
+CATALOG_SAVE_EVERY = 20
+
+
+def write_atomic(path, text):
+    """Write a file via temp file + rename so readers never see a partial file"""
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class JournalChatStore:
+    """Chats stored as an append-only JSONL journal plus a small metadata header
+
+    Each chat has `<name>.jsonl`, the tail journal (one record per line:
+    {"op": "msg", "msg": {...}}, or {"op": "base"/"reset", "start": n} which starts the
+    tail at absolute message n), and `<name>.meta.json` (name, dates, counts, context
+    summary, segment list). Full tails are sealed into `<name>.segments/NNNNNN.jsonl`;
+    only the tail (plus enough recent segments) is loaded eagerly, and older messages
+    are read by range. A `.catalog.json` index holds one summary row per chat plus the
+    current chat, so listing and startup never open individual chats. Catalog rows are
+    updated in memory on every header write and saved lazily; headers newer than the
+    catalog file refresh their rows when it is next loaded.
+
+    Loaded histories keep the first message (the system prompt) at index 0; `elided`
+    counts the older messages left on disk between it and index 1.
+    """
+    def __init__(self, chats_dir):
+        self.chats_dir = Path(chats_dir)
+        self.chats_dir.mkdir(exist_ok=True)
+        self.catalog_file = self.chats_dir / CATALOG_FILE
+        self._catalog = None
+        # Header writes not yet in the catalog file
+        self.unsaved = 0
+        # The saver thread writes headers while the REPL lists and switches chats
+        self._lock = threading.RLock()
+
+    def journal_path(self, name):
+        return self.chats_dir / f"{name}.jsonl"
+
+    def meta_path(self, name):
+        return self.chats_dir / f"{name}.meta.json"
+
+    def segments_dir(self, name):
+        return self.chats_dir / f"{name}.segments"
+
+    def exists(self, name):
+        return self.journal_path(name).exists()
+
+    def names(self):
+        """Names of all stored chats"""
+        return [path.stem for path in self.chats_dir.glob("*.jsonl")]
+
+    def latest(self):
+        """Current chat from the catalog, else the most recently modified one"""
+        catalog = self.catalog()
+        if catalog["current"] in catalog["chats"]:
+            return catalog["current"]
+        if not catalog["chats"]:
+            return None
+        return max(catalog["chats"].values(), key=lambda entry: entry.get("last_modified") or "")["name"]
+
+    def catalog(self):
+        """Catalog of all chats, saved first if rows changed since the last save"""
+        with self._lock:
+            catalog = self.load_catalog()
+            if self.unsaved:
+                self.save_catalog()
+            return catalog
+
+    def load_catalog(self):
+        """In-memory catalog, read (and rebuilt or refreshed if stale) on first use"""
+        if self._catalog is None:
+            try:
+                with open(self.catalog_file, 'r', encoding='utf-8') as f:
+                    self._catalog = json.load(f)
+                saved_at = self.catalog_file.stat().st_mtime_ns
+            except (FileNotFoundError, json.JSONDecodeError):
+                self._catalog = None
+
+            # Listing names is cheap; only a missing or drifted catalog reads every header
+            if self._catalog is None or set(self._catalog.get("chats", {})) != set(self.names()):
+                self.rebuild_catalog()
+            else:
+                # Rows are saved lazily, so headers written after the last save may be ahead of it
+                stale = [name for name in self._catalog["chats"] if self.header_mtime(name) >= saved_at]
+                if stale:
+                    self.rebuild_catalog(stale)
+
+        return self._catalog
+
+    def header_mtime(self, name):
+        try:
+            return self.meta_path(name).stat().st_mtime_ns
+        except FileNotFoundError:
+            return 0
+
+    def rebuild_catalog(self, names=None):
+        """Rebuild catalog rows (all of them unless names are given) from chat headers"""
+        if names is None:
+            current = self._catalog.get("current") if self._catalog else None
+            self._catalog = {"current": current, "chats": {}}
+            names = self.names()
+        for name in names:
+            try:
+                meta = self.read_meta(name)
+            except (FileNotFoundError, json.JSONDecodeError):
+                meta = {"name": name}
+            self._catalog["chats"][name] = self.catalog_entry(name, meta)
+        self.save_catalog()
+
+    def catalog_entry(self, name, meta):
+        entry = {field: meta.get(field) for field in CATALOG_FIELDS}
+        entry["name"] = name
+        entry["bytes"] = self.journal_path(name).stat().st_size + meta.get("segment_bytes", 0)
+        return entry
+
+    def save_catalog(self):
+        with self._lock:
+            write_atomic(self.catalog_file, json.dumps(self._catalog, indent=2, ensure_ascii=False))
+            self.unsaved = 0
+
+    def set_current(self, name):
+        """Record which chat is current so startup can reopen it"""
+        with self._lock:
+            catalog = self.load_catalog()
+            if catalog["current"] != name or self.unsaved:
+                catalog["current"] = name
+                self.save_catalog()
+
+    def close(self):
+        """Save catalog rows still held in memory"""
+        with self._lock:
+            if self.unsaved:
+                self.save_catalog()
+
+    def read_meta(self, name):
+        with open(self.meta_path(name), 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def write_meta(self, name, meta):
+        """Write the chat header and update its catalog row (saved every CATALOG_SAVE_EVERY writes)"""
+        write_atomic(self.meta_path(name), json.dumps(meta, indent=2, ensure_ascii=False))
+        with self._lock:
+            self.load_catalog()["chats"][name] = self.catalog_entry(name, meta)
+            self.unsaved += 1
+            if self.unsaved >= CATALOG_SAVE_EVERY:
+                self.save_catalog()
+
+    @staticmethod
+    def count_chat_messages(messages):
+        """Messages shown to the user (system prompts excluded)"""
+        return sum(1 for msg in messages if msg.get("role") != "system")
+
+    @staticmethod
+    def encode(msg):
+        return json.dumps({"op": "msg", "msg": msg}, ensure_ascii=False) + "\n"
+
+    @staticmethod
+    def cut_torn_record(path):
+        """Drop a partial last line (a crash mid-append) so the next record starts on its own line"""
+        with open(path, 'rb+') as f:
+            end = f.seek(0, os.SEEK_END)
+            if end == 0:
+                return
+            f.seek(end - 1)
+            if f.read(1) == b"\n":
+                return
+            pos = end
+            while pos > 0:
+                step = min(4096, pos)
+                pos -= step
+                f.seek(pos)
+                newline = f.read(step).rfind(b"\n")
+                if newline != -1:
+                    f.truncate(pos + newline + 1)
+                    return
+            f.truncate(0)
+
+    def encode_tail(self, start, messages):
+        """A fresh tail journal starting at absolute message `start`"""
+        return json.dumps({"op": "base", "start": start}) + "\n" + "".join(self.encode(msg) for msg in messages)
+
+    def create(self, name, meta, messages):
+        """Create a chat with its initial messages"""
+        meta["message_count"] = self.count_chat_messages(messages)
+        meta["journal_records"] = len(messages) + 1
+        meta["segments"] = []
+        meta["segment_bytes"] = 0
+        meta["tail_start"] = 0
+        meta["tail_count"] = len(messages)
+        write_atomic(self.journal_path(name), self.encode_tail(0, messages))
+        meta["journal_bytes"] = self.journal_path(name).stat().st_size
+        if len(messages) >= SEGMENT_MESSAGES:
+            # Large chats (migrations) go straight into segments so loading them stays lazy
+            self.seal(name, meta)
+        else:
+            self.write_meta(name, meta)
+
+    def replay(self, name, meta):
+        """Replay the tail journal; returns (tail messages, record count)"""
+        messages = []
+        start = 0
+        records = 0
+
+        with open(self.journal_path(name), 'r', encoding='utf-8') as f:
+            for line in f:
+                records += 1
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # Torn write from a crash; compaction drops it
+                    continue
+                if record.get("op") in ("base", "reset"):
+                    messages = []
+                    start = record.get("start", 0)
+                elif record.get("op") == "msg":
+                    messages.append(record["msg"])
+
+        # A crash between sealing segments and rewriting the tail leaves sealed messages behind
+        skip = meta.get("tail_start", 0) - start
+        if skip > 0:
+            messages = messages[skip:]
+        return messages, records
+
+    def read_segment(self, name, segment):
+        with open(self.segments_dir(name) / segment["file"], 'r', encoding='utf-8') as f:
+            return [json.loads(line)["msg"] for line in f if line.strip()]
+
+    def read_head(self, name, meta):
+        """First message of the chat (the system prompt) without reading the rest"""
+        segments = meta.get("segments", [])
+        path = self.segments_dir(name) / segments[0]["file"] if segments else None
+        if path is None:
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.loads(f.readline())["msg"]
+
+    def load(self, name, min_messages=EAGER_MESSAGES):
+        """Load the tail (and recent segments); returns (meta, messages, elided)"""
+        meta = self.read_meta(name)
+        tail, records = self.replay(name, meta)
+
+        # A crash between a journal write and its header update leaves the header behind
+        counts = (records, len(tail), self.journal_path(name).stat().st_size)
+        stale = counts != (meta.get("journal_records"), meta.get("tail_count"), meta.get("journal_bytes"))
+        meta["journal_records"], meta["tail_count"], meta["journal_bytes"] = counts
+        if records - len(tail) > max(COMPACT_MIN_DEAD_RECORDS, len(tail)):
+            self.compact(name, meta, tail)
+        elif stale:
+            self.write_meta(name, meta)
+
+        segments = meta.get("segments", [])
+        loaded = tail
+        first_loaded = meta.get("tail_start", 0)
+        index = len(segments)
+        while index > 0 and len(loaded) < min_messages:
+            index -= 1
+            loaded = self.read_segment(name, segments[index]) + loaded
+            first_loaded = segments[index]["start"]
+
+        if first_loaded == 0:
+            return meta, loaded, 0
+        return meta, [self.read_head(name, meta)] + loaded, first_loaded - 1
+
+    def load_all(self, name):
+        """Load every message; returns (meta, messages)"""
+        meta, messages, _ = self.load(name, min_messages=float("inf"))
+        return meta, messages
+
+    def total_messages(self, name, meta=None):
+        """Number of messages in the chat, system prompt included"""
+        meta = meta or self.read_meta(name)
+        return meta.get("tail_start", 0) + meta.get("tail_count", 0)
+
+    def read_range(self, name, start, end):
+        """Messages with absolute indices [start, end), reading only the segments needed"""
+        meta = self.read_meta(name)
+        messages = []
+
+        for segment in meta.get("segments", []):
+            seg_start, seg_end = segment["start"], segment["start"] + segment["count"]
+            if seg_end <= start or seg_start >= end:
+                continue
+            chunk = self.read_segment(name, segment)
+            messages.extend(chunk[max(start - seg_start, 0):end - seg_start])
+
+        tail_start = meta.get("tail_start", 0)
+        if end > tail_start:
+            tail, _ = self.replay(name, meta)
+            messages.extend(tail[max(start - tail_start, 0):end - tail_start])
+
+        return messages
+
+    def append(self, name, meta, messages, start=None):
+        """Append new messages to the tail journal, sealing it when full
+
+        `start` is the absolute index of the first message. If an earlier attempt wrote
+        some of them but failed before its header update, the journal no longer has the
+        size the header records; those messages are counted and skipped, not written twice.
+        """
+        path = self.journal_path(name)
+        counted = messages
+        if messages:
+            self.cut_torn_record(path)
+        if messages and start is not None and path.stat().st_size != meta.get("journal_bytes", path.stat().st_size):
+            tail, meta["journal_records"] = self.replay(name, meta)
+            meta["tail_count"] = len(tail)
+            written = meta.get("tail_start", 0) + len(tail) - start
+            messages = messages[min(max(written, 0), len(messages)):]
+
+        if messages:
+            with open(path, 'a', encoding='utf-8') as f:
+                f.write("".join(self.encode(msg) for msg in messages))
+            meta["journal_records"] = meta.get("journal_records", 0) + len(messages)
+            meta["tail_count"] = meta.get("tail_count", 0) + len(messages)
+        if counted:
+            meta["message_count"] = meta.get("message_count", 0) + self.count_chat_messages(counted)
+            meta["journal_bytes"] = path.stat().st_size
+
+        if meta.get("tail_count", 0) >= SEGMENT_MESSAGES:
+            self.seal(name, meta)
+        else:
+            self.write_meta(name, meta)
+
+    def seal(self, name, meta):
+        """Move the tail into read-only segments of SEGMENT_MESSAGES messages each
+
+        Messages short of a full segment stay behind as the new tail.
+        """
+        tail, _ = self.replay(name, meta)
+        segments = meta.setdefault("segments", [])
+        sealed = len(tail) - len(tail) % SEGMENT_MESSAGES
+        start = meta.get("tail_start", 0)
+
+        for offset in range(0, sealed, SEGMENT_MESSAGES):
+            segment = {"file": f"{len(segments) + 1:06d}.jsonl", "start": start + offset, "count": SEGMENT_MESSAGES}
+            segment_path = self.segments_dir(name) / segment["file"]
+            segment_path.parent.mkdir(exist_ok=True)
+            write_atomic(segment_path, "".join(self.encode(msg) for msg in tail[offset:offset + SEGMENT_MESSAGES]))
+            segments.append(segment)
+            meta["segment_bytes"] = meta.get("segment_bytes", 0) + segment_path.stat().st_size
+
+        rest = tail[sealed:]
+        meta["tail_start"] = start + sealed
+        meta["tail_count"] = len(rest)
+        meta["journal_records"] = len(rest) + 1
+        tail_text = self.encode_tail(meta["tail_start"], rest)
+        meta["journal_bytes"] = len(tail_text.encode('utf-8'))
+        self.write_meta(name, meta)
+        write_atomic(self.journal_path(name), tail_text)
+
+    def reset(self, name, meta, messages, elided=0):
+        """Journal a replacement of the loaded messages (elided ones on disk are kept)"""
+        # Keep the head plus the elided span; everything after is replaced
+        keep = elided + 1 if elided else 0
+        replacement = messages[1:] if elided else messages
+
+        kept_segments = [seg for seg in meta.get("segments", []) if seg["start"] + seg["count"] <= keep]
+        dropped = meta.get("segments", [])[len(kept_segments):]
+
+        self.cut_torn_record(self.journal_path(name))
+        with open(self.journal_path(name), 'a', encoding='utf-8') as f:
+            f.write(json.dumps({"op": "reset", "start": keep}) + "\n")
+            f.write("".join(self.encode(msg) for msg in replacement))
+
+        meta["segments"] = kept_segments
+        meta["tail_start"] = keep
+        meta["tail_count"] = len(replacement)
+        meta["journal_records"] = meta.get("journal_records", 0) + 1 + len(replacement)
+        meta["journal_bytes"] = self.journal_path(name).stat().st_size
+        meta["message_count"] = elided + self.count_chat_messages(messages)
+
+        for segment in dropped:
+            path = self.segments_dir(name) / segment["file"]
+            meta["segment_bytes"] = max(meta.get("segment_bytes", 0) - path.stat().st_size, 0)
+            path.unlink()
+
+        if meta["journal_records"] - len(replacement) > max(COMPACT_MIN_DEAD_RECORDS, len(replacement)):
+            self.compact(name, meta, replacement)
+        else:
+            self.write_meta(name, meta)
+
+    def compact(self, name, meta, tail):
+        """Rewrite the tail journal with only its live messages"""
+        write_atomic(self.journal_path(name), self.encode_tail(meta.get("tail_start", 0), tail))
+        meta["journal_records"] = len(tail) + 1
+        meta["journal_bytes"] = self.journal_path(name).stat().st_size
+        meta["tail_count"] = len(tail)
+        self.write_meta(name, meta)
+
+    def delete(self, name):
+        self.journal_path(name).unlink()
+        self.meta_path(name).unlink(missing_ok=True)
+        shutil.rmtree(self.segments_dir(name), ignore_errors=True)
+
+        with self._lock:
+            catalog = self.load_catalog()
+            catalog["chats"].pop(name, None)
+            if catalog["current"] == name:
+                catalog["current"] = None
+            self.save_catalog()
+
+    def legacy_files(self):
+        """Old single-file `<name>.json` chats"""
+        return [path for path in self.chats_dir.glob("*.json")
+                if not path.name.endswith(".meta.json") and path.name != CATALOG_FILE]
+
+    def migrate_legacy(self):
+        """Convert `<name>.json` chats to the journal format, keeping a .bak copy"""
+        migrated = []
+        for legacy_file in self.legacy_files():
+            with open(legacy_file, 'r', encoding='utf-8') as f:
+                chat_data = json.load(f)
+
+            name = legacy_file.stem
+            messages = chat_data.pop("message_history", [])
+            chat_data["name"] = name
+            self.create(name, chat_data, messages)
+
+            # Keep the journal's mtime in line with the original so "latest chat" is unchanged
+            mtime = legacy_file.stat().st_mtime
+            os.utime(self.journal_path(name), (mtime, mtime))
+            legacy_file.rename(legacy_file.with_name(legacy_file.name + ".bak"))
+            migrated.append(name)
+        return migrated
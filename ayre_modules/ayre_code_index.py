@@ -0,0 +1,302 @@
+import ast
+import fnmatch
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from pathlib import Path
+
+from ayre_modules import ayre_config as config
+from ayre_modules.ayre_chat_store import write_atomic
+from ayre_modules.ayre_retrieval import BM25Index
+
+# Bump when chunking or the stored layout changes so stored indexes are rebuilt
+INDEX_VERSION = 2
+IGNORED_DIRS = {
+    ".git", ".hg", ".svn", "__pycache__", "node_modules", "venv", ".venv", "env", ".tox",
+    ".mypy_cache", ".pytest_cache", ".idea", ".vscode", "build", "dist", "ayre_cache", "ayre_chats"
+}
+IGNORED_SUFFIXES = {
+    ".pyc", ".pyo", ".so", ".dll", ".exe", ".bin", ".o", ".a", ".class", ".jar", ".zip", ".gz",
+    ".tar", ".png", ".jpg", ".jpeg", ".gif", ".webp", ".bmp", ".ico", ".pdf", ".mp3", ".mp4",
+    ".db", ".sqlite", ".lock", ".min.js"
+}
+# Lines that usually open a top-level unit in brace / keyword languages
+BOUNDARY = re.compile(
+    r"^\s{0,4}(?:export\s+)?(?:default\s+)?(?:public\s+|private\s+|protected\s+|static\s+|async\s+|abstract\s+)*"
+    r"(?:def|class|function|func|fn|interface|struct|enum|impl|trait|module|type)\b"
+)
+
+
+def load_ignore_patterns(root):
+    """Patterns from the root .gitignore (negations are not supported)"""
+    try:
+        with open(Path(root) / ".gitignore", 'r', encoding='utf-8') as f:
+            lines = [line.strip() for line in f]
+    except OSError:
+        return []
+    return [line for line in lines if line and not line.startswith(("#", "!"))]
+
+
+def is_ignored(rel_path, is_dir, patterns):
+    name = rel_path.rsplit("/", 1)[-1]
+    for pattern in patterns:
+        if pattern.endswith("/"):
+            if not is_dir:
+                continue
+            pattern = pattern.rstrip("/")
+        target = rel_path if "/" in pattern.lstrip("/") else name
+        if fnmatch.fnmatch(target, pattern.lstrip("/")):
+            return True
+    return False
+
+
+def split_range(first, last, max_lines):
+    """Line ranges (1-based, inclusive) no longer than max_lines"""
+    return [(start, min(start + max_lines - 1, last)) for start in range(first, last + 1, max_lines)]
+
+
+def python_units(text):
+    """(name, first_line, last_line) for top-level defs, with large classes split by method"""
+    tree = ast.parse(text)
+    units = []
+    for node in tree.body:
+        if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            continue
+        first = min([node.lineno] + [d.lineno for d in node.decorator_list])
+        last = node.end_lineno
+        methods = [n for n in node.body if isinstance(n, (ast.FunctionDef, ast.AsyncFunctionDef))]
+        if isinstance(node, ast.ClassDef) and methods and last - first + 1 > config.CODE_CHUNK_LINES:
+            spans = [(min([m.lineno] + [d.lineno for d in m.decorator_list]), m) for m in methods]
+            # Class header (docstring, attributes) up to the first method
+            units.append((node.name, first, spans[0][0] - 1))
+            for method_first, method in spans:
+                units.append((f"{node.name}.{method.name}", method_first, method.end_lineno))
+        else:
+            units.append((node.name, first, last))
+    return units
+
+
+def boundary_units(lines):
+    """(name, first_line, last_line) split at lines that look like top-level definitions"""
+    starts = [number for number, line in enumerate(lines, 1) if BOUNDARY.match(line)]
+    units = []
+    for start, end in zip(starts, starts[1:] + [len(lines) + 1]):
+        units.append((lines[start - 1].strip()[:60], start, end - 1))
+    return units
+
+
+def chunk_source(rel_path, text):
+    """Split a source file into (name, first_line, last_line, text) chunks on function / class boundaries"""
+    lines = text.splitlines()
+    if not lines:
+        return []
+    max_lines = config.CODE_CHUNK_LINES
+
+    units = []
+    if rel_path.endswith(".py"):
+        try:
+            units = python_units(text)
+        except (SyntaxError, ValueError):
+            units = []
+    if not units:
+        units = boundary_units(lines)
+
+    # Code between units (imports, constants, module docstrings) becomes chunks of its own
+    ranges = []
+    position = 1
+    for name, first, last in sorted(units, key=lambda unit: unit[1]):
+        if first > position:
+            ranges.append((rel_path, position, first - 1))
+        if last >= first:
+            ranges.append((name, first, last))
+        position = max(position, last + 1)
+    if position <= len(lines):
+        ranges.append((rel_path, position, len(lines)))
+
+    chunks = []
+    for name, first, last in ranges:
+        for start, end in split_range(first, last, max_lines):
+            body = "\n".join(lines[start - 1:end])
+            if body.strip():
+                chunks.append((name, start, end, body))
+    return chunks
+
+
+class CodeIndex:
+    """Persistent BM25 index over a directory's source files, chunked by function and class
+
+    Stored under ayre_cache/code_index/<hash of root>/: index.json holds the file list,
+    chunk positions and postings, and chunks/<hash of path>.json holds each file's chunk
+    text, so an edit rewrites the postings and that one file's chunks. refresh() walks
+    the tree at most every AYRE_CODE_REFRESH_SECONDS, re-reads only files whose size or
+    mtime changed and re-chunks only files whose content hash changed.
+    """
+    def __init__(self, root, cache_dir=None):
+        self.root = Path(root).resolve()
+        cache_dir = Path(cache_dir or Path(config.CACHE_DIR) / "code_index")
+        key = hashlib.sha256(str(self.root).encode('utf-8')).hexdigest()[:16]
+        self.dir = cache_dir / key
+        self.path = self.dir / "index.json"
+        self.chunks_dir = self.dir / "chunks"
+        self.chunks_dir.mkdir(parents=True, exist_ok=True)
+        # Single-file index from before chunk text was split out
+        (cache_dir / f"{key}.json").unlink(missing_ok=True)
+        self._lock = threading.Lock()
+        self.files = {}
+        # chunk id -> {"path", "name", "first_line", "last_line"} (text lives in chunks/)
+        self.chunks = {}
+        self.index = BM25Index()
+        self.refreshed_at = None
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+        if data.get("version") != INDEX_VERSION or data.get("root") != str(self.root):
+            return
+        self.files = data["files"]
+        self.chunks = data["chunks"]
+        self.index = BM25Index.from_dict(data["index"])
+
+    def save(self):
+        write_atomic(self.path, json.dumps({
+            "version": INDEX_VERSION,
+            "root": str(self.root),
+            "files": self.files,
+            "chunks": self.chunks,
+            "index": self.index.to_dict()
+        }))
+
+    def text_path(self, rel_path):
+        return self.chunks_dir / f"{hashlib.sha256(rel_path.encode('utf-8')).hexdigest()[:16]}.json"
+
+    def walk(self):
+        """Relative paths of indexable files under the root"""
+        patterns = load_ignore_patterns(self.root)
+        max_bytes = config.CODE_MAX_FILE_KB * 1024
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            rel_dir = Path(dirpath).relative_to(self.root).as_posix()
+            prefix = "" if rel_dir == "." else f"{rel_dir}/"
+            dirnames[:] = sorted(
+                name for name in dirnames
+                if name not in IGNORED_DIRS and not is_ignored(prefix + name, True, patterns)
+            )
+            for name in sorted(filenames):
+                rel_path = prefix + name
+                if any(name.lower().endswith(suffix) for suffix in IGNORED_SUFFIXES):
+                    continue
+                if is_ignored(rel_path, False, patterns):
+                    continue
+                try:
+                    stat = os.stat(Path(dirpath) / name)
+                except OSError:
+                    continue
+                if 0 < stat.st_size <= max_bytes:
+                    yield rel_path, stat
+
+    def drop_file(self, rel_path):
+        for chunk_id in self.files.pop(rel_path, {}).get("chunks", []):
+            self.chunks.pop(chunk_id, None)
+            self.index.remove(chunk_id)
+
+    def refresh(self, force=False):
+        """Bring the index up to date with the directory; returns (added_or_changed, removed)
+
+        Without force, a refresh within AYRE_CODE_REFRESH_SECONDS of the last one is skipped.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if not force and self.refreshed_at is not None and now - self.refreshed_at < config.CODE_REFRESH_SECONDS:
+                return 0, 0
+            self.refreshed_at = now
+
+            changed = 0
+            # Touched but unchanged files: only their mtime is new, but it must be saved
+            touched = 0
+            seen = set()
+            for rel_path, stat in self.walk():
+                seen.add(rel_path)
+                known = self.files.get(rel_path)
+                if known and known["size"] == stat.st_size and known["mtime_ns"] == stat.st_mtime_ns:
+                    continue
+
+                try:
+                    raw = (self.root / rel_path).read_bytes()
+                except OSError:
+                    continue
+                digest = hashlib.sha256(raw).hexdigest()
+                if known and known["sha256"] == digest:
+                    known.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+                    touched += 1
+                    continue
+                self.drop_file(rel_path)
+                chunk_ids = []
+                texts = {}
+                # Binary files are remembered (so they are not re-read) but not chunked
+                text = "" if b"\0" in raw[:8192] else raw.decode('utf-8', errors='replace')
+                for name, first, last, body in chunk_source(rel_path, text):
+                    chunk_id = f"{rel_path}:{first}"
+                    self.chunks[chunk_id] = {"path": rel_path, "name": name, "first_line": first, "last_line": last}
+                    texts[chunk_id] = body
+                    # The path and unit name are searchable too
+                    self.index.add(chunk_id, f"{rel_path} {name}\n{body}")
+                    chunk_ids.append(chunk_id)
+                if texts:
+                    write_atomic(self.text_path(rel_path), json.dumps(texts))
+                else:
+                    self.text_path(rel_path).unlink(missing_ok=True)
+                self.files[rel_path] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+                                        "sha256": digest, "chunks": chunk_ids}
+                changed += 1
+
+            removed = [rel_path for rel_path in self.files if rel_path not in seen]
+            for rel_path in removed:
+                self.drop_file(rel_path)
+                self.text_path(rel_path).unlink(missing_ok=True)
+
+            if changed or touched or removed or not self.path.exists():
+                self.save()
+            return changed, len(removed)
+
+    def search(self, query, k=None):
+        """Most relevant chunks for a query (text read from each hit's chunk file)"""
+        with self._lock:
+            hits = [self.chunks[chunk_id] | {"id": chunk_id}
+                    for chunk_id, _ in self.index.search(query, k or config.CODE_TOP_K)]
+
+        texts = {}
+        results = []
+        for chunk in hits:
+            path = chunk["path"]
+            if path not in texts:
+                try:
+                    with open(self.text_path(path), 'r', encoding='utf-8') as f:
+                        texts[path] = json.load(f)
+                except (OSError, json.JSONDecodeError):
+                    texts[path] = {}
+            text = texts[path].get(chunk.pop("id"))
+            if text is not None:
+                results.append(chunk | {"text": text})
+        return results
+
+    def stats(self):
+        return len(self.files), len(self.chunks)
+
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+
+def get_code_index(root):
+    """Process-wide index for a directory"""
+    key = str(Path(root).resolve())
+    with _shared_lock:
+        if key not in _shared:
+            _shared[key] = CodeIndex(key)
+        return _shared[key]
@@ -0,0 +1,152 @@
+import os
+import sys
+import dotenv
+
+# Single source for model names and generation settings (override in .env)
+dotenv.load_dotenv()
+
+
+def _warn_invalid(name, value, default):
+    # Printed at import, before the console exists
+    print(f"⚠️ Ignoring {name}={value!r} (not a valid value); using {default}", file=sys.stderr)
+
+
+def _env_number(name, cast):
+    """Numeric setting, or None (callers fall back with `or default`) when unset or malformed"""
+    value = os.getenv(name)
+    if not value:
+        return None
+    try:
+        return cast(value)
+    except ValueError:
+        _warn_invalid(name, value, "the default")
+        return None
+
+
+def _env_count(name, default):
+    """Non-negative int setting where 0 is valid (e.g. no retries); bad values fall back to the default"""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    try:
+        count = int(value)
+    except ValueError:
+        count = -1
+    if count < 0:
+        _warn_invalid(name, value, default)
+        return default
+    return count
+
+
+def _env_flag(name, default):
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+# Models
+CHAT_MODEL = os.getenv("AYRE_CHAT_MODEL", "gemini-2.5-flash")
+ANALYSIS_MODEL = os.getenv("AYRE_ANALYSIS_MODEL", CHAT_MODEL)
+
+# Generation settings shared by every model handle (unset keys use API defaults)
+GENERATION_CONFIG = {
+    key: value for key, value in {
+        "temperature": _env_number("AYRE_TEMPERATURE", float),
+        "top_p": _env_number("AYRE_TOP_P", float),
+        "top_k": _env_number("AYRE_TOP_K", int),
+        "max_output_tokens": _env_number("AYRE_MAX_OUTPUT_TOKENS", int),
+    }.items() if value is not None
+}
+SAFETY_SETTINGS = None
+
+# Rendering
+STREAM_REPLIES = _env_flag("AYRE_STREAM", True)
+
+# Context window (token estimates are ~4 characters per token)
+CONTEXT_TOKEN_BUDGET = _env_number("AYRE_CONTEXT_TOKENS", int) or 24000
+CONTEXT_MIN_RECENT = _env_number("AYRE_CONTEXT_MIN_RECENT", int) or 2
+SUMMARY_MODEL = os.getenv("AYRE_SUMMARY_MODEL", CHAT_MODEL)
+
+# Recall of older turns outside the window: messages pulled in per question and their token allowance
+RECALL = _env_flag("AYRE_RECALL", True)
+RECALL_MESSAGES = _env_number("AYRE_RECALL_MESSAGES", int) or 4
+RECALL_TOKENS = _env_number("AYRE_RECALL_TOKENS", int) or 1500
+
+# Server-side context caching of the persona plus pinned attachments (opt-in)
+CONTEXT_CACHE = _env_flag("AYRE_CONTEXT_CACHE", False)
+CONTEXT_CACHE_TTL_MINUTES = _env_number("AYRE_CONTEXT_CACHE_TTL", int) or 60
+CONTEXT_CACHE_MIN_TOKENS = 1024
+CACHE_DIR = os.getenv("AYRE_CACHE_DIR", "ayre_cache")
+
+# Chat storage: "json" (journal files in ayre_chats/) or "sqlite" (adds `search`)
+CHAT_BACKEND = os.getenv("AYRE_CHAT_BACKEND", "json").strip().lower()
+CHAT_DB = os.getenv("AYRE_CHAT_DB", "ayre_chats/ayre_chats.db")
+
+# Web page cache (ayre_cache/http_cache.db)
+HTTP_CACHE = _env_flag("AYRE_HTTP_CACHE", True)
+HTTP_CACHE_TTL = _env_number("AYRE_HTTP_CACHE_TTL", int) or 3600
+HTTP_CACHE_MAX_MB = _env_number("AYRE_HTTP_CACHE_MAX_MB", int) or 100
+
+# Memoized analysis responses (opt-in): same model, settings, prompt and content -> no API call
+RESPONSE_CACHE = _env_flag("AYRE_RESPONSE_CACHE", False)
+RESPONSE_CACHE_TTL = _env_number("AYRE_RESPONSE_CACHE_TTL", int) or 7 * 24 * 3600
+RESPONSE_CACHE_MAX_MB = _env_number("AYRE_RESPONSE_CACHE_MAX_MB", int) or 50
+
+# Shared HTTP client for web fetching
+HTTP_CONNECT_TIMEOUT = _env_number("AYRE_HTTP_CONNECT_TIMEOUT", float) or 5.0
+HTTP_READ_TIMEOUT = _env_number("AYRE_HTTP_READ_TIMEOUT", float) or 20.0
+HTTP_RETRIES = _env_count("AYRE_HTTP_RETRIES", 3)
+HTTP_POOL_HOSTS = _env_number("AYRE_HTTP_POOL_HOSTS", int) or 16
+HTTP_POOL_PER_HOST = _env_number("AYRE_HTTP_POOL_PER_HOST", int) or 4
+WEB_FETCH_WORKERS = _env_number("AYRE_WEB_FETCH_WORKERS", int) or 6
+
+# Site crawler (`crawl` command)
+CRAWL_DEPTH = _env_number("AYRE_CRAWL_DEPTH", int) or 2
+CRAWL_MAX_PAGES = _env_number("AYRE_CRAWL_MAX_PAGES", int) or 20
+CRAWL_DELAY = _env_number("AYRE_CRAWL_DELAY", float) or 0.25
+CRAWL_SUMMARY_WORKERS = _env_number("AYRE_CRAWL_SUMMARY_WORKERS", int) or 4
+
+# HTML extraction: "auto" (lxml when installed, else html.parser), "lxml", "html.parser" or "bs4" (legacy)
+HTML_PARSER = os.getenv("AYRE_HTML_PARSER", "auto").strip().lower()
+
+# Web fetch limits: byte ceiling per page and how much page text is enough for analysis
+WEB_MAX_BYTES = (_env_number("AYRE_WEB_MAX_MB", float) or 5) * 1024 * 1024
+WEB_TEXT_BUDGET = _env_number("AYRE_WEB_TEXT_BUDGET", int) or 100000
+
+# Map-reduce summarization of long pages: chunk size (estimated tokens) and parallel map calls
+CHUNK_TOKENS = _env_number("AYRE_CHUNK_TOKENS", int) or 3000
+SUMMARY_WORKERS = _env_number("AYRE_SUMMARY_WORKERS", int) or 4
+
+# Uploaded files are reused until the server deletes them (about 48h after upload)
+UPLOAD_TTL_HOURS = _env_number("AYRE_UPLOAD_TTL_HOURS", float) or 48
+
+# Files processed at once from the GUI queue (keep under the API rate limit)
+FILE_WORKERS = _env_number("AYRE_FILE_WORKERS", int) or 4
+
+# `context` files: inline up to this size, larger ones become chunked attachments retrieved per question
+CONTEXT_INLINE_KB = _env_number("AYRE_CONTEXT_INLINE_KB", int) or 48
+ATTACHMENT_CHUNK_KB = _env_number("AYRE_ATTACHMENT_CHUNK_KB", int) or 4
+ATTACHMENT_TOP_K = _env_number("AYRE_ATTACHMENT_TOP_K", int) or 4
+PREVIEW_LINES = _env_number("AYRE_PREVIEW_LINES", int) or 40
+
+# Code retrieval for `contextdir`: chunks sent per question, chunk size and largest indexed file
+CODE_TOP_K = _env_number("AYRE_CODE_TOP_K", int) or 6
+CODE_CHUNK_LINES = _env_number("AYRE_CODE_CHUNK_LINES", int) or 80
+CODE_MAX_FILE_KB = _env_number("AYRE_CODE_MAX_FILE_KB", int) or 512
+# Chat turns re-scan an indexed directory for edits at most this often (seconds)
+CODE_REFRESH_SECONDS = _env_number("AYRE_CODE_REFRESH_SECONDS", float) or 10.0
+
+# Gemini calls: per-attempt timeout and overall deadline (seconds), retries with jittered backoff,
+# and a circuit breaker that fails calls fast after repeated failures
+GEMINI_TIMEOUT = _env_number("AYRE_GEMINI_TIMEOUT", float) or 90.0
+GEMINI_DEADLINE = _env_number("AYRE_GEMINI_DEADLINE", float) or 180.0
+# A streamed reply's request timeout, which also bounds the rest of the stream after its first chunk
+GEMINI_STREAM_TIMEOUT = _env_number("AYRE_GEMINI_STREAM_TIMEOUT", float) or 600.0
+GEMINI_RETRIES = _env_count("AYRE_GEMINI_RETRIES", 3)
+GEMINI_BACKOFF_BASE = _env_number("AYRE_GEMINI_BACKOFF_BASE", float) or 1.0
+GEMINI_BACKOFF_MAX = _env_number("AYRE_GEMINI_BACKOFF_MAX", float) or 20.0
+GEMINI_BREAKER_FAILURES = _env_number("AYRE_GEMINI_BREAKER_FAILURES", int) or 5
+GEMINI_BREAKER_COOLDOWN = _env_number("AYRE_GEMINI_BREAKER_COOLDOWN", float) or 30.0
+# Per-attempt metrics as JSON lines in ayre_cache/gemini_calls.jsonl
+GEMINI_METRICS = _env_flag("AYRE_GEMINI_METRICS", True)
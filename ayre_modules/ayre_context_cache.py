@@ -0,0 +1,165 @@
+import hashlib
+import json
+import threading
+import time
+from datetime import timedelta
+from pathlib import Path
+
+import google.generativeai as genai
+from google.api_core import exceptions as api_exceptions
+from google.generativeai import caching
+from rich.markup import escape
+
+from ayre_modules import ayre_config as config
+from ayre_modules.ayre_chat_store import write_atomic
+
+# Recreate caches this close to expiry rather than risk using an expired one
+EXPIRY_MARGIN_SECONDS = 120
+# After a failed create, send that prefix uncached for this long before trying again
+FAILED_RETRY_SECONDS = 600
+
+
+class ContextCache:
+    """Server-side cached persona + attachment prefixes, reused across turns and chats"""
+    def __init__(self, console, cache_dir=None, ttl_minutes=None):
+        self.console = console
+        self.ttl = timedelta(minutes=ttl_minutes or config.CONTEXT_CACHE_TTL_MINUTES)
+        self.index_file = Path(cache_dir or config.CACHE_DIR) / "context_caches.json"
+        self.index_file.parent.mkdir(exist_ok=True)
+        self.index = self.load_index()
+        self.models = {}
+        # key -> when creating its cache last failed
+        self.failed = {}
+        self._lock = threading.Lock()
+
+    def load_index(self):
+        """Load cache names that survive across sessions"""
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def save_index(self):
+        """Persist live cache names, dropping expired ones"""
+        now = time.time()
+        self.index = {key: entry for key, entry in self.index.items() if entry["expires"] > now}
+        write_atomic(self.index_file, json.dumps(self.index, indent=2))
+
+    @staticmethod
+    def make_key(model_name, system_instruction, attachments):
+        """Hash of everything that goes into the cached prefix"""
+        digest = hashlib.sha256()
+        for part in [model_name, system_instruction] + [msg["content"] for msg in attachments]:
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def get_model(self, model_name, system_instruction, attachments, estimated_tokens, owner=None):
+        """Return a model bound to a cached prefix, or None if caching isn't possible
+
+        `owner` (the chat) lets a cache it no longer uses, e.g. after an attachment
+        was added or removed, be deleted once no other chat uses it either.
+        """
+        if estimated_tokens < config.CONTEXT_CACHE_MIN_TOKENS:
+            # The API rejects caches below its minimum size
+            return None
+
+        key = self.make_key(model_name, system_instruction, attachments)
+
+        with self._lock:
+            failed_at = self.failed.get(key)
+            if failed_at is not None:
+                if time.time() - failed_at < FAILED_RETRY_SECONDS:
+                    return None
+                del self.failed[key]
+
+            entry = self.index.get(key)
+            if entry and entry["expires"] - EXPIRY_MARGIN_SECONDS > time.time():
+                model = self.models.get(key)
+                if model is None:
+                    try:
+                        # Looks the cache up on the server, which may have deleted or evicted it
+                        model = genai.GenerativeModel.from_cached_content(
+                            entry["name"],
+                            generation_config=config.GENERATION_CONFIG or None,
+                            safety_settings=config.SAFETY_SETTINGS or None
+                        )
+                    except (api_exceptions.NotFound, api_exceptions.PermissionDenied):
+                        # Deleted or evicted: forget it and create a fresh cache below
+                        del self.index[key]
+                        self.save_index()
+                        entry = None
+                    except Exception as e:
+                        self.console.print(f"[yellow]⚠️ Context cache lookup failed, sending prompt uncached: {escape(str(e))}[/yellow]")
+                        return None
+                    else:
+                        self.models[key] = model
+                if model is not None:
+                    if self.claim(key, owner, model_name):
+                        self.save_index()
+                    return model
+
+            try:
+                cached = caching.CachedContent.create(
+                    model=model_name,
+                    display_name=f"ayre-{key[:12]}",
+                    system_instruction=system_instruction,
+                    contents=[{"role": "user", "parts": [msg["content"]]} for msg in attachments] or None,
+                    ttl=self.ttl
+                )
+            except Exception as e:
+                self.failed[key] = time.time()
+                self.console.print(f"[yellow]⚠️ Context cache unavailable, sending prompt uncached: {escape(str(e))}[/yellow]")
+                return None
+
+            if entry:
+                # The old cache is about to expire; stop paying for its storage now
+                self.delete_cached(entry["name"])
+                self.models.pop(key, None)
+            self.index[key] = {"name": cached.name, "model": model_name,
+                               "expires": time.time() + self.ttl.total_seconds(),
+                               "owners": entry.get("owners", []) if entry else []}
+            self.claim(key, owner, model_name)
+            self.save_index()
+
+            model = genai.GenerativeModel.from_cached_content(
+                cached,
+                generation_config=config.GENERATION_CONFIG or None,
+                safety_settings=config.SAFETY_SETTINGS or None
+            )
+            self.models[key] = model
+            return model
+
+    def claim(self, key, owner, model_name):
+        """Record that owner now uses key's cache and release the other caches it held for the model
+
+        A released cache nobody else uses is deleted. Returns whether the index changed.
+        """
+        if owner is None:
+            return False
+        owners = self.index[key].setdefault("owners", [])
+        changed = owner not in owners
+        if changed:
+            owners.append(owner)
+
+        for other_key, other in list(self.index.items()):
+            if other_key == key or other.get("model") != model_name or owner not in other.get("owners", []):
+                continue
+            other["owners"].remove(owner)
+            changed = True
+            if not other["owners"]:
+                # Superseded, e.g. an attachment was added or removed: stop paying for its storage
+                self.delete_cached(other["name"])
+                del self.index[other_key]
+                self.models.pop(other_key, None)
+
+        return changed
+
+    @staticmethod
+    def delete_cached(name):
+        """Delete a server-side cache, ignoring ones that are already gone"""
+        try:
+            caching.CachedContent.get(name).delete()
+        except Exception:
+            pass
@@ -0,0 +1,267 @@
+import threading
+
+from rich.markup import escape
+
+from ayre_modules.ayre_model_registry import get_model
+from ayre_modules.ayre_attachments import get_attachment_store
+from ayre_modules.ayre_code_index import get_code_index
+from ayre_modules.ayre_gemini_client import get_gemini_client
+from ayre_modules.ayre_recall import SPEAKERS
+from ayre_modules import ayre_config as config
+
+CHARS_PER_TOKEN = 4
+# After folding, keep the window this far under budget so we don't summarize every turn
+FOLD_TARGET_RATIO = 0.75
+ROLE_MAP = {"user": "user", "assistant": "model"}
+
+
+def estimate_tokens(text):
+    """Estimate token count for a message (len() is O(1), so this needs no cache)"""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def empty_context_state():
+    """Fresh summary state for a chat"""
+    return {"summary": "", "summarized_upto": 0}
+
+
+class ContextManager:
+    def __init__(self, console, chat_manager, token_budget=None, min_recent=None, context_cache=None):
+        self.console = console
+        self.chat_manager = chat_manager
+        self.token_budget = token_budget or config.CONTEXT_TOKEN_BUDGET
+        self.min_recent = min_recent if min_recent is not None else config.CONTEXT_MIN_RECENT
+        self.context_cache = context_cache
+        # Role-tagged contents converted so far, parallel to message_history
+        self.converted = []
+        # A cancelled turn's worker may still be converting while the next turn starts
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        """Summary state of the current chat (persisted by ChatManager)"""
+        return self.chat_manager.context_state
+
+    def build_request(self, message_history, user_input, state=None):
+        """Return (model, contents) for the next chat turn
+
+        Folding updates `state` (the chat's summary state unless a private copy is passed).
+        """
+        state = self.state if state is None else state
+        system_instruction = "\n".join(msg["content"] for msg in message_history if msg["role"] == "system")
+
+        model = None
+        pinned = set()
+        if self.context_cache:
+            attachments = [msg for msg in message_history if msg.get("attachment")]
+            prefix_tokens = estimate_tokens(system_instruction) + sum(
+                estimate_tokens(msg["content"]) for msg in attachments
+            )
+            model = self.context_cache.get_model(config.CHAT_MODEL, system_instruction, attachments, prefix_tokens,
+                                                 owner=self.chat_manager.current_chat)
+            if model is not None:
+                # Attachments already live in the cached prefix
+                pinned = {id(msg) for msg in attachments}
+
+        if model is None:
+            model = get_model(config.CHAT_MODEL, system_instruction=system_instruction)
+
+        question = user_input
+        user_input = self.add_excerpts(message_history, user_input)
+        fixed_tokens = 0 if pinned else estimate_tokens(system_instruction)
+        recalled = ""
+        if self.chat_manager.recall_index is not None:
+            # Recall from before where the window would start without it, then reserve only what came back
+            budget = self.token_budget - fixed_tokens - estimate_tokens(user_input) - estimate_tokens(state["summary"])
+            provisional = self.find_window_start(message_history, budget, pinned, state)
+            recalled = self.recall(message_history, provisional, question)
+            if recalled:
+                fixed_tokens += estimate_tokens(recalled)
+        start = self.build_window(message_history, user_input, fixed_tokens, pinned, state)
+        contents = self.build_contents(message_history, start, pinned, user_input, recalled, state)
+        return model, contents
+
+    def recall(self, message_history, start, question):
+        """Older messages outside the window that are most relevant to the question"""
+        index = self.chat_manager.recall_index
+        if index is None:
+            return ""
+        elided = self.chat_manager.elided
+        try:
+            index.sync(message_history, elided, self.chat_manager.read_messages)
+        except OSError as e:
+            self.console.print(f"[yellow]⚠️ Could not update the recall index: {e}[/yellow]")
+            return ""
+
+        # Absolute index of the first message sent in the window
+        before = elided + max(start, 1)
+
+        def message_at(position):
+            if position > elided:
+                return message_history[position - elided]
+            found = self.chat_manager.read_messages(position, position + 1)
+            return found[0] if found else None
+
+        picked = {}
+        budget = config.RECALL_TOKENS * CHARS_PER_TOKEN
+        for position in index.search(question, before, config.RECALL_MESSAGES):
+            msg = message_at(position)
+            if msg is None:
+                continue
+            # Bring the other half of the exchange along (question for an answer, answer for a question)
+            partner = position + 1 if msg["role"] == "user" else position - 1
+            for candidate, found in ((position, msg), (partner, None)):
+                if candidate in picked or not 1 <= candidate < before or budget <= 0:
+                    continue
+                found = found or message_at(candidate)
+                if found is None or found.get("role") not in SPEAKERS:
+                    continue
+                text = found["content"][:budget]
+                picked[candidate] = f"{SPEAKERS[found['role']]}: {text}"
+                budget -= len(text)
+
+        return "\n\n".join(picked[position] for position in sorted(picked))
+
+    def add_excerpts(self, message_history, user_input):
+        """Prefix the input with the chunks of large attachments and indexed code most relevant to it"""
+        sections = []
+        for msg in message_history:
+            if msg.get("chunks"):
+                for chunk in get_attachment_store().search(msg["chunks"], user_input):
+                    sections.append(
+                        f"[{msg.get('filename', 'attachment')}, lines {chunk['first_line']}-{chunk['last_line']}]\n{chunk['text']}"
+                    )
+            elif msg.get("codebase"):
+                sections.extend(self.code_excerpts(msg["codebase"], user_input))
+
+        if not sections:
+            return user_input
+        excerpts = "\n\n".join(sections)
+        return f"(Relevant excerpts from attached files and code)\n{excerpts}\n\n{user_input}"
+
+    def code_excerpts(self, root, user_input):
+        """Top-ranked chunks of an indexed directory (picking up edits made since the last turn)"""
+        index = get_code_index(root)
+        try:
+            index.refresh()
+        except OSError as e:
+            self.console.print(f"[yellow]⚠️ Could not refresh the index of {root}: {e}[/yellow]")
+        return [
+            f"[{chunk['path']}, lines {chunk['first_line']}-{chunk['last_line']}]\n{chunk['text']}"
+            for chunk in index.search(user_input)
+        ]
+
+    def build_window(self, message_history, user_input, fixed_tokens, pinned=frozenset(), state=None):
+        """Fold old turns as needed and return the index where the sent window starts"""
+        state = self.state if state is None else state
+        if state["summarized_upto"] > len(message_history):
+            state.update(empty_context_state())
+
+        fixed_tokens += estimate_tokens(user_input) + estimate_tokens(state["summary"])
+        start = self.find_window_start(message_history, self.token_budget - fixed_tokens, pinned, state)
+
+        if start > state["summarized_upto"]:
+            # Fold a little extra so the next few turns fit without another summary call
+            target = int(self.token_budget * FOLD_TARGET_RATIO) - fixed_tokens
+            start = max(start, self.find_window_start(message_history, target, pinned, state))
+            self.fold(message_history, start, pinned, state)
+
+        # If folding failed, older turns are left out of this request and retried next turn
+        return start
+
+    def find_window_start(self, message_history, budget, pinned=frozenset(), state=None):
+        """Index of the oldest message that still fits the budget (newest first)"""
+        used = 0
+        kept = 0
+        start = len(message_history)
+        floor = (self.state if state is None else state)["summarized_upto"]
+
+        for index in range(len(message_history) - 1, floor - 1, -1):
+            msg = message_history[index]
+            if msg["role"] == "system" or id(msg) in pinned:
+                start = index
+                continue
+
+            tokens = estimate_tokens(msg["content"])
+            if used + tokens > budget and kept >= self.min_recent:
+                break
+            used += tokens
+            kept += 1
+            start = index
+
+        return start
+
+    def convert(self, message_history):
+        """Extend the converted contents with messages appended since the last turn"""
+        done = len(self.converted)
+        if done > len(message_history) or (done and self.converted[done - 1][0] is not message_history[done - 1]):
+            # History was replaced (chat switched or reloaded)
+            self.converted = []
+            done = 0
+
+        for msg in message_history[done:]:
+            role = ROLE_MAP.get(msg["role"])
+            self.converted.append((msg, role and {"role": role, "parts": [msg["content"]]}))
+
+    def build_contents(self, message_history, start, pinned, user_input, recalled="", state=None):
+        """Role-tagged contents: summary, recalled turns, recent turns, then the new input"""
+        state = self.state if state is None else state
+        with self._lock:
+            self.convert(message_history)
+            converted = self.converted[start:len(message_history)]
+
+        window = []
+        if state["summary"]:
+            window.append({
+                "role": "user",
+                "parts": [f"(Summary of our earlier conversation)\n{state['summary']}"]
+            })
+        if recalled:
+            window.append({
+                "role": "user",
+                "parts": [f"(Earlier messages relevant to this question)\n{recalled}"]
+            })
+
+        window += [content for msg, content in converted if content and id(msg) not in pinned]
+        window.append({"role": "user", "parts": [user_input]})
+
+        # Merge consecutive turns from the same role (e.g. context dumps followed by a question)
+        contents = []
+        for content in window:
+            if contents and contents[-1]["role"] == content["role"]:
+                contents[-1] = {"role": content["role"], "parts": contents[-1]["parts"] + content["parts"]}
+            else:
+                contents.append(content)
+
+        return contents
+
+    def fold(self, message_history, upto, pinned=frozenset(), state=None):
+        """Fold messages before `upto` into the rolling summary"""
+        state = self.state if state is None else state
+        span = [msg for msg in message_history[state["summarized_upto"]:upto]
+                if msg["role"] != "system" and id(msg) not in pinned]
+        if not span:
+            state["summarized_upto"] = upto
+            return
+
+        self.console.print(f"[dim]🧠 Folding {len(span)} older message(s) into the chat summary...[/dim]")
+
+        transcript = "\n".join(
+            f"{'Raven' if msg['role'] == 'user' else 'Ayre'}: {msg['content']}" for msg in span
+        )
+        prompt = (
+            "You maintain a running summary of a conversation between Raven (the user) and Ayre "
+            "(the assistant). Update the summary with the new messages below. Keep decisions, facts, "
+            "names, file names, code details and open questions; drop small talk. "
+            "Answer with the updated summary only, in under 400 words.\n\n"
+            f"Current summary:\n{state['summary'] or '(empty)'}\n\n"
+            f"New messages:\n{transcript}"
+        )
+
+        try:
+            response = get_gemini_client().generate(get_model(config.SUMMARY_MODEL), prompt, call="history_summary")
+            state["summary"] = response.text.strip()
+            state["summarized_upto"] = upto
+        except Exception as e:
+            # Keep the old summary; the span is retried on the next turn
+            self.console.print(f"[yellow]⚠️ Could not summarize older messages: {escape(str(e))}[/yellow]")
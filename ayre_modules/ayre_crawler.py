@@ -0,0 +1,172 @@
+import hashlib
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlsplit
+from urllib.robotparser import RobotFileParser
+
+from rich.markup import escape
+
+from ayre_modules import ayre_config as config
+from ayre_modules.ayre_http_cache import normalize_url
+from ayre_modules.ayre_http_client import get_http_client
+from ayre_modules.ayre_gemini_client import get_gemini_client
+from ayre_modules.ayre_model_registry import get_model
+
+ROBOTS_AGENT = "Ayre"
+# Links that are almost never HTML pages
+SKIP_EXTENSIONS = re.compile(
+    r"\.(pdf|zip|gz|tar|rar|7z|exe|msi|dmg|iso|png|jpe?g|gif|svg|webp|ico|mp3|mp4|avi|mov|webm|css|js|json|xml)$",
+    re.IGNORECASE
+)
+
+
+def origin(url):
+    parts = urlsplit(url)
+    return f"{parts.scheme.lower()}://{(parts.netloc or '').lower()}"
+
+
+class Politeness:
+    """Per-host spacing between request starts (shared by all crawl workers)"""
+    def __init__(self, delay):
+        self.delay = delay
+        self.next_slot = {}
+        self._lock = threading.Lock()
+
+    def wait(self, host, delay=None):
+        delay = self.delay if delay is None else delay
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot.get(host, now))
+            self.next_slot[host] = slot + delay
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class SiteCrawler:
+    """Breadth-first same-origin crawler that summarizes pages while it crawls"""
+    def __init__(self, console, web_handler, max_workers=None, delay=None):
+        self.console = console
+        self.web_handler = web_handler
+        self.client = get_http_client()
+        self.max_workers = max_workers or config.WEB_FETCH_WORKERS
+        self.politeness = Politeness(config.CRAWL_DELAY if delay is None else delay)
+        self.robots = {}
+        self.model = get_model(config.ANALYSIS_MODEL)
+
+    def robots_for(self, site):
+        """Parsed robots.txt for an origin (fetched once per crawler)"""
+        if site not in self.robots:
+            parser = RobotFileParser(site + "/robots.txt")
+            try:
+                response = self.client.get(site + "/robots.txt")
+                if response.status_code in (401, 403):
+                    parser.disallow_all = True
+                elif response.status_code >= 400:
+                    parser.allow_all = True
+                else:
+                    parser.parse(response.text.splitlines())
+            except Exception:
+                # Unreachable robots.txt: treat as no restrictions
+                parser.allow_all = True
+            self.robots[site] = parser
+        return self.robots[site]
+
+    def allowed(self, url):
+        return self.robots_for(origin(url)).can_fetch(ROBOTS_AGENT, url)
+
+    def fetch(self, url):
+        """Fetch one page, honoring the host's politeness delay"""
+        robots = self.robots_for(origin(url))
+        self.politeness.wait(urlsplit(url).netloc, robots.crawl_delay(ROBOTS_AGENT))
+        return self.web_handler.scrape_url(url, quiet=True)
+
+    def summarize_page(self, page):
+        """Short summary of one crawled page (map step of the digest)"""
+        prompt = (
+            "Summarize this web page in under 150 words. Keep concrete facts, names, "
+            "APIs, commands and numbers.\n\n"
+            f"{self.web_handler.format_web_content(self.web_handler.condense_page(page))}"
+        )
+        try:
+            return get_gemini_client().generate(self.model, prompt, call="crawl_page").text.strip()
+        except Exception as e:
+            self.console.print(f"[yellow]⚠️ Could not summarize {escape(page['url'])}: {escape(str(e))}[/yellow]")
+            return page['description']
+
+    def crawl(self, start_url, depth=None, max_pages=None):
+        """Crawl from start_url; returns a list of (page, summary) in crawl order"""
+        depth = config.CRAWL_DEPTH if depth is None else depth
+        max_pages = max_pages or config.CRAWL_MAX_PAGES
+        if not start_url.startswith(('http://', 'https://')):
+            start_url = 'https://' + start_url
+        site = origin(start_url)
+
+        if not self.allowed(start_url):
+            self.console.print(f"[red]❌ robots.txt disallows crawling {start_url}[/red]")
+            return []
+
+        seen_urls = {normalize_url(start_url)}
+        seen_hashes = set()
+        frontier = [start_url]
+        pages = []
+        summaries = []
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="ayre-crawl") as fetch_pool, \
+                ThreadPoolExecutor(max_workers=config.CRAWL_SUMMARY_WORKERS, thread_name_prefix="ayre-digest") as summary_pool:
+            for level in range(depth + 1):
+                batch = frontier[:max_pages - len(pages)]
+                frontier = []
+                futures = {fetch_pool.submit(self.fetch, url): url for url in batch}
+
+                for future in as_completed(futures):
+                    page = future.result()
+                    if page['status'] != 'success':
+                        self.console.print(f"[dim]  ✗ {futures[future]}: {page['message']}[/dim]")
+                        continue
+
+                    digest = hashlib.sha256(page['content'].encode('utf-8')).hexdigest()
+                    if digest in seen_hashes:
+                        continue
+                    seen_hashes.add(digest)
+
+                    pages.append(page)
+                    # Summaries run while the crawl continues
+                    summaries.append(summary_pool.submit(self.summarize_page, page))
+                    self.console.print(
+                        f"[dim]  ✓ ({len(pages)}/{max_pages}) depth {level}: {page['title']} — {futures[future]}[/dim]"
+                    )
+
+                    if level == depth:
+                        continue
+                    for link in page.get('outlinks', []):
+                        key = normalize_url(link)
+                        if key in seen_urls or origin(link) != site or SKIP_EXTENSIONS.search(urlsplit(link).path):
+                            continue
+                        seen_urls.add(key)
+                        if self.allowed(link):
+                            frontier.append(link)
+
+                if not frontier or len(pages) >= max_pages:
+                    break
+
+            if pages:
+                self.console.print(f"[cyan]🧠 Summarizing {len(pages)} page(s)...[/cyan]")
+            return [(page, future.result()) for page, future in zip(pages, summaries)]
+
+    def build_digest_prompt(self, start_url, results, question=None):
+        """Reduce step: combine page summaries into one prompt"""
+        sections = "\n\n".join(
+            f"### {page['title']}\n{page['url']}\n{summary}" for page, summary in results
+        )
+        if question:
+            return (
+                f"The following are summaries of {len(results)} pages crawled from {start_url}. "
+                f"Using them, answer this question and cite the page URLs you rely on: {question}\n\n{sections}"
+            )
+        return (
+            f"The following are summaries of {len(results)} pages crawled from {start_url}. "
+            "Write a structured digest of the site: what it covers, the main sections, and the key "
+            f"facts from each, citing page URLs.\n\n{sections}"
+        )
@@ -0,0 +1,325 @@
+import re
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+
+from bs4 import UnicodeDammit
+
+try:
+    from lxml import etree
+    HAS_LXML = True
+except ImportError:
+    HAS_LXML = False
+
+# Elements whose text never counts as page content
+SKIP_TAGS = {"title", "script", "style", "noscript", "template", "svg", "iframe"}
+# Page chrome: links inside still count for crawling, text does not
+BOILERPLATE_TAGS = {"nav", "header", "footer", "aside", "form"}
+# Containers that can become the main-content candidate
+BLOCK_TAGS = {"body", "main", "article", "section", "div", "td", "table", "ul", "ol", "blockquote", "pre", "p", "li"}
+# Text carriers that hand their score to their parent and grandparent
+PARAGRAPH_TAGS = {"p", "pre", "td", "blockquote", "li"}
+HEADING_TAGS = {"h1", "h2", "h3", "h4", "h5", "h6"}
+# Tags that implicitly close an open tag of the same name
+SELF_CLOSING_BLOCKS = {"p", "li"}
+
+POSITIVE_HINTS = re.compile(r"article|body|content|entry|main|page|post|text|blog|story", re.IGNORECASE)
+NEGATIVE_HINTS = re.compile(
+    r"comment|meta|footer|footnote|sidebar|sponsor|share|social|related|promo|banner|menu|nav|widget|ad-|cookie",
+    re.IGNORECASE
+)
+TAG_BONUS = {"article": 30, "main": 25, "section": 5, "div": 5, "pre": 3, "td": 3, "blockquote": 3}
+
+MIN_PARAGRAPH_CHARS = 25
+MAX_DISPLAY_LINKS = 10
+
+
+class Node:
+    __slots__ = ("tag", "parent", "start", "end", "score", "weight")
+
+    def __init__(self, tag, parent, start, weight):
+        self.tag = tag
+        self.parent = parent
+        self.start = start
+        self.end = start
+        self.score = 0.0
+        self.weight = weight
+
+
+class PageExtractor:
+    """Parser target that collects title, meta, links and scored content in one pass
+
+    Works as an lxml parser target (start/end/data/close) and is driven by
+    StdlibParser when lxml is not installed.
+    """
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.title = ""
+        self.h1 = ""
+        self.first_paragraph = ""
+        self.description = ""
+        self.og_description = ""
+        self.links = []
+        self.outlinks = {}
+
+        # Text chunks in document order, with a link flag for link density
+        self.chunks = []
+        self.in_link = []
+        self.text_chars = 0
+        # Chunk index -> separator placed before it (paragraphs, headings, list items)
+        self.breaks = {}
+        self.stack = []
+        self.nodes = []
+        self.skip = 0
+        self.boilerplate = 0
+        self.capture = None
+        self.anchor = None
+
+    def weight_for(self, tag, attrs):
+        weight = TAG_BONUS.get(tag, 0)
+        hints = f"{attrs.get('id', '')} {attrs.get('class', '')}"
+        if hints.strip():
+            if POSITIVE_HINTS.search(hints):
+                weight += 25
+            if NEGATIVE_HINTS.search(hints):
+                weight -= 25
+        return weight
+
+    def start(self, tag, attrs):
+        tag = tag.lower() if isinstance(tag, str) else ""
+        if tag == "title" and not self.title:
+            self.capture = ["title"]
+        if tag in SKIP_TAGS:
+            self.skip += 1
+            self.stack.append((tag, None))
+            return
+        if tag == "meta":
+            self.meta(attrs)
+        elif tag == "h1" and not self.h1:
+            self.capture = ["h1"]
+        elif tag == "a" and attrs.get("href"):
+            self.link_start(attrs["href"])
+
+        if tag in HEADING_TAGS:
+            self.breaks[len(self.chunks)] = f"\n\n{'#' * int(tag[1])} "
+        elif tag == "li":
+            self.breaks[len(self.chunks)] = "\n- "
+        elif tag in BLOCK_TAGS or tag == "br":
+            self.breaks.setdefault(len(self.chunks), "\n\n" if tag != "br" else "\n")
+
+        if tag in BOILERPLATE_TAGS:
+            self.boilerplate += 1
+            self.stack.append((tag, None))
+        elif tag in BLOCK_TAGS:
+            if tag in SELF_CLOSING_BLOCKS and self.stack and self.stack[-1][0] == tag:
+                self.end(tag)
+            parent = self.current_node()
+            node = Node(tag, parent, len(self.chunks), self.weight_for(tag, attrs))
+            self.nodes.append(node)
+            self.stack.append((tag, node))
+
+    def meta(self, attrs):
+        content = (attrs.get("content") or "").strip()
+        if not content:
+            return
+        if (attrs.get("name") or "").lower() == "description" and not self.description:
+            self.description = content
+        elif (attrs.get("property") or "").lower() == "og:description" and not self.og_description:
+            self.og_description = content
+
+    def link_start(self, href):
+        href = href.strip()
+        # urljoin is the slowest step on link-heavy pages; absolute links skip it
+        full_url = (href if href.startswith(("http://", "https://")) else urljoin(self.base_url, href)).split("#", 1)[0]
+        if full_url.startswith(("http://", "https://")):
+            self.outlinks[full_url] = None
+            if not self.boilerplate:
+                self.anchor = [full_url, []]
+
+    def current_node(self):
+        for _, node in reversed(self.stack):
+            if node is not None:
+                return node
+        return None
+
+    def end(self, tag):
+        tag = tag.lower() if isinstance(tag, str) else ""
+        if self.capture and tag == self.capture[0]:
+            text = re.sub(r"\s+", " ", "".join(self.capture[1:])).strip()
+            if tag == "title":
+                self.title = text
+            else:
+                self.h1 = text
+            self.capture = None
+        if tag in HEADING_TAGS:
+            self.breaks.setdefault(len(self.chunks), "\n\n")
+        if tag == "a" and self.anchor:
+            text = "".join(self.anchor[1]).strip()
+            if text and len(self.links) < MAX_DISPLAY_LINKS:
+                self.links.append({"url": self.anchor[0], "text": text})
+            self.anchor = None
+
+        if not any(open_tag == tag for open_tag, _ in self.stack):
+            # Stray end tag (malformed HTML)
+            return
+        while self.stack:
+            open_tag, node = self.stack.pop()
+            if open_tag in SKIP_TAGS:
+                self.skip -= 1
+            elif open_tag in BOILERPLATE_TAGS:
+                self.boilerplate -= 1
+            elif node is not None:
+                self.close_node(node)
+            if open_tag == tag:
+                break
+
+    def close_node(self, node):
+        node.end = len(self.chunks)
+        self.breaks.setdefault(node.end, "\n\n")
+        if node.tag not in PARAGRAPH_TAGS:
+            return
+        text_length = sum(len(chunk) for chunk in self.chunks[node.start:node.end])
+        if text_length < MIN_PARAGRAPH_CHARS:
+            return
+        if node.tag == "p" and not self.first_paragraph:
+            self.first_paragraph = " ".join(self.chunks[node.start:node.end])
+
+        # Readability-style scoring: commas and length, shared with ancestors
+        score = 1 + sum(chunk.count(",") for chunk in self.chunks[node.start:node.end]) + min(text_length / 100, 3)
+        parent = node.parent
+        if parent is not None:
+            parent.score += score
+            if parent.parent is not None:
+                parent.parent.score += score / 2
+
+    def data(self, text):
+        if self.capture is not None:
+            self.capture.append(text)
+        if self.anchor is not None:
+            self.anchor[1].append(text)
+        if self.skip or self.boilerplate:
+            return
+        text = " ".join(text.split())
+        if text:
+            self.chunks.append(text)
+            self.in_link.append(self.anchor is not None)
+            self.text_chars += len(text)
+
+    def comment(self, text):
+        pass
+
+    def close(self):
+        while self.stack:
+            self.end(self.stack[-1][0])
+        return self
+
+    def main_content(self):
+        """Text of the best-scoring container (whole page text if none scored)"""
+        # Prefix sums of text and link-text length for O(1) link density per node
+        chars = [0]
+        link_chars = [0]
+        for chunk, linked in zip(self.chunks, self.in_link):
+            chars.append(chars[-1] + len(chunk))
+            link_chars.append(link_chars[-1] + (len(chunk) if linked else 0))
+
+        best = None
+        best_score = 0.0
+        for node in self.nodes:
+            if node.score <= 0 or node.tag in PARAGRAPH_TAGS - {"td"}:
+                continue
+            total = chars[node.end] - chars[node.start] or 1
+            density = (link_chars[node.end] - link_chars[node.start]) / total
+            score = (node.score + node.weight) * (1 - density)
+            if score > best_score:
+                best, best_score = node, score
+
+        start, end = (best.start, best.end) if best else (0, len(self.chunks))
+        parts = []
+        for index in range(start, end):
+            separator = self.breaks.get(index)
+            if separator is None:
+                separator = " "
+            if parts:
+                parts.append(separator)
+            elif separator.strip():
+                # Keep a heading marker on the first line
+                parts.append(separator.lstrip("\n"))
+            parts.append(self.chunks[index])
+        return "".join(parts).strip()
+
+    def result(self):
+        # Cached pages store this dict: bump ayre_http_cache.RESULT_VERSION when its content changes
+        description = self.description or self.og_description
+        if not description and self.first_paragraph:
+            text = self.first_paragraph.strip()
+            description = text[:200] + "..." if len(text) > 200 else text
+        return {
+            "title": self.title or self.h1 or "No title found",
+            "description": description or "No description found",
+            "content": self.main_content() or "No main content found",
+            "links": self.links,
+            "outlinks": list(self.outlinks)
+        }
+
+
+class StdlibParser(HTMLParser):
+    """html.parser front end for PageExtractor"""
+    def __init__(self, target):
+        super().__init__(convert_charrefs=True)
+        self.target = target
+
+    def handle_starttag(self, tag, attrs):
+        self.target.start(tag, {name: value or "" for name, value in attrs})
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag in BLOCK_TAGS or tag in SKIP_TAGS or tag in BOILERPLATE_TAGS:
+            self.target.end(tag)
+
+    def handle_endtag(self, tag):
+        self.target.end(tag)
+
+    def handle_data(self, data):
+        self.target.data(data)
+
+
+def available_parsers():
+    return ["lxml", "html.parser"] if HAS_LXML else ["html.parser"]
+
+
+class PageParser:
+    """Incremental front end: feed HTML as it arrives, then close() for the result"""
+    def __init__(self, base_url, parser="auto"):
+        if parser == "auto":
+            parser = "lxml" if HAS_LXML else "html.parser"
+        if parser == "lxml" and not HAS_LXML:
+            raise RuntimeError("lxml is not installed")
+        self.use_lxml = parser == "lxml"
+        self.target = PageExtractor(base_url)
+        if self.use_lxml:
+            self.parser = etree.HTMLParser(target=self.target, remove_comments=True)
+        else:
+            self.parser = StdlibParser(self.target)
+
+    @property
+    def text_chars(self):
+        """Characters of page text collected so far"""
+        return self.target.text_chars
+
+    def feed(self, text):
+        self.parser.feed(text)
+
+    def close(self):
+        if self.use_lxml:
+            # lxml closes the target itself and returns its close() value
+            return self.parser.close().result()
+        self.parser.close()
+        return self.target.close().result()
+
+
+def extract_page(content, base_url, parser="auto"):
+    """Extract title, description, main content, links and outlinks from HTML in one pass"""
+    page_parser = PageParser(base_url, parser)
+    if not page_parser.use_lxml and not isinstance(content, str):
+        content = UnicodeDammit(content, is_html=True).unicode_markup or ""
+    page_parser.feed(content)
+    return page_parser.close()
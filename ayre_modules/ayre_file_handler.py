@@ -1,119 +1,367 @@
-import google.generativeai as genai
-from rich.markdown import Markdown
-from rich.panel import Panel
-from pathlib import Path
-
-class FileHandler:
-    def __init__(self, console):
-        self.console = console
-        self.model = genai.GenerativeModel("gemini-2.5-flash")
-    
-    def upload_to_gemini(self, filepath):
-        """Upload file to Gemini"""
-        try:
-            file = genai.upload_file(filepath)
-            self.console.print(f"[green]✓ Uploaded: {filepath}[/green]")
-            return file
-        except Exception as e:
-            self.console.print(f"[red]✗ Upload failed: {e}[/red]")
-            return None
-    
-    def analyze_with_gemini(self, file_ref, prompt="Analyze this file"):
-        """Analyze file with Gemini"""
-        try:
-            response = self.model.generate_content([prompt, file_ref])
-            return response.text.strip()
-        except Exception as e:
-            return f"Analysis failed: {str(e)}"
-    
-    def add_code_context(self, filename, message_history):
-        """Add code file as context"""
-        try:
-            with open(filename, "r", encoding="utf-8") as f:
-                code = f.read()
-            message_history.append({
-                "role": "user", 
-                "content": f"Code from {filename}:\n{code}"
-            })
-            self.console.print(Panel(Markdown(f"```python\n{code}\n```"), 
-                                   title=f"Context: {filename}", border_style="cyan"))
-        except Exception as e:
-            self.console.print(f"[red]Error reading {filename}: {e}[/red]")
-    
-    def process_file_auto(self, file_path, message_history):
-        """Auto-process file based on type"""
-        self.console.print(f"[cyan]📁 Processing: {Path(file_path).name}[/cyan]")
-        
-        file_ext = Path(file_path).suffix.lower()
-        
-        if file_ext in ['.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp']:
-            file_ref = self.upload_to_gemini(file_path)
-            if file_ref:
-                analysis = self.analyze_with_gemini(file_ref, "Analyze this image in detail")
-                self.console.print(Panel(Markdown(analysis), title="Ayre - Image Analysis", border_style="cyan"))
-                message_history.extend([
-                    {"role": "user", "content": f"Image: {file_path}"},
-                    {"role": "assistant", "content": analysis}
-                ])
-        
-        elif file_ext in ['.py', '.js', '.html', '.css', '.txt', '.md']:
-            self.add_code_context(file_path, message_history)
-        
-        else:
-            file_ref = self.upload_to_gemini(file_path)
-            if file_ref:
-                analysis = self.analyze_with_gemini(file_ref, "Analyze this file")
-                self.console.print(Panel(Markdown(analysis), title="Ayre - File Analysis", border_style="cyan"))
-                message_history.extend([
-                    {"role": "user", "content": f"File: {file_path}"},
-                    {"role": "assistant", "content": analysis}
-                ])
-    
-    def handle_file_input(self, user_input, message_history):
-        """Handle drag & drop file paths"""
-        cleaned = user_input.strip().strip('"').strip("'")
-        
-        if Path(cleaned).exists() and Path(cleaned).is_file():
-            self.process_file_auto(cleaned, message_history)
-            return True
-        return False
-    
-    def handle_command(self, user_input, message_history):
-        """Handle file commands"""
-        if user_input.startswith("upload "):
-            filepath = user_input[7:].strip()
-            if Path(filepath).exists():
-                file_ref = self.upload_to_gemini(filepath)
-                if file_ref:
-                    prompt = self.console.input("[yellow]What should Ayre do with this file? [/yellow]")
-                    analysis = self.analyze_with_gemini(file_ref, prompt)
-                    self.console.print(Panel(Markdown(analysis), title="Ayre - Analysis", border_style="cyan"))
-                    message_history.extend([
-                        {"role": "user", "content": f"Uploaded: {filepath}"},
-                        {"role": "assistant", "content": analysis}
-                    ])
-            else:
-                self.console.print(f"[red]File not found: {filepath}[/red]")
-            return True
-        
-        elif user_input.startswith("analyze "):
-            filepath = user_input[8:].strip()
-            if Path(filepath).exists():
-                file_ref = self.upload_to_gemini(filepath)
-                if file_ref:
-                    analysis = self.analyze_with_gemini(file_ref, "Analyze this in detail")
-                    self.console.print(Panel(Markdown(analysis), title="Ayre - Analysis", border_style="cyan"))
-                    message_history.extend([
-                        {"role": "user", "content": f"Analyzed: {filepath}"},
-                        {"role": "assistant", "content": analysis}
-                    ])
-            else:
-                self.console.print(f"[red]File not found: {filepath}[/red]")
-            return True
-        
-        elif user_input.startswith("context "):
-            filename = user_input[8:].strip()
-            self.add_code_context(filename, message_history)
-            return True
-        
+import os
+import time
+
+import google.generativeai as genai
+from google.api_core import exceptions as api_exceptions
+from rich.console import Group
+from rich.markdown import Markdown
+from rich.panel import Panel
+from rich.syntax import Syntax
+from rich.table import Table
+from rich.text import Text
+from pathlib import Path
+
+from ayre_modules.ayre_stream import stream_to_panel
+from ayre_modules.ayre_model_registry import get_model
+from ayre_modules.ayre_gemini_client import get_gemini_client
+from ayre_modules import ayre_config as config
+from ayre_modules.ayre_upload_cache import get_upload_cache
+from ayre_modules.ayre_attachments import get_attachment_store
+from ayre_modules.ayre_code_index import get_code_index
+from ayre_modules.ayre_response_cache import get_response_cache
+
+IMAGE_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp']
+CODE_EXTENSIONS = ['.py', '.js', '.html', '.css', '.txt', '.md']
+# Enough of the file head to fill the preview
+PREVIEW_BYTES = 64 * 1024
+ANALYSIS_FAILED = "Analysis failed"
+# What Gemini answers for an uploaded file it has already deleted
+FILE_GONE_ERRORS = (api_exceptions.NotFound, api_exceptions.PermissionDenied)
+
+class FileHandler:
+    def __init__(self, console, stream=False):
+        self.console = console
+        self.stream = stream
+        self.model = get_model(config.ANALYSIS_MODEL)
+        self.upload_cache = get_upload_cache()
+        self.response_cache = get_response_cache()
+    
+    def upload_file(self, filepath):
+        """Upload a file (reusing an earlier upload of the same content); returns (file, reused)"""
+        digest = self.upload_cache.digest(filepath)
+        file = self.upload_cache.get(digest)
+        if file is not None:
+            return file, True
+        
+        file = genai.upload_file(filepath)
+        self.upload_cache.put(digest, filepath, file)
+        return file, False
+    
+    def generate_about(self, file_ref, prompt, stream=False):
+        """Ask about an uploaded file, uploading it again if the server deleted it before its local expiry"""
+        client = get_gemini_client()
+        try:
+            return client.generate(self.model, [prompt, file_ref], stream=stream, call="file_analysis")
+        except FILE_GONE_ERRORS:
+            entry = self.upload_cache.discard(file_ref.name)
+            if entry is None or not os.path.exists(entry["path"]):
+                raise
+        file_ref, _ = self.upload_file(entry["path"])
+        return client.generate(self.model, [prompt, file_ref], stream=stream, call="file_analysis")
+    
+    def upload_to_gemini(self, filepath):
+        """Upload file to Gemini"""
+        try:
+            file, reused = self.upload_file(filepath)
+            self.console.print(f"[green]✓ {'Reusing upload' if reused else 'Uploaded'}: {filepath}[/green]")
+            return file
+        except Exception as e:
+            self.console.print(f"[red]✗ Upload failed: {e}[/red]")
+            return None
+    
+    def show_uploads(self):
+        """List cached uploads"""
+        entries = self.upload_cache.entries()
+        if not entries:
+            self.console.print("[yellow]No cached uploads[/yellow]")
+            return
+        
+        table = Table(title="Cached Uploads")
+        table.add_column("#", style="dim")
+        table.add_column("File", style="cyan")
+        table.add_column("Size", justify="right")
+        table.add_column("Remote", style="magenta")
+        table.add_column("Expires in", style="green")
+        
+        now = time.time()
+        for index, (_, entry) in enumerate(entries, 1):
+            hours = max(entry["expires_at"] - now, 0) / 3600
+            table.add_row(
+                str(index),
+                entry["display_name"],
+                f"{entry['size_bytes'] / 1024:.0f} KB",
+                entry["name"],
+                f"{hours:.1f}h"
+            )
+        self.console.print(table)
+    
+    def evict_uploads(self, selector):
+        """Evict cached uploads by list number, file name or 'all'"""
+        entries = self.upload_cache.entries()
+        if selector == "all":
+            digests = [digest for digest, _ in entries]
+        elif selector.isdigit() and 1 <= int(selector) <= len(entries):
+            digests = [entries[int(selector) - 1][0]]
+        else:
+            digests = [digest for digest, entry in entries
+                       if selector in (entry["display_name"], entry["name"], entry["path"])]
+        
+        if not digests:
+            self.console.print(f"[red]No cached upload matches '{selector}'[/red]")
+            return
+        evicted = self.upload_cache.evict(digests)
+        self.console.print(f"[green]✓ Evicted {len(evicted)} upload(s)[/green]")
+    
+    def analyze_with_gemini(self, file_ref, prompt="Analyze this file"):
+        """Analyze file with Gemini"""
+        try:
+            response = self.generate_about(file_ref, prompt)
+            return response.text.strip()
+        except Exception as e:
+            return f"{ANALYSIS_FAILED}: {str(e)}"
+    
+    def analyze_and_show(self, file_ref, prompt, title):
+        """Analyze file with Gemini and render the result (live when streaming)"""
+        if not self.stream:
+            analysis = self.analyze_with_gemini(file_ref, prompt)
+            self.console.print(Panel(Markdown(analysis), title=title, border_style="cyan"))
+            return analysis
+        
+        try:
+            response = self.generate_about(file_ref, prompt, stream=True)
+            return stream_to_panel(self.console, response, title=title, border_style="cyan")
+        except Exception as e:
+            analysis = f"{ANALYSIS_FAILED}: {str(e)}"
+            self.console.print(Panel(Markdown(analysis), title=title, border_style="cyan"))
+            return analysis
+    
+    def analysis_key(self, filepath, prompt):
+        """Response cache key for a prompt about this file's content, or None when caching is off"""
+        if self.response_cache is None:
+            return None
+        return self.response_cache.make_key(self.model.model_name, prompt, [self.upload_cache.digest(filepath)])
+    
+    def remember_analysis(self, key, analysis):
+        if key and analysis and not analysis.startswith(ANALYSIS_FAILED):
+            self.response_cache.put(key, self.model.model_name, analysis)
+    
+    def analyze_file(self, filepath, prompt, title, fresh=False):
+        """Upload and analyze a file, answering from the response cache when the content is unchanged"""
+        key = self.analysis_key(filepath, prompt)
+        if key and not fresh:
+            analysis = self.response_cache.get(key)
+            if analysis is not None:
+                self.console.print(Panel(Markdown(analysis), title=f"{title} (cached)", border_style="cyan"))
+                return analysis
+        
+        file_ref = self.upload_to_gemini(filepath)
+        if not file_ref:
+            return None
+        analysis = self.analyze_and_show(file_ref, prompt, title)
+        self.remember_analysis(key, analysis)
+        return analysis
+    
+    def read_code_context(self, filename):
+        """Read a code file; returns (context message, preview renderable)
+        
+        Small files are inlined; large ones are chunked into the attachment store and
+        only their relevant chunks are sent with each question.
+        """
+        size = os.path.getsize(filename)
+        
+        if size <= config.CONTEXT_INLINE_KB * 1024:
+            with open(filename, "r", encoding="utf-8", errors="replace") as f:
+                code = f.read()
+            # Attachments are stable, so they can be pinned in the server-side context cache
+            message = {
+                "role": "user", 
+                "content": f"Code from {filename}:\n{code}",
+                "attachment": True
+            }
+            return message, self.build_preview(filename, code, code.count("\n") + 1)
+        
+        digest, chunk_count, line_count = get_attachment_store().ingest(filename)
+        message = {
+            "role": "user",
+            "content": (f"Large file {filename} ({size / (1024 * 1024):.1f} MB, {line_count} lines) is attached "
+                        f"in {chunk_count} chunks; relevant excerpts are included with each question."),
+            "chunks": digest,
+            "filename": filename
+        }
+        with open(filename, "rb") as f:
+            head = f.read(PREVIEW_BYTES).decode("utf-8", errors="replace")
+        return message, self.build_preview(filename, head, line_count, chunk_count)
+    
+    def build_preview(self, filename, text, line_count, chunk_count=None):
+        """First lines of a file, highlighted with the lexer for its type"""
+        head = "\n".join(text.split("\n", config.PREVIEW_LINES)[:config.PREVIEW_LINES])
+        lexer = Syntax.guess_lexer(filename, code=head)
+        preview = Syntax(head, lexer, line_numbers=True, word_wrap=True)
+        
+        notes = []
+        if line_count > config.PREVIEW_LINES:
+            notes.append(f"… {line_count - config.PREVIEW_LINES} more lines")
+        if chunk_count:
+            notes.append(f"stored as {chunk_count} chunks, retrieved by relevance")
+        if not notes:
+            return preview
+        return Group(preview, Text(" · ".join(notes), style="dim"))
+    
+    def add_code_context(self, filename, message_history):
+        """Add code file as context"""
+        try:
+            message, preview = self.read_code_context(filename)
+            message_history.append(message)
+            self.console.print(Panel(preview, title=f"Context: {filename}", border_style="cyan"))
+        except Exception as e:
+            self.console.print(f"[red]Error reading {filename}: {e}[/red]")
+    
+    def add_directory_context(self, path, message_history):
+        """Index a directory so relevant code is retrieved for each question"""
+        if not Path(path).is_dir():
+            self.console.print(f"[red]Directory not found: {path}[/red]")
+            return
+        try:
+            index = get_code_index(path)
+            start = time.time()
+            with self.console.status(f"[cyan]Indexing {path}...[/cyan]"):
+                changed, removed = index.refresh(force=True)
+            files, chunks = index.stats()
+        except Exception as e:
+            self.console.print(f"[red]Error indexing {path}: {e}[/red]")
+            return
+
+        self.console.print(
+            f"[green]✓ Indexed {files} files ({chunks} chunks) in {time.time() - start:.1f}s"
+            f" [dim]({changed} updated, {removed} removed)[/dim][/green]"
+        )
+        root = str(index.root)
+        if not any(msg.get("codebase") == root for msg in message_history):
+            message_history.append({
+                "role": "user",
+                "content": f"Codebase {root} is indexed ({files} files); the most relevant code is included with each question.",
+                "codebase": root
+            })
+
+    def prepare_file(self, file_path, report=None):
+        """Upload and analyze a file without touching the terminal or chat (safe on worker threads)
+        
+        Returns {"path", "title", "body", "messages"}; the caller renders body and appends messages.
+        """
+        report = report or (lambda status: None)
+        file_ext = Path(file_path).suffix.lower()
+        
+        if file_ext in CODE_EXTENSIONS:
+            report("reading")
+            message, preview = self.read_code_context(file_path)
+            return {"path": file_path, "title": f"Context: {file_path}", "body": preview, "messages": [message]}
+        
+        is_image = file_ext in IMAGE_EXTENSIONS
+        prompt = "Analyze this image in detail" if is_image else "Analyze this file"
+        key = self.analysis_key(file_path, prompt)
+        analysis = self.response_cache.get(key) if key else None
+        if analysis is not None:
+            report("reusing cached analysis")
+        else:
+            report("uploading")
+            file_ref, reused = self.upload_file(file_path)
+            report("analyzing (upload reused)" if reused else "analyzing")
+            analysis = self.generate_about(file_ref, prompt).text.strip()
+            self.remember_analysis(key, analysis)
+        
+        return {
+            "path": file_path,
+            "title": "Ayre - Image Analysis" if is_image else "Ayre - File Analysis",
+            "body": Markdown(analysis),
+            "messages": [
+                {"role": "user", "content": f"{'Image' if is_image else 'File'}: {file_path}"},
+                {"role": "assistant", "content": analysis}
+            ]
+        }
+    
+    def process_file_auto(self, file_path, message_history):
+        """Auto-process file based on type"""
+        self.console.print(f"[cyan]📁 Processing: {Path(file_path).name}[/cyan]")
+        
+        file_ext = Path(file_path).suffix.lower()
+        
+        if file_ext in IMAGE_EXTENSIONS:
+            analysis = self.analyze_file(file_path, "Analyze this image in detail", "Ayre - Image Analysis")
+            if analysis:
+                message_history.extend([
+                    {"role": "user", "content": f"Image: {file_path}"},
+                    {"role": "assistant", "content": analysis}
+                ])
+        
+        elif file_ext in CODE_EXTENSIONS:
+            self.add_code_context(file_path, message_history)
+        
+        else:
+            analysis = self.analyze_file(file_path, "Analyze this file", "Ayre - File Analysis")
+            if analysis:
+                message_history.extend([
+                    {"role": "user", "content": f"File: {file_path}"},
+                    {"role": "assistant", "content": analysis}
+                ])
+    
+    def handle_file_input(self, user_input, message_history):
+        """Handle drag & drop file paths"""
+        cleaned = user_input.strip().strip('"').strip("'")
+        
+        if Path(cleaned).exists() and Path(cleaned).is_file():
+            self.process_file_auto(cleaned, message_history)
+            return True
+        return False
+    
+    def handle_command(self, user_input, message_history):
+        """Handle file commands"""
+        if user_input.startswith("upload "):
+            filepath = user_input[7:].strip()
+            if Path(filepath).exists():
+                file_ref = self.upload_to_gemini(filepath)
+                if file_ref:
+                    prompt = self.console.input("[yellow]What should Ayre do with this file? [/yellow]")
+                    analysis = self.analyze_and_show(file_ref, prompt, "Ayre - Analysis")
+                    message_history.extend([
+                        {"role": "user", "content": f"Uploaded: {filepath}"},
+                        {"role": "assistant", "content": analysis}
+                    ])
+            else:
+                self.console.print(f"[red]File not found: {filepath}[/red]")
+            return True
+        
+        elif user_input.startswith("analyze "):
+            # analyze <file> [--fresh]
+            filepath = user_input[8:].strip()
+            fresh = filepath.endswith(" --fresh")
+            if fresh:
+                filepath = filepath[:-len(" --fresh")].strip()
+            if Path(filepath).exists():
+                analysis = self.analyze_file(filepath, "Analyze this in detail", "Ayre - Analysis", fresh)
+                if analysis:
+                    message_history.extend([
+                        {"role": "user", "content": f"Analyzed: {filepath}"},
+                        {"role": "assistant", "content": analysis}
+                    ])
+            else:
+                self.console.print(f"[red]File not found: {filepath}[/red]")
+            return True
+        
+        elif user_input.startswith("contextdir "):
+            self.add_directory_context(user_input[11:].strip(), message_history)
+            return True
+        
+        elif user_input.startswith("context "):
+            filename = user_input[8:].strip()
+            self.add_code_context(filename, message_history)
+            return True
+        
+        elif user_input.strip() == "files":
+            self.show_uploads()
+            return True
+        
+        elif user_input.startswith("files evict "):
+            self.evict_uploads(user_input[12:].strip())
+            return True
+        
         return False
\ No newline at end of file
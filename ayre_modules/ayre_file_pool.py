@@ -0,0 +1,119 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from rich.markup import escape
+from rich.panel import Panel
+
+from ayre_modules import ayre_config as config
+
+
+class FilePool:
+    """Uploads and analyzes files concurrently on a bounded worker pool"""
+    def __init__(self, console, file_handler, max_workers=None):
+        self.console = console
+        self.file_handler = file_handler
+        self.max_workers = max_workers or config.FILE_WORKERS
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="ayre-file")
+
+    def run(self, file_path, report):
+        """Worker: prepare one file, reporting status; never raises"""
+        started = time.monotonic()
+        try:
+            result = self.file_handler.prepare_file(file_path, report)
+            result["elapsed"] = time.monotonic() - started
+            report(f"done in {result['elapsed']:.1f}s")
+            return result
+        except Exception as e:
+            elapsed = time.monotonic() - started
+            report(f"failed after {elapsed:.1f}s: {e}")
+            return {"path": file_path, "error": str(e), "elapsed": elapsed}
+
+    def submit(self, file_path, report):
+        return self.executor.submit(self.run, file_path, report)
+
+    def apply(self, result, message_history):
+        """Render a finished file and add it to the chat (REPL thread only)"""
+        if "error" in result:
+            self.console.print(f"[red]✗ {escape(result['path'])}: {escape(result['error'])}[/red]")
+            return
+        self.console.print(Panel(result["body"], title=result["title"], border_style="cyan"))
+        message_history.extend(result["messages"])
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class FileQueueConsumer:
+    """Background thread that starts files from the GUI queue as soon as they arrive
+
+    Status goes to the GUI through status_queue as (message, color, final) tuples;
+    finished results wait until the REPL thread collects them. on_ready() is called
+    from a worker thread whenever a file finishes, so the REPL can collect right away.
+    """
+    def __init__(self, file_pool, file_queue, status_queue=None, on_ready=None):
+        self.file_pool = file_pool
+        self.file_queue = file_queue
+        self.status_queue = status_queue
+        self.on_ready = on_ready
+        # Futures in drop order
+        self.pending = []
+        # Last "still processing" count shown, so it is only repeated when it changes
+        self.reported_waiting = 0
+        self._lock = threading.Lock()
+        self.thread = threading.Thread(target=self.run, name="ayre-file-queue", daemon=True)
+        self.thread.start()
+
+    def report(self, name, status):
+        """Send a status line to the GUI"""
+        if self.status_queue is None:
+            return
+        if status.startswith("done"):
+            self.status_queue.put((f"✅ {name}: {status}", "#00ff00", True))
+        elif status.startswith("failed"):
+            self.status_queue.put((f"❌ {name}: {status}", "#ff4b4b", True))
+        else:
+            self.status_queue.put((f"🔄 {name}: {status}", "#ffaa00", False))
+
+    def run(self):
+        while True:
+            item = self.file_queue.get()
+            if item is None:
+                return
+            action, file_path = item
+            if action != "process":
+                continue
+
+            name = Path(file_path).name
+            report = lambda status, name=name: self.report(name, status)
+            report("queued")
+            future = self.file_pool.submit(file_path, report)
+            with self._lock:
+                self.pending.append(future)
+            if self.on_ready is not None:
+                future.add_done_callback(lambda _: self.on_ready())
+
+    def collect(self, message_history):
+        """Render finished files and add them to the chat in drop order (REPL thread only)
+
+        Returns whether anything was printed.
+        """
+        with self._lock:
+            ready = 0
+            while ready < len(self.pending) and self.pending[ready].done():
+                ready += 1
+            finished, self.pending = self.pending[:ready], self.pending[ready:]
+            waiting = len(self.pending)
+
+        for future in finished:
+            self.file_pool.apply(future.result(), message_history)
+        shown = bool(finished)
+        if waiting and waiting != self.reported_waiting:
+            self.file_pool.console.print(f"[dim]⏳ {waiting} file(s) still processing in the background[/dim]")
+            shown = True
+        self.reported_waiting = waiting
+        return shown
+
+    def close(self):
+        self.file_queue.put(None)
@@ -0,0 +1,256 @@
+import json
+import math
+import random
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+import requests
+from google.api_core import exceptions as api_exceptions
+
+from ayre_modules import ayre_config as config
+from ayre_modules.ayre_repl import TaskCancelled, raise_if_cancelled
+
+# Transient failures worth another attempt (generate_content has no side effects, so retrying is safe)
+RETRYABLE_ERRORS = (
+    api_exceptions.DeadlineExceeded,
+    api_exceptions.ServiceUnavailable,
+    api_exceptions.InternalServerError,
+    api_exceptions.BadGateway,
+    api_exceptions.GatewayTimeout,
+    api_exceptions.TooManyRequests,
+    api_exceptions.ResourceExhausted,
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+    ConnectionError,
+    TimeoutError,
+)
+# Stopped by the user (Ctrl-C, or a stream abandoned part way), not failed
+CANCELLATIONS = (TaskCancelled, KeyboardInterrupt, GeneratorExit)
+# Attempts kept in memory for the `calls` summary
+RECENT_ATTEMPTS = 500
+# Rotate the metrics log past this size
+METRICS_MAX_BYTES = 5 * 1024 * 1024
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling the API while a model's circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """Opens after consecutive failed attempts; after a cooldown lets one probe call through"""
+    def __init__(self, threshold, cooldown):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            if self.probing or time.monotonic() - self.opened_at >= self.cooldown:
+                return "half-open"
+            return "open"
+
+    def before_attempt(self):
+        """Raise CircuitOpenError unless an attempt may go out now"""
+        with self._lock:
+            if self.opened_at is None:
+                return
+            remaining = self.opened_at + self.cooldown - time.monotonic()
+            if remaining > 0 or self.probing:
+                wait = max(remaining, 0)
+                raise CircuitOpenError(
+                    f"Gemini calls paused after {self.failures} failures in a row"
+                    + (f", retrying in {math.ceil(wait)}s" if wait else ", a test call is in progress")
+                )
+            self.probing = True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.probing or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+            self.probing = False
+
+    def release(self):
+        """End a probe that failed for a non-service reason (bad request, cancelled)"""
+        with self._lock:
+            self.probing = False
+
+
+class GeminiClient:
+    """Process-wide wrapper for generate_content: deadlines, jittered retries, circuit breaking and metrics
+
+    Each attempt gets its own timeout within an overall deadline; retryable errors
+    back off with full jitter. Every attempt is appended as a JSON line to
+    ayre_cache/gemini_calls.jsonl.
+    """
+    def __init__(self):
+        self.breakers = {}
+        self.attempts = deque(maxlen=RECENT_ATTEMPTS)
+        self._lock = threading.Lock()
+        self.metrics_path = Path(config.CACHE_DIR) / "gemini_calls.jsonl" if config.GEMINI_METRICS else None
+
+    def breaker(self, model_name):
+        with self._lock:
+            breaker = self.breakers.get(model_name)
+            if breaker is None:
+                breaker = CircuitBreaker(config.GEMINI_BREAKER_FAILURES, config.GEMINI_BREAKER_COOLDOWN)
+                self.breakers[model_name] = breaker
+            return breaker
+
+    def generate(self, model, contents, stream=False, call="generate"):
+        """generate_content with retries; a streamed response is only retried until its first chunk arrives
+
+        (generate_content(stream=True) waits for the first chunk itself, so connection
+        and quota errors surface inside the retry loop; later failures are not retried.)
+        A stream's request timeout also covers the rest of the reply, so streams get
+        GEMINI_STREAM_TIMEOUT rather than the per-attempt GEMINI_TIMEOUT.
+        """
+        model_name = getattr(model, "model_name", "").removeprefix("models/") or "gemini"
+        breaker = self.breaker(model_name)
+        deadline = time.monotonic() + config.GEMINI_DEADLINE
+        attempt = 0
+
+        while True:
+            attempt += 1
+            try:
+                breaker.before_attempt()
+            except CircuitOpenError as e:
+                self.record(call, model_name, attempt, "circuit_open", 0.0, e)
+                raise
+            if stream:
+                timeout = config.GEMINI_STREAM_TIMEOUT
+            else:
+                timeout = min(config.GEMINI_TIMEOUT, max(deadline - time.monotonic(), 1.0))
+            started = time.monotonic()
+            try:
+                # retry=None: the SDK's own retry (up to 600s) would hide attempts from the breaker
+                response = model.generate_content(contents, stream=stream,
+                                                  request_options={"timeout": timeout, "retry": None})
+            except RETRYABLE_ERRORS as e:
+                elapsed = time.monotonic() - started
+                breaker.record_failure()
+                delay = self.backoff(attempt)
+                if attempt >= config.GEMINI_RETRIES + 1 or time.monotonic() + delay >= deadline:
+                    self.record(call, model_name, attempt, "error", elapsed, e)
+                    raise
+                self.record(call, model_name, attempt, "retry", elapsed, e)
+                self.sleep(delay)
+                continue
+            except BaseException as e:
+                # Bad requests, blocked prompts and cancellation say nothing about service health
+                breaker.release()
+                self.record(call, model_name, attempt, self.outcome(e), time.monotonic() - started, e)
+                raise
+
+            # For streams the first chunk has arrived: the service is answering
+            breaker.record_success()
+            if not stream:
+                self.record(call, model_name, attempt, "ok", time.monotonic() - started)
+                return response
+            return self.rest_of_stream(response, call, model_name, attempt, started, breaker)
+
+    def rest_of_stream(self, response, call, model_name, attempt, started, breaker):
+        """Yield a stream whose first chunk already arrived; failures past it are not retried"""
+        try:
+            yield from response
+        except RETRYABLE_ERRORS as e:
+            breaker.record_failure()
+            self.record(call, model_name, attempt, "error", time.monotonic() - started, e)
+            raise
+        except BaseException as e:
+            self.record(call, model_name, attempt, self.outcome(e), time.monotonic() - started, e)
+            raise
+        self.record(call, model_name, attempt, "ok", time.monotonic() - started)
+
+    @staticmethod
+    def outcome(error):
+        return "cancelled" if isinstance(error, CANCELLATIONS) else "error"
+
+    @staticmethod
+    def backoff(attempt):
+        """Full jitter: uniform in [0, min(cap, base * 2^(attempt-1))]"""
+        return random.uniform(0, min(config.GEMINI_BACKOFF_MAX, config.GEMINI_BACKOFF_BASE * 2 ** (attempt - 1)))
+
+    @staticmethod
+    def sleep(seconds):
+        """Back off in short steps so Ctrl-C on the REPL is not held up"""
+        end = time.monotonic() + seconds
+        while True:
+            raise_if_cancelled()
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                return
+            time.sleep(min(remaining, 0.2))
+
+    def record(self, call, model_name, attempt, outcome, elapsed, error=None):
+        """Keep one attempt's metrics and append them to the metrics log"""
+        entry = {
+            "ts": round(time.time(), 3),
+            "call": call,
+            "model": model_name,
+            "attempt": attempt,
+            "outcome": outcome,
+            "latency_ms": round(elapsed * 1000, 1),
+            "error": f"{type(error).__name__}: {error}"[:300] if error is not None else None,
+            "breaker": self.breaker(model_name).state,
+        }
+        with self._lock:
+            self.attempts.append(entry)
+            if self.metrics_path is None:
+                return
+            try:
+                self.metrics_path.parent.mkdir(parents=True, exist_ok=True)
+                if self.metrics_path.exists() and self.metrics_path.stat().st_size > METRICS_MAX_BYTES:
+                    self.metrics_path.replace(self.metrics_path.with_name(self.metrics_path.name + ".1"))
+                with open(self.metrics_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(entry) + "\n")
+            except OSError:
+                # Metrics never break a call
+                pass
+
+    def stats(self):
+        """Per-call-type counters and latency percentiles over recent attempts, plus breaker states"""
+        with self._lock:
+            attempts = list(self.attempts)
+            breakers = {name: breaker for name, breaker in self.breakers.items()}
+
+        summary = {}
+        for entry in attempts:
+            row = summary.setdefault(entry["call"], {"attempts": 0, "ok": 0, "retry": 0, "error": 0,
+                                                     "circuit_open": 0, "cancelled": 0, "latencies": []})
+            row["attempts"] += 1
+            row[entry["outcome"]] += 1
+            if entry["outcome"] == "ok":
+                row["latencies"].append(entry["latency_ms"])
+        for row in summary.values():
+            latencies = sorted(row.pop("latencies"))
+            row["p50_ms"] = latencies[len(latencies) // 2] if latencies else None
+            row["p95_ms"] = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else None
+        return summary, {name: (breaker.state, breaker.failures) for name, breaker in breakers.items()}
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_gemini_client():
+    """Get the process-wide Gemini call wrapper, creating it on first use"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = GeminiClient()
+        return _client
@@ -0,0 +1,190 @@
+import email.utils
+import json
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+from ayre_modules import ayre_config as config
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    last_access REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    size INTEGER NOT NULL,
+    body BLOB,
+    result TEXT NOT NULL,
+    version INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS entries_last_access ON entries(last_access);
+"""
+
+# Shape of the stored `result` (what the extractor returns); rows from another version are misses.
+# Bump whenever extraction output changes: 1 first cache, 2 outlinks for crawl, 3 single-pass
+# scoring extractor, 4 streamed extraction with a text budget, 5 structure breaks and 100k budget.
+RESULT_VERSION = 5
+TRACKING_PARAMS = re.compile(r"^(utm_\w+|fbclid|gclid|mc_cid|mc_eid)$", re.IGNORECASE)
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def normalize_url(url):
+    """Canonical form used as the cache key"""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    path = parts.path or "/"
+    query = urlencode(sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not TRACKING_PARAMS.match(key)
+    ))
+    # Fragments never reach the server
+    return urlunsplit((scheme, host, path, query, ""))
+
+
+def parse_cache_control(value):
+    """Cache-Control header as a dict of directive -> value (or True)"""
+    directives = {}
+    for item in (value or "").split(","):
+        name, _, arg = item.strip().partition("=")
+        if name:
+            directives[name.lower()] = arg.strip('"') if arg else True
+    return directives
+
+
+class HttpCache:
+    """Persistent page cache with HTTP freshness, conditional revalidation and LRU eviction"""
+    def __init__(self, path=None, ttl=None, max_bytes=None):
+        self.path = Path(path or Path(config.CACHE_DIR) / "http_cache.db")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl or config.HTTP_CACHE_TTL
+        self.max_bytes = max_bytes or config.HTTP_CACHE_MAX_MB * 1024 * 1024
+        self._lock = threading.Lock()
+
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        columns = {row["name"] for row in self.conn.execute("PRAGMA table_info(entries)")}
+        if "version" not in columns:
+            # Caches from before versioning: their rows read as version 0 and are refetched
+            self.conn.execute("ALTER TABLE entries ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+        self.conn.commit()
+
+    def get(self, url):
+        """Cached entry for a URL (fresh or stale), or None"""
+        key = normalize_url(url)
+        with self._lock, self.conn:
+            row = self.conn.execute(
+                "SELECT key, expires_at, etag, last_modified, result, version FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row["version"] != RESULT_VERSION:
+                # Built by an older extractor: a 304 would keep serving it, so fetch anew
+                return None
+            self.conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+
+        return {
+            "key": row["key"],
+            "fresh": row["expires_at"] > time.time(),
+            "etag": row["etag"],
+            "last_modified": row["last_modified"],
+            "result": json.loads(row["result"])
+        }
+
+    @staticmethod
+    def conditional_headers(entry):
+        """Validators for revalidating a stale entry"""
+        headers = {}
+        if entry and entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry and entry["last_modified"]:
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def freshness_lifetime(self, headers):
+        """Seconds a response stays fresh, or None if it must not be stored"""
+        directives = parse_cache_control(headers.get("Cache-Control"))
+        if "no-store" in directives:
+            return None
+        if "no-cache" in directives:
+            return 0
+        for name in ("s-maxage", "max-age"):
+            if name in directives:
+                try:
+                    return max(int(directives[name]), 0)
+                except (TypeError, ValueError):
+                    pass
+
+        expires = headers.get("Expires")
+        if expires:
+            try:
+                return max(email.utils.parsedate_to_datetime(expires).timestamp() - time.time(), 0)
+            except (TypeError, ValueError):
+                return 0
+        return self.ttl
+
+    def put(self, url, headers, body, result):
+        """Store a response and its extracted result"""
+        lifetime = self.freshness_lifetime(headers)
+        if lifetime is None:
+            return
+
+        now = time.time()
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO entries "
+                "(key, url, fetched_at, last_access, expires_at, etag, last_modified, size, body, result, version) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (normalize_url(url), url, now, now, now + lifetime, headers.get("ETag"),
+                 headers.get("Last-Modified"), len(body), body, json.dumps(result, ensure_ascii=False),
+                 RESULT_VERSION)
+            )
+            self.evict()
+
+    def revalidated(self, entry, headers):
+        """Extend a stale entry after a 304 Not Modified"""
+        lifetime = self.freshness_lifetime(headers)
+        now = time.time()
+        with self._lock, self.conn:
+            if lifetime is None:
+                self.conn.execute("DELETE FROM entries WHERE key = ?", (entry["key"],))
+                return
+            self.conn.execute(
+                "UPDATE entries SET expires_at = ?, last_access = ?, "
+                "etag = COALESCE(?, etag), last_modified = COALESCE(?, last_modified) WHERE key = ?",
+                (now + lifetime, now, headers.get("ETag"), headers.get("Last-Modified"), entry["key"])
+            )
+
+    def evict(self):
+        """Drop least recently used entries until under the size cap"""
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for row in self.conn.execute("SELECT key, size FROM entries ORDER BY last_access").fetchall():
+            self.conn.execute("DELETE FROM entries WHERE key = ?", (row["key"],))
+            total -= row["size"]
+            if total <= self.max_bytes:
+                break
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def get_http_cache():
+    """Process-wide page cache, or None when disabled"""
+    global _shared
+    if not config.HTTP_CACHE:
+        return None
+    with _shared_lock:
+        if _shared is None:
+            _shared = HttpCache()
+        return _shared
@@ -0,0 +1,78 @@
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry, make_headers
+
+from ayre_modules import ayre_config as config
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+RETRY_STATUSES = (408, 429, 500, 502, 503, 504)
+
+
+def make_retry(total):
+    """Retry policy: exponential backoff with jitter, idempotent methods only"""
+    options = dict(
+        total=total,
+        connect=total,
+        read=total,
+        status=total,
+        backoff_factor=0.5,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+    try:
+        return Retry(backoff_jitter=0.5, **options)
+    except TypeError:
+        # urllib3 < 2 has no backoff_jitter
+        return Retry(**options)
+
+
+def make_session():
+    """requests.Session with pooled keep-alive connections and retries"""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=config.HTTP_POOL_HOSTS,
+        pool_maxsize=config.HTTP_POOL_PER_HOST,
+        # Wait for a free connection instead of opening extra ones per host
+        pool_block=True,
+        max_retries=make_retry(config.HTTP_RETRIES)
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({
+        'User-Agent': USER_AGENT,
+        # gzip/deflate always, br/zstd when brotli/zstandard are installed (urllib3 decodes them)
+        'Accept-Encoding': make_headers(accept_encoding=True)['accept-encoding']
+    })
+    return session
+
+
+class HttpClient:
+    """Process-wide HTTP client shared by every web fetch"""
+    def __init__(self):
+        self.session = make_session()
+        self.timeout = (config.HTTP_CONNECT_TIMEOUT, config.HTTP_READ_TIMEOUT)
+
+    def get(self, url, headers=None, **kwargs):
+        """GET with the shared pool and (connect, read) timeouts"""
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.get(url, headers=headers, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_http_client():
+    """Get the process-wide HTTP client, creating it on first use"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient()
+        return _client
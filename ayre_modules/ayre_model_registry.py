@@ -0,0 +1,56 @@
+import hashlib
+import json
+import threading
+
+import google.generativeai as genai
+
+from ayre_modules import ayre_config as config
+
+
+class ModelRegistry:
+    """Process-wide cache of long-lived GenerativeModel handles"""
+    def __init__(self):
+        self._models = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(model_name, generation_config, safety_settings, model_kwargs):
+        """Build a stable key from model name and config"""
+        raw = json.dumps([model_name, generation_config, safety_settings, model_kwargs],
+                         sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, model_name=None, generation_config=None, safety_settings=None, **model_kwargs):
+        """Return a shared model handle, creating it on first use"""
+        model_name = model_name or config.CHAT_MODEL
+        if generation_config is None:
+            generation_config = config.GENERATION_CONFIG
+        if safety_settings is None:
+            safety_settings = config.SAFETY_SETTINGS
+
+        key = self.make_key(model_name, generation_config, safety_settings, model_kwargs)
+
+        with self._lock:
+            model = self._models.get(key)
+            if model is None:
+                model = genai.GenerativeModel(
+                    model_name,
+                    generation_config=generation_config or None,
+                    safety_settings=safety_settings or None,
+                    **model_kwargs
+                )
+                self._models[key] = model
+            return model
+
+    def clear(self):
+        """Drop all cached handles"""
+        with self._lock:
+            self._models.clear()
+
+
+registry = ModelRegistry()
+
+
+def get_model(model_name=None, **kwargs):
+    """Get a shared model handle from the process-wide registry"""
+    return registry.get(model_name, **kwargs)
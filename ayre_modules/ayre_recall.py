@@ -0,0 +1,136 @@
+import json
+import threading
+import zlib
+from collections import Counter
+
+from ayre_modules.ayre_retrieval import BM25Index, tokenize
+
+# Rewrite the journal once dead records outnumber live ones by this much
+COMPACT_MIN_DEAD_RECORDS = 200
+SPEAKERS = {"user": "Raven", "assistant": "Ayre"}
+
+
+def fingerprint(msg):
+    return zlib.crc32(f"{msg.get('role')}\0{msg.get('content', '')}".encode("utf-8"))
+
+
+def recallable(msg):
+    """Plain chat turns (not the system prompt or attachment stubs)"""
+    return msg.get("role") in SPEAKERS and not msg.get("chunks") and not msg.get("codebase")
+
+
+class TurnIndex:
+    """Per-chat BM25 index over past messages, keyed by absolute message index
+
+    Persisted next to the chat as an append-only journal (ayre_chats/.recall/<name>.jsonl)
+    of {"i", "fp", "terms"} records plus {"truncate": n} records, so loading replays
+    term counts without re-tokenizing and each turn only appends its new messages.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.index = BM25Index()
+        # absolute index -> fingerprint, for every message seen (recallable or not)
+        self.fingerprints = {}
+        self.records = 0
+        # A cancelled turn's worker may still be syncing when the next turn starts
+        self._lock = threading.Lock()
+        self.load()
+
+    @property
+    def upto(self):
+        """One past the highest indexed message"""
+        return max(self.fingerprints, default=-1) + 1
+
+    def load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    self.records += 1
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Torn last line from an interrupted write
+                        continue
+                    if "truncate" in record:
+                        self.drop_from(record["truncate"])
+                    else:
+                        self.fingerprints[record["i"]] = record["fp"]
+                        if record["terms"]:
+                            self.index.add_counts(str(record["i"]), record["terms"])
+        except FileNotFoundError:
+            pass
+
+        live = len(self.fingerprints)
+        if self.records - live > max(COMPACT_MIN_DEAD_RECORDS, live):
+            self.compact()
+
+    def compact(self):
+        """Rewrite the journal with only live records"""
+        lines = []
+        for position in sorted(self.fingerprints):
+            doc_id = str(position)
+            terms = {term: self.index.postings[term][doc_id] for term in self.index.doc_terms.get(doc_id, [])}
+            lines.append(json.dumps({"i": position, "fp": self.fingerprints[position], "terms": terms}))
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write("".join(line + "\n" for line in lines))
+        tmp_path.replace(self.path)
+        self.records = len(lines)
+
+    def drop_from(self, start):
+        for position in [position for position in self.fingerprints if position >= start]:
+            del self.fingerprints[position]
+            self.index.remove(str(position))
+
+    def sync(self, message_history, elided, read_range):
+        """Index messages appended since the last call (and re-index after history rewrites)
+
+        Loaded histories hold the system prompt at index 0 and absolute messages
+        elided+1.. after it; read_range(start, end) fetches the elided ones from disk.
+        """
+        with self._lock:
+            positions = [0] + list(range(elided + 1, elided + len(message_history)))
+            loaded = list(zip(positions, message_history))
+            records = []
+
+            # First loaded message that differs from what was indexed (history replaced)
+            for position, msg in loaded:
+                known = self.fingerprints.get(position)
+                if known is not None and known != fingerprint(msg):
+                    self.drop_from(position)
+                    records.append({"truncate": position})
+                    break
+            end = elided + len(message_history)
+            if self.upto > end:
+                records.append({"truncate": end})
+                self.drop_from(end)
+
+            # Older messages on disk that were never indexed (chats from before recall existed)
+            if elided and self.upto < elided + 1:
+                missing = read_range(max(self.upto, 1), elided + 1)
+                records += self.add_messages(zip(range(max(self.upto, 1), elided + 1), missing))
+
+            start = self.upto
+            records += self.add_messages((position, msg) for position, msg in loaded if position >= start)
+
+            if records:
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write("".join(json.dumps(record) + "\n" for record in records))
+                self.records += len(records)
+
+    def add_messages(self, numbered):
+        records = []
+        for position, msg in numbered:
+            terms = dict(Counter(tokenize(msg.get("content", "")))) if recallable(msg) else {}
+            self.fingerprints[position] = fingerprint(msg)
+            if terms:
+                self.index.add_counts(str(position), terms)
+            records.append({"i": position, "fp": self.fingerprints[position], "terms": terms})
+        return records
+
+    def search(self, query, before, k):
+        """Absolute indices of the k most relevant messages older than `before`"""
+        with self._lock:
+            hits = self.index.search(query, k, where=lambda doc_id: int(doc_id) < before)
+        return [int(doc_id) for doc_id, _ in hits]
@@ -0,0 +1,258 @@
+import asyncio
+import contextvars
+import functools
+import queue
+import signal
+import threading
+import time
+
+from rich.console import Console
+from rich.markup import escape
+from rich.table import Table
+
+# Set in each worker thread started by run_in_thread; set when its task is cancelled
+_cancel_event = contextvars.ContextVar("ayre_cancel_event", default=None)
+# Windows ends a pending console read when Ctrl-C is pressed; such reads are not EOF
+INTERRUPT_GRACE_SECONDS = 1.0
+
+
+class TaskCancelled(BaseException):
+    """Raised in a worker thread whose REPL task was cancelled (not caught by `except Exception`)"""
+
+
+def cancel_requested():
+    """True inside a worker thread whose task has been cancelled"""
+    event = _cancel_event.get()
+    return event is not None and event.is_set()
+
+
+def raise_if_cancelled():
+    """Stop blocking work early (between stream chunks, before touching chat state)"""
+    if cancel_requested():
+        raise TaskCancelled()
+
+
+async def run_in_thread(func, *args):
+    """Run blocking work on a daemon thread; cancelling the awaiting task flags the thread to stop
+
+    Daemon threads (not an executor) so an abandoned request never holds up exit.
+    """
+    event = threading.Event()
+    context = contextvars.copy_context()
+    context.run(_cancel_event.set, event)
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def settle(outcome, value):
+        if not future.done():
+            getattr(future, outcome)(value)
+
+    def work():
+        try:
+            result = context.run(func, *args)
+        except BaseException as e:
+            outcome, value = "set_exception", e
+        else:
+            outcome, value = "set_result", result
+        try:
+            loop.call_soon_threadsafe(settle, outcome, value)
+        except RuntimeError:
+            # Loop already closed (REPL exited)
+            pass
+
+    threading.Thread(target=work, name="ayre-task", daemon=True).start()
+    try:
+        return await future
+    except asyncio.CancelledError:
+        # The thread cannot be killed; it stops at its next raise_if_cancelled()
+        event.set()
+        raise
+
+
+class InputReader:
+    """The only reader of stdin: lines go to the REPL, or to a worker waiting in ask()"""
+    def __init__(self, loop):
+        self.loop = loop
+        self.lines = asyncio.Queue()
+        self.answers = queue.Queue()
+        self.asking = threading.Event()
+        self.last_interrupt = 0.0
+        self.thread = threading.Thread(target=self.run, name="ayre-input", daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while True:
+            try:
+                line = input()
+            except EOFError:
+                time.sleep(0.1)
+                if time.monotonic() - self.last_interrupt < INTERRUPT_GRACE_SECONDS:
+                    continue
+                self.deliver(None)
+                return
+            self.deliver(line)
+
+    def deliver(self, line):
+        if line is not None and self.asking.is_set():
+            self.answers.put(line)
+        else:
+            self.loop.call_soon_threadsafe(self.lines.put_nowait, line)
+
+    def ask(self, console, prompt):
+        """Prompt from a worker thread and wait for the next line typed"""
+        console.print(prompt, end="")
+        self.asking.set()
+        try:
+            while True:
+                try:
+                    return self.answers.get(timeout=0.2)
+                except queue.Empty:
+                    raise_if_cancelled()
+        finally:
+            self.asking.clear()
+
+
+class ReplConsole(Console):
+    """Console whose input() goes through the REPL's input reader while the REPL runs"""
+    reader = None
+
+    def input(self, prompt="", **kwargs):
+        if self.reader is None:
+            return super().input(prompt, **kwargs)
+        return self.reader.ask(self, prompt)
+
+
+class Repl:
+    """Asyncio REPL core: one input reader, a cancellable foreground task and background jobs
+
+    Ctrl-C cancels the foreground task (or leaves the REPL when idle); lines typed
+    while a task runs are queued and handled in order afterwards.
+    """
+    def __init__(self, console, prompt):
+        self.console = console
+        self.prompt = prompt
+        self.loop = None
+        self.reader = None
+        self.current = None
+        self.waiting = False
+        # job number -> (label, task)
+        self.jobs = {}
+        self.next_job = 1
+        # Finished background results waiting for the foreground to be free
+        self.completed = []
+
+    async def start(self):
+        self.loop = asyncio.get_running_loop()
+        self.reader = InputReader(self.loop)
+        if isinstance(self.console, ReplConsole):
+            self.console.reader = self.reader
+        signal.signal(signal.SIGINT, self.on_sigint)
+
+    def on_sigint(self, signum, frame):
+        self.reader.last_interrupt = time.monotonic()
+        self.loop.call_soon_threadsafe(self.interrupt)
+
+    def interrupt(self):
+        """Ctrl-C: cancel the foreground task, or end the REPL when idle"""
+        if self.current is not None and not self.current.done():
+            self.current.cancel()
+        else:
+            self.reader.lines.put_nowait(None)
+
+    async def read_line(self):
+        """Next input line (None on Ctrl-C at the prompt or end of input)"""
+        typed_ahead = not self.reader.lines.empty()
+        if not typed_ahead:
+            self.waiting = True
+            self.console.print(self.prompt, end="")
+        try:
+            line = await self.reader.lines.get()
+        finally:
+            self.waiting = False
+        if typed_ahead and line is not None:
+            self.console.print(f"{self.prompt}{escape(line)}")
+        return line
+
+    async def run_foreground(self, func, *args):
+        """Run blocking work as the current task; returns None if Ctrl-C cancelled it"""
+        self.current = asyncio.ensure_future(run_in_thread(func, *args))
+        try:
+            return await self.current
+        except (asyncio.CancelledError, TaskCancelled):
+            self.console.print("\n[yellow]⚠️ Cancelled[/yellow]")
+            return None
+        finally:
+            self.current = None
+
+    def start_background(self, label, func, *args, on_done=None):
+        """Run blocking work as a background job; on_done(result) runs on the REPL loop"""
+        job = self.next_job
+        self.next_job += 1
+        task = asyncio.ensure_future(run_in_thread(func, *args))
+        self.jobs[job] = (label, task)
+        self.console.print(f"[cyan]⏳ [{job}] {escape(label)} is running in the background ('jobs' to list)[/cyan]")
+
+        def finished(task):
+            self.jobs.pop(job, None)
+            if task.cancelled():
+                self.console.print(f"[yellow]⚠️ [{job}] {escape(label)} cancelled[/yellow]")
+            elif task.exception() is not None:
+                self.console.print(f"[red]❌ [{job}] {escape(label)} failed: {task.exception()}[/red]")
+            else:
+                self.console.print(f"[green]✓ [{job}] {escape(label)} finished[/green]")
+                if on_done is not None:
+                    self.post(functools.partial(on_done, task.result()))
+                    return
+            self.reprompt()
+
+        task.add_done_callback(finished)
+        return job
+
+    def post(self, callback):
+        """Run callback on the loop once no foreground task runs (right away while the prompt waits)
+
+        A callback returns False when it had nothing to show, so the prompt is not reprinted.
+        """
+        self.completed.append(callback)
+        # Nothing else is touching chat state while the prompt waits
+        if self.waiting and self.apply_completed():
+            self.reprompt()
+
+    def reprompt(self):
+        """Print the prompt again after output that arrived while it was waiting"""
+        if self.waiting:
+            self.console.print(self.prompt, end="")
+
+    def apply_completed(self):
+        """Hand finished background results to their callbacks (never during a foreground task)"""
+        completed, self.completed = self.completed, []
+        shown = False
+        for callback in completed:
+            shown = callback() is not False or shown
+        return shown
+
+    def show_jobs(self):
+        if not self.jobs:
+            self.console.print("[yellow]No background jobs running[/yellow]")
+            return
+        table = Table(title="⏳ Background Jobs", border_style="#ff4b4b")
+        table.add_column("#", style="#888888", justify="right")
+        table.add_column("Job", style="#ffffff")
+        for job, (label, _) in sorted(self.jobs.items()):
+            table.add_row(str(job), label)
+        self.console.print(table)
+
+    def cancel_job(self, job):
+        entry = self.jobs.get(job)
+        if entry is None:
+            self.console.print(f"[red]No background job {job}[/red]")
+            return
+        entry[1].cancel()
+
+    def close(self):
+        """Cancel background jobs and give Ctrl-C back to Python"""
+        for _, task in self.jobs.values():
+            task.cancel()
+        if isinstance(self.console, ReplConsole):
+            self.console.reader = None
+        signal.signal(signal.SIGINT, signal.default_int_handler)
@@ -0,0 +1,117 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from ayre_modules import ayre_config as config
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0,
+    size INTEGER NOT NULL,
+    response TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_last_access ON responses(last_access);
+"""
+
+
+class ResponseCache:
+    """Memoized model responses for repeatable prompts, with a TTL and LRU eviction
+
+    Keys cover the model, generation settings, prompt and hashes of any attached
+    content, so a changed file, page or setting is a miss.
+    """
+    def __init__(self, path=None, ttl=None, max_bytes=None):
+        self.path = Path(path or Path(config.CACHE_DIR) / "responses.db")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl or config.RESPONSE_CACHE_TTL
+        self.max_bytes = max_bytes or config.RESPONSE_CACHE_MAX_MB * 1024 * 1024
+        self._lock = threading.Lock()
+        # Counters for this session
+        self.hits = 0
+        self.misses = 0
+
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    @staticmethod
+    def make_key(model_name, prompt, content_hashes=()):
+        raw = json.dumps([model_name, config.GENERATION_CONFIG, config.SAFETY_SETTINGS, prompt, list(content_hashes)],
+                         sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """Cached response text, or None"""
+        now = time.time()
+        with self._lock, self.conn:
+            row = self.conn.execute("SELECT created_at, response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None and row["created_at"] + self.ttl <= now:
+                self.conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self.conn.execute("UPDATE responses SET last_access = ?, hits = hits + 1 WHERE key = ?", (now, key))
+            self.hits += 1
+            return row["response"]
+
+    def put(self, key, model_name, response):
+        """Remember a response"""
+        now = time.time()
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, created_at, last_access, hits, size, response) "
+                "VALUES (?, ?, ?, ?, 0, ?, ?)",
+                (key, model_name, now, now, len(response.encode("utf-8")), response)
+            )
+            self.evict()
+
+    def evict(self):
+        """Drop expired entries, then least recently used ones until under the size cap"""
+        self.conn.execute("DELETE FROM responses WHERE created_at <= ?", (time.time() - self.ttl,))
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for row in self.conn.execute("SELECT key, size FROM responses ORDER BY last_access").fetchall():
+            self.conn.execute("DELETE FROM responses WHERE key = ?", (row["key"],))
+            total -= row["size"]
+            if total <= self.max_bytes:
+                break
+
+    def stats(self):
+        """Session hit/miss counters plus what is stored"""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT COUNT(*) AS entries, COALESCE(SUM(size), 0) AS size, COALESCE(SUM(hits), 0) AS hits "
+                "FROM responses"
+            ).fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": row["entries"],
+                "bytes": row["size"], "total_hits": row["hits"]}
+
+    def clear(self):
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM responses")
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def get_response_cache():
+    """Process-wide response cache, or None when disabled"""
+    global _shared
+    if not config.RESPONSE_CACHE:
+        return None
+    with _shared_lock:
+        if _shared is None:
+            _shared = ResponseCache()
+        return _shared
@@ -0,0 +1,105 @@
+import math
+import re
+from collections import Counter
+
+WORD = re.compile(r"[A-Za-z0-9_]+")
+IDENTIFIER_PART = re.compile(r"[A-Z]?[a-z]+|[A-Z]+(?![a-z])|\d+")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were "
+    "what when where which who why will with how do does can you me my i".split()
+)
+
+# Standard BM25 parameters
+K1 = 1.2
+B = 0.75
+
+
+def tokenize(text):
+    """Lowercased words, plus the parts of snake_case / camelCase identifiers"""
+    tokens = []
+    for word in WORD.findall(text):
+        tokens.append(word.lower())
+        parts = [part.lower() for piece in word.split("_") for part in IDENTIFIER_PART.findall(piece)]
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return [token for token in tokens if len(token) > 1 and token not in STOPWORDS]
+
+
+class BM25Index:
+    """Incremental in-memory BM25 index over documents identified by string ids"""
+    def __init__(self):
+        # term -> {doc_id: term frequency}
+        self.postings = {}
+        self.doc_lengths = {}
+        # doc_id -> its terms, so removal only touches that document's postings
+        self.doc_terms = {}
+        self.total_length = 0
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    def __contains__(self, doc_id):
+        return doc_id in self.doc_lengths
+
+    def add(self, doc_id, text):
+        """Index a document (replacing any previous version)"""
+        self.add_counts(doc_id, Counter(tokenize(text)))
+
+    def add_counts(self, doc_id, counts):
+        """Index a document from precomputed {term: count}"""
+        if doc_id in self.doc_lengths:
+            self.remove(doc_id)
+        for term, count in counts.items():
+            self.postings.setdefault(term, {})[doc_id] = count
+        length = sum(counts.values())
+        self.doc_lengths[doc_id] = length
+        self.doc_terms[doc_id] = list(counts)
+        self.total_length += length
+
+    def remove(self, doc_id):
+        """Drop a document from the index"""
+        length = self.doc_lengths.pop(doc_id, None)
+        if length is None:
+            return
+        self.total_length -= length
+        for term in self.doc_terms.pop(doc_id, []):
+            docs = self.postings.get(term)
+            if docs is not None:
+                docs.pop(doc_id, None)
+                if not docs:
+                    del self.postings[term]
+
+    def search(self, query, k=5, where=None):
+        """Top-k (doc_id, score) pairs for a free-text query (only doc_ids passing `where`, if given)"""
+        if not self.doc_lengths:
+            return []
+        count = len(self.doc_lengths)
+        average_length = self.total_length / count or 1
+        scores = Counter()
+
+        for term in set(tokenize(query)):
+            docs = self.postings.get(term)
+            if not docs:
+                continue
+            idf = math.log(1 + (count - len(docs) + 0.5) / (len(docs) + 0.5))
+            for doc_id, frequency in docs.items():
+                if where is not None and not where(doc_id):
+                    continue
+                norm = frequency + K1 * (1 - B + B * self.doc_lengths[doc_id] / average_length)
+                scores[doc_id] += idf * frequency * (K1 + 1) / norm
+
+        return scores.most_common(k)
+
+    def to_dict(self):
+        return {"postings": self.postings, "doc_lengths": self.doc_lengths}
+
+    @classmethod
+    def from_dict(cls, data):
+        index = cls()
+        index.postings = data.get("postings", {})
+        index.doc_lengths = data.get("doc_lengths", {})
+        index.total_length = sum(index.doc_lengths.values())
+        for term, docs in index.postings.items():
+            for doc_id in docs:
+                index.doc_terms.setdefault(doc_id, []).append(term)
+        return index
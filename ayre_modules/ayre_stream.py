@@ -0,0 +1,34 @@
+from rich.live import Live
+from rich.markdown import Markdown
+from rich.panel import Panel
+
+from ayre_modules.ayre_repl import raise_if_cancelled
+
+
+class StreamingPanel:
+    """Panel whose Markdown body is re-parsed only when Live refreshes"""
+    def __init__(self, title, border_style):
+        self.title = title
+        self.border_style = border_style
+        self.text = ""
+
+    def __rich__(self):
+        return Panel(Markdown(self.text), title=self.title, border_style=self.border_style)
+
+
+def stream_to_panel(console, response, title="Ayre", border_style="magenta"):
+    """Render a streamed Gemini response live and return the full reply"""
+    panel = StreamingPanel(title, border_style)
+
+    with Live(panel, console=console, refresh_per_second=12):
+        for chunk in response:
+            # Ctrl-C on the REPL stops reading the stream (and closes the connection)
+            raise_if_cancelled()
+            try:
+                text = chunk.text
+            except ValueError:
+                # Chunks without text parts (finish reason, safety metadata)
+                continue
+            panel.text += text
+
+    return panel.text.strip()
@@ -0,0 +1,130 @@
+import hashlib
+import re
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from rich.markup import escape
+
+from ayre_modules import ayre_config as config
+from ayre_modules.ayre_chat_store import write_atomic
+from ayre_modules.ayre_context_manager import estimate_tokens
+from ayre_modules.ayre_gemini_client import get_gemini_client
+from ayre_modules.ayre_model_registry import get_model
+
+# Bump when the map prompt changes so old chunk summaries are not reused
+PROMPT_VERSION = "1"
+HEADING = re.compile(r"^#{1,6} ", re.MULTILINE)
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def split_blocks(text):
+    """Split text into sections at headings, then into paragraphs"""
+    blocks = []
+    for section in re.split(r"\n(?=#{1,6} )", text):
+        blocks.extend(block.strip() for block in re.split(r"\n\s*\n", section) if block.strip())
+    return blocks
+
+
+def split_oversized(block, max_tokens):
+    """Break a block larger than one chunk at sentence ends (hard cut as a last resort)"""
+    max_chars = max_tokens * 4
+    pieces = []
+    current = ""
+    for sentence in SENTENCE_END.split(block):
+        while len(sentence) > max_chars:
+            pieces.append(sentence[:max_chars])
+            sentence = sentence[max_chars:]
+        if current and len(current) + len(sentence) + 1 > max_chars:
+            pieces.append(current)
+            current = ""
+        current = f"{current} {sentence}".strip()
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def split_chunks(text, max_tokens=None):
+    """Pack paragraphs into chunks of at most max_tokens, starting a new chunk at headings"""
+    max_tokens = max_tokens or config.CHUNK_TOKENS
+    chunks = []
+    current = []
+    used = 0
+
+    for block in split_blocks(text):
+        pieces = split_oversized(block, max_tokens) if estimate_tokens(block) > max_tokens else [block]
+        for piece in pieces:
+            tokens = estimate_tokens(piece)
+            # A heading starts a new chunk once the current one is reasonably full
+            starts_section = HEADING.match(piece) and used > max_tokens // 2
+            if current and (used + tokens > max_tokens or starts_section):
+                chunks.append("\n\n".join(current))
+                current, used = [], 0
+            current.append(piece)
+            used += tokens
+
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+class ChunkSummarizer:
+    """Map step of map-reduce summarization: long text -> ordered chunk summaries
+
+    Chunk summaries are question-independent and cached on disk by content hash,
+    so follow-up questions about the same page only pay for the final (reduce) call.
+    """
+    def __init__(self, console, model_name=None, max_workers=None, cache_dir=None):
+        self.console = console
+        self.model_name = model_name or config.SUMMARY_MODEL
+        self.max_workers = max_workers or config.SUMMARY_WORKERS
+        self.cache_dir = Path(cache_dir or Path(config.CACHE_DIR) / "chunk_summaries")
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def cache_path(self, chunk):
+        key = hashlib.sha256(f"{PROMPT_VERSION}\0{self.model_name}\0{chunk}".encode("utf-8")).hexdigest()
+        return self.cache_dir / f"{key}.txt"
+
+    def summarize_chunk(self, chunk):
+        """Summary of one chunk (from cache when available)"""
+        path = self.cache_path(chunk)
+        if path.exists():
+            return path.read_text(encoding="utf-8")
+
+        prompt = (
+            "Summarize this section of a longer document for someone who will answer questions "
+            "about it later. Keep every concrete fact: names, numbers, dates, definitions, code, "
+            "commands, steps and conclusions. Use short bullet points, under 200 words.\n\n"
+            f"{chunk}"
+        )
+        summary = get_gemini_client().generate(get_model(self.model_name), prompt, call="page_summary").text.strip()
+        write_atomic(path, summary)
+        return summary
+
+    def condense(self, text, label="content"):
+        """Replace long text by its chunk summaries, in document order"""
+        chunks = split_chunks(text)
+        if len(chunks) <= 1:
+            return text
+
+        cached = sum(1 for chunk in chunks if self.cache_path(chunk).exists())
+        self.console.print(
+            f"[cyan]🧩 Summarizing {escape(label)} in {len(chunks)} chunks"
+            f"{f' ({cached} cached)' if cached else ''}...[/cyan]"
+        )
+
+        def summarize(chunk):
+            try:
+                return self.summarize_chunk(chunk)
+            except Exception as e:
+                self.console.print(f"[yellow]⚠️ Could not summarize a chunk, using its opening instead: {escape(str(e))}[/yellow]")
+                return chunk[:800]
+
+        # Repeated chunks (boilerplate sections) are summarized once
+        unique = list(dict.fromkeys(chunks))
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(unique)), thread_name_prefix="ayre-map") as pool:
+            by_chunk = dict(zip(unique, pool.map(summarize, unique)))
+        summaries = [by_chunk[chunk] for chunk in chunks]
+
+        return "\n\n".join(
+            f"[Part {index} of {len(summaries)}]\n{summary}" for index, summary in enumerate(summaries, 1)
+        )
@@ -0,0 +1,153 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+import google.generativeai as genai
+
+from ayre_modules import ayre_config as config
+from ayre_modules.ayre_chat_store import write_atomic
+
+# Treat a reference as stale this long before the server deletes it
+EXPIRY_MARGIN_SECONDS = 3600
+HASH_BLOCK_BYTES = 1024 * 1024
+
+
+class UploadCache:
+    """Content-hash -> uploaded file reference, persisted in ayre_cache/uploads.json
+
+    A (size, mtime) entry per local path avoids re-hashing unchanged files; path entries
+    are dropped along with the upload their content hash points at.
+    """
+    def __init__(self, path=None):
+        self.path = Path(path or Path(config.CACHE_DIR) / "uploads.json")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self.files = {}
+        self.paths = {}
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.files = data.get("files", {})
+            self.paths = data.get("paths", {})
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.files, self.paths = {}, {}
+        self.prune()
+
+    def save(self):
+        write_atomic(self.path, json.dumps({"files": self.files, "paths": self.paths}, indent=2))
+
+    def prune(self):
+        """Drop expired references and the path entries of content no longer uploaded"""
+        now = time.time()
+        self.files = {digest: entry for digest, entry in self.files.items() if entry["expires_at"] > now}
+        self.prune_paths()
+
+    def prune_paths(self):
+        self.paths = {path: known for path, known in self.paths.items() if known["sha256"] in self.files}
+
+    def digest(self, filepath):
+        """sha256 of a file, skipping the read when size and mtime are unchanged"""
+        key = str(Path(filepath).resolve())
+        stat = os.stat(key)
+        with self._lock:
+            known = self.paths.get(key)
+        if known and known["size"] == stat.st_size and known["mtime_ns"] == stat.st_mtime_ns:
+            return known["sha256"]
+
+        sha = hashlib.sha256()
+        with open(key, 'rb') as f:
+            for block in iter(lambda: f.read(HASH_BLOCK_BYTES), b''):
+                sha.update(block)
+        digest = sha.hexdigest()
+
+        with self._lock:
+            self.paths[key] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest}
+            self.save()
+        return digest
+
+    def get(self, digest):
+        """Still-valid file reference for this content, or None"""
+        with self._lock:
+            entry = self.files.get(digest)
+            if entry is None:
+                return None
+            if entry["expires_at"] - EXPIRY_MARGIN_SECONDS <= time.time():
+                del self.files[digest]
+                self.save()
+                return None
+        return genai.types.File({"name": entry["name"], "uri": entry["uri"], "mime_type": entry["mime_type"],
+                                 "display_name": entry["display_name"], "size_bytes": entry["size_bytes"]})
+
+    def put(self, digest, filepath, file):
+        """Remember an uploaded file"""
+        now = time.time()
+        try:
+            expires_at = file.expiration_time.timestamp()
+        except (AttributeError, TypeError, ValueError, OverflowError):
+            expires_at = 0
+        if expires_at <= now:
+            # Server lifetime of uploaded files
+            expires_at = now + config.UPLOAD_TTL_HOURS * 3600
+
+        with self._lock:
+            self.files[digest] = {
+                "name": file.name,
+                "uri": file.uri,
+                "mime_type": file.mime_type,
+                "display_name": file.display_name or Path(filepath).name,
+                "size_bytes": file.size_bytes or os.path.getsize(filepath),
+                "path": str(Path(filepath).resolve()),
+                "uploaded_at": now,
+                "expires_at": expires_at
+            }
+            self.save()
+
+    def entries(self):
+        """Cached uploads, newest first"""
+        with self._lock:
+            self.prune()
+            return sorted(self.files.items(), key=lambda item: item[1]["uploaded_at"], reverse=True)
+
+    def discard(self, name):
+        """Forget the upload with this remote name (deleted server-side); returns its entry or None"""
+        with self._lock:
+            for digest, entry in self.files.items():
+                if entry["name"] == name:
+                    del self.files[digest]
+                    self.prune_paths()
+                    self.save()
+                    return entry
+        return None
+
+    def evict(self, digests):
+        """Forget uploads and delete them from the server; returns the evicted entries"""
+        with self._lock:
+            evicted = [self.files.pop(digest) for digest in digests if digest in self.files]
+            self.prune_paths()
+            self.save()
+        for entry in evicted:
+            try:
+                genai.delete_file(entry["name"])
+            except Exception:
+                # Already gone server-side
+                pass
+        return evicted
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def get_upload_cache():
+    """Process-wide upload cache"""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = UploadCache()
+        return _shared
@@ -1,198 +1,403 @@
-import requests
-from bs4 import BeautifulSoup
-import re
-from urllib.parse import urljoin, urlparse
-from rich.console import Console
-from rich.panel import Panel
-from rich.markdown import Markdown
-
-class WebContentHandler:
-    def __init__(self, console):
-        self.console = console
-        self.headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-    
-    def scrape_url(self, url):
-        """Scrape content from a URL"""
-        try:
-            # Clean up URL
-            if not url.startswith(('http://', 'https://')):
-                url = 'https://' + url
-            
-            self.console.print(f"[cyan]🌐 Fetching content from: {url}[/cyan]")
-            
-            # Make request
-            response = requests.get(url, headers=self.headers, timeout=10)
-            response.raise_for_status()
-            
-            # Parse content
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Extract metadata
-            title = self.extract_title(soup)
-            description = self.extract_description(soup)
-            
-            # Extract main content
-            content = self.extract_main_content(soup)
-            
-            # Extract links
-            links = self.extract_links(soup, url)
-            
-            return {
-                'url': url,
-                'title': title,
-                'description': description,
-                'content': content,
-                'links': links,
-                'status': 'success'
-            }
-            
-        except requests.exceptions.Timeout:
-            return {'status': 'error', 'message': 'Request timed out'}
-        except requests.exceptions.RequestException as e:
-            return {'status': 'error', 'message': f'Network error: {str(e)}'}
-        except Exception as e:
-            return {'status': 'error', 'message': f'Parsing error: {str(e)}'}
-    
-    def extract_title(self, soup):
-        """Extract page title"""
-        title_tag = soup.find('title')
-        if title_tag:
-            return title_tag.get_text().strip()
-        
-        # Try h1 as fallback
-        h1_tag = soup.find('h1')
-        if h1_tag:
-            return h1_tag.get_text().strip()
-        
-        return "No title found"
-    
-    def extract_description(self, soup):
-        """Extract page description"""
-        # Try meta description
-        meta_desc = soup.find('meta', attrs={'name': 'description'})
-        if meta_desc and meta_desc.get('content'):
-            return meta_desc['content'].strip()
-        
-        # Try Open Graph description
-        og_desc = soup.find('meta', attrs={'property': 'og:description'})
-        if og_desc and og_desc.get('content'):
-            return og_desc['content'].strip()
-        
-        # Try first paragraph
-        first_p = soup.find('p')
-        if first_p:
-            text = first_p.get_text().strip()
-            return text[:200] + "..." if len(text) > 200 else text
-        
-        return "No description found"
-    
-    def extract_main_content(self, soup):
-        """Extract main text content from page"""
-        # Remove script and style elements
-        for script in soup(["script", "style", "nav", "header", "footer", "aside"]):
-            script.decompose()
-        
-        # Try to find main content areas
-        main_selectors = [
-            'main', 'article', '.content', '#content', 
-            '.post-content', '.entry-content', '.article-content'
-        ]
-        
-        main_content = None
-        for selector in main_selectors:
-            main_content = soup.select_one(selector)
-            if main_content:
-                break
-        
-        # If no main content found, use body
-        if not main_content:
-            main_content = soup.find('body')
-        
-        if main_content:
-            # Extract text and clean it up
-            text = main_content.get_text()
-            # Clean up whitespace
-            text = re.sub(r'\s+', ' ', text).strip()
-            # Limit length
-            if len(text) > 5000:
-                text = text[:5000] + "...\n[Content truncated for analysis]"
-            return text
-        
-        return "No main content found"
-    
-    def extract_links(self, soup, base_url):
-        """Extract important links from the page"""
-        links = []
-        for link in soup.find_all('a', href=True)[:10]:  # Limit to first 10 links
-            href = link['href']
-            text = link.get_text().strip()
-            
-            if href and text:
-                # Convert relative URLs to absolute
-                full_url = urljoin(base_url, href)
-                links.append({'url': full_url, 'text': text})
-        
-        return links
-    
-    def format_web_content(self, data):
-        """Format scraped content for display and analysis"""
-        if data['status'] == 'error':
-            return f"❌ Failed to scrape content: {data['message']}"
-        
-        formatted = f"""🌐 **Web Page Analysis**
-
-**URL:** {data['url']}
-**Title:** {data['title']}
-**Description:** {data['description']}
-
-**Main Content:**
-{data['content']}
-"""
-        
-        if data['links']:
-            formatted += "\n**Important Links:**\n"
-            for i, link in enumerate(data['links'][:5], 1):
-                formatted += f"{i}. [{link['text']}]({link['url']})\n"
-        
-        return formatted
-    
-    def analyze_url_with_ai(self, url, user_question, message_history, gemini_model):
-        """Scrape URL and analyze with AI"""
-        # Scrape the content
-        scraped_data = self.scrape_url(url)
-        
-        if scraped_data['status'] == 'error':
-            self.console.print(f"[red]❌ Failed to analyze URL: {scraped_data['message']}[/red]")
-            return None
-        
-        # Format content for AI
-        web_content = self.format_web_content(scraped_data)
-        
-        # Display scraped content summary
-        self.console.print(Panel(
-            f"[green]✅ Successfully scraped: {scraped_data['title']}[/green]\n"
-            f"Content length: {len(scraped_data['content'])} characters",
-            title="Web Content Scraped",
-            border_style="green"
-        ))
-        
-        # Create AI prompt with web content
-        if user_question:
-            ai_prompt = f"Based on the following web page content, please answer this question: {user_question}\n\n{web_content}"
-        else:
-            ai_prompt = f"Please analyze and summarize the following web page content:\n\n{web_content}"
-        
-        # Add to message history and get AI response
-        message_history.append({"role": "user", "content": ai_prompt})
-        
-        try:
-            response = gemini_model.generate_content(ai_prompt)
-            reply = response.text.strip()
-            message_history.append({"role": "assistant", "content": reply})
-            return reply
-        except Exception as e:
-            error_msg = f"Error analyzing web content: {str(e)}"
-            self.console.print(f"[red]❌ {error_msg}[/red]")
-            return error_msg
\ No newline at end of file
+import codecs
+import requests
+from bs4 import BeautifulSoup
+import re
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin, urlparse
+from rich.console import Console
+from rich.markup import escape
+from rich.panel import Panel
+from rich.markdown import Markdown
+from rich.progress import Progress, SpinnerColumn, TextColumn
+
+from ayre_modules import ayre_config as config
+from ayre_modules.ayre_extract import extract_page, PageParser
+from ayre_modules.ayre_stream import stream_to_panel
+from ayre_modules.ayre_gemini_client import get_gemini_client
+from ayre_modules.ayre_summarizer import ChunkSummarizer
+from ayre_modules.ayre_http_cache import get_http_cache
+from ayre_modules.ayre_http_client import get_http_client
+from ayre_modules.ayre_response_cache import get_response_cache
+
+MAX_CONTENT_CHARS = 5000
+READ_CHUNK_BYTES = 64 * 1024
+PAGE_TYPES = ("text/html", "application/xhtml+xml", "text/plain")
+META_CHARSET = re.compile(rb'<meta[^>]+charset=["\']?([\w.:-]+)', re.IGNORECASE)
+
+class WebContentHandler:
+    def __init__(self, console, stream=False, cache=None):
+        self.console = console
+        self.stream = stream
+        self.cache = cache or get_http_cache()
+        self.client = get_http_client()
+        self.summarizer = ChunkSummarizer(console)
+    
+    def scrape_url(self, url, quiet=False):
+        """Scrape content from a URL"""
+        try:
+            # Clean up URL
+            if not url.startswith(('http://', 'https://')):
+                url = 'https://' + url
+            
+            cached = self.cache.get(url) if self.cache else None
+            if cached and cached["fresh"]:
+                if not quiet:
+                    self.console.print(f"[dim]⚡ Using cached copy of: {url}[/dim]")
+                return cached["result"]
+            
+            if not quiet:
+                self.console.print(f"[cyan]🌐 Fetching content from: {url}[/cyan]")
+            
+            # Make request (conditional if we hold a stale copy); the body is streamed
+            headers = self.cache.conditional_headers(cached) if cached else None
+            with self.client.get(url, headers=headers, stream=True) as response:
+                if cached and response.status_code == 304:
+                    self.cache.revalidated(cached, response.headers)
+                    if not quiet:
+                        self.console.print("[dim]⚡ Page unchanged since last fetch, using cached copy[/dim]")
+                    return cached["result"]
+                response.raise_for_status()
+                
+                rejection = self.check_page_headers(response)
+                if rejection:
+                    return {'status': 'error', 'message': rejection}
+                
+                body, result = self.read_page(response, url)
+            
+            if self.cache:
+                self.cache.put(url, response.headers, body, result)
+            return result
+            
+        except requests.exceptions.Timeout:
+            return {'status': 'error', 'message': 'Request timed out'}
+        except requests.exceptions.RequestException as e:
+            return {'status': 'error', 'message': f'Network error: {str(e)}'}
+        except Exception as e:
+            return {'status': 'error', 'message': f'Parsing error: {str(e)}'}
+    
+    def check_page_headers(self, response):
+        """Reason to skip a response before downloading it, or None"""
+        mime = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+        if mime and mime not in PAGE_TYPES:
+            length = response.headers.get('Content-Length')
+            size = f", {int(length) / (1024 * 1024):.1f} MB" if length and length.isdigit() else ""
+            return f"Not a web page ({mime}{size}). Download it and use 'upload <file>' to analyze it"
+        return None
+    
+    def detect_encoding(self, response, head):
+        """Charset from BOM, Content-Type or <meta>, defaulting to UTF-8"""
+        if head.startswith(codecs.BOM_UTF8):
+            return 'utf-8-sig'
+        if head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+            return 'utf-16'
+        
+        candidates = []
+        content_type = response.headers.get('Content-Type', '')
+        if 'charset=' in content_type.lower():
+            candidates.append(content_type.lower().split('charset=', 1)[1].split(';')[0].strip(' "\''))
+        match = META_CHARSET.search(head[:4096])
+        if match:
+            candidates.append(match.group(1).decode('ascii', 'ignore'))
+        
+        for name in candidates:
+            try:
+                return codecs.lookup(name).name
+            except LookupError:
+                continue
+        return 'utf-8'
+    
+    def read_page(self, response, url):
+        """Stream the body within the byte ceiling, parsing as it arrives; returns (body, result)"""
+        page_parser = None if config.HTML_PARSER == "bs4" else PageParser(url, config.HTML_PARSER)
+        decoder = None
+        body = bytearray()
+        
+        for chunk in response.iter_content(chunk_size=READ_CHUNK_BYTES):
+            body += chunk
+            if page_parser:
+                if decoder is None:
+                    decoder = codecs.getincrementaldecoder(self.detect_encoding(response, bytes(body)))(errors='replace')
+                page_parser.feed(decoder.decode(chunk))
+                if page_parser.text_chars >= config.WEB_TEXT_BUDGET:
+                    # Enough text for the analysis; skip the rest of the page
+                    break
+            if len(body) >= config.WEB_MAX_BYTES:
+                break
+        
+        body = bytes(body)
+        if page_parser is None:
+            return body, self.parse_page(body, url)
+        if decoder:
+            page_parser.feed(decoder.decode(b'', final=True))
+        return body, self.finish_page(page_parser.close(), url)
+    
+    def scrape_many(self, urls, max_workers=None):
+        """Scrape several URLs concurrently; results come back in input order"""
+        max_workers = min(max_workers or config.WEB_FETCH_WORKERS, len(urls))
+        
+        with Progress(SpinnerColumn(), TextColumn("{task.description}"), console=self.console) as progress:
+            tasks = [progress.add_task(f"[cyan]🌐 {url}[/cyan]") for url in urls]
+            
+            def fetch(index):
+                result = self.scrape_url(urls[index], quiet=True)
+                if result['status'] == 'success':
+                    label = f"[green]✅ {urls[index]}[/green] [dim]({len(result['content'])} chars)[/dim]"
+                else:
+                    label = f"[red]❌ {urls[index]}: {result['message']}[/red]"
+                progress.update(tasks[index], description=label, completed=1, total=1)
+                return result
+            
+            with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ayre-fetch") as pool:
+                return list(pool.map(fetch, range(len(urls))))
+    
+    def parse_page(self, content, url):
+        """Extract title, description, main text and links from page HTML"""
+        if config.HTML_PARSER == "bs4":
+            return self.parse_page_bs4(content, url)
+        
+        return self.finish_page(extract_page(content, url, config.HTML_PARSER), url)
+    
+    def finish_page(self, page, url):
+        """Mark an extracted page as successful"""
+        page['url'] = url
+        page['status'] = 'success'
+        return page
+    
+    def parse_page_bs4(self, content, url):
+        """Original BeautifulSoup extractor (one tree walk per field)"""
+        soup = BeautifulSoup(content, 'html.parser')
+        
+        # Extract metadata
+        title = self.extract_title(soup)
+        description = self.extract_description(soup)
+        
+        # Every outgoing link (before nav/header/footer are stripped) for crawling
+        outlinks = self.extract_outlinks(soup, url)
+        
+        # Extract main content
+        main_content = self.extract_main_content(soup)
+        
+        # Extract links
+        links = self.extract_links(soup, url)
+        
+        return {
+            'url': url,
+            'title': title,
+            'description': description,
+            'content': main_content,
+            'links': links,
+            'outlinks': outlinks,
+            'status': 'success'
+        }
+    
+    def extract_title(self, soup):
+        """Extract page title"""
+        title_tag = soup.find('title')
+        if title_tag:
+            return title_tag.get_text().strip()
+        
+        # Try h1 as fallback
+        h1_tag = soup.find('h1')
+        if h1_tag:
+            return h1_tag.get_text().strip()
+        
+        return "No title found"
+    
+    def extract_description(self, soup):
+        """Extract page description"""
+        # Try meta description
+        meta_desc = soup.find('meta', attrs={'name': 'description'})
+        if meta_desc and meta_desc.get('content'):
+            return meta_desc['content'].strip()
+        
+        # Try Open Graph description
+        og_desc = soup.find('meta', attrs={'property': 'og:description'})
+        if og_desc and og_desc.get('content'):
+            return og_desc['content'].strip()
+        
+        # Try first paragraph
+        first_p = soup.find('p')
+        if first_p:
+            text = first_p.get_text().strip()
+            return text[:200] + "..." if len(text) > 200 else text
+        
+        return "No description found"
+    
+    def extract_main_content(self, soup):
+        """Extract main text content from page"""
+        # Remove script and style elements
+        for script in soup(["script", "style", "nav", "header", "footer", "aside"]):
+            script.decompose()
+        
+        # Try to find main content areas
+        main_selectors = [
+            'main', 'article', '.content', '#content', 
+            '.post-content', '.entry-content', '.article-content'
+        ]
+        
+        main_content = None
+        for selector in main_selectors:
+            main_content = soup.select_one(selector)
+            if main_content:
+                break
+        
+        # If no main content found, use body
+        if not main_content:
+            main_content = soup.find('body')
+        
+        if main_content:
+            # Extract text and clean it up
+            text = main_content.get_text()
+            # Clean up whitespace
+            text = re.sub(r'\s+', ' ', text).strip()
+            return self.truncate_content(text)
+        
+        return "No main content found"
+    
+    def truncate_content(self, text):
+        """Limit page text to the analysis budget"""
+        if len(text) > MAX_CONTENT_CHARS:
+            text = text[:MAX_CONTENT_CHARS] + "...\n[Content truncated for analysis]"
+        return text
+    
+    def extract_links(self, soup, base_url):
+        """Extract important links from the page"""
+        links = []
+        for link in soup.find_all('a', href=True)[:10]:  # Limit to first 10 links
+            href = link['href']
+            text = link.get_text().strip()
+            
+            if href and text:
+                # Convert relative URLs to absolute
+                full_url = urljoin(base_url, href)
+                links.append({'url': full_url, 'text': text})
+        
+        return links
+    
+    def extract_outlinks(self, soup, base_url):
+        """All distinct absolute http(s) link targets, fragments removed"""
+        outlinks = {}
+        for link in soup.find_all('a', href=True):
+            full_url = urljoin(base_url, link['href'].strip()).split('#', 1)[0]
+            if full_url.startswith(('http://', 'https://')):
+                outlinks[full_url] = None
+        return list(outlinks)
+    
+    def condense_page(self, page):
+        """Page with long content replaced by its chunk summaries (map step)"""
+        condensed = self.summarizer.condense(page['content'], page['title'])
+        if condensed is page['content']:
+            return page
+        return dict(page, content=f"(Condensed section by section from {len(page['content'])} characters)\n\n{condensed}")
+    
+    def format_web_content(self, data):
+        """Format scraped content for display and analysis"""
+        if data['status'] == 'error':
+            return f"❌ Failed to scrape content: {data['message']}"
+        
+        formatted = f"""🌐 **Web Page Analysis**
+
+**URL:** {data['url']}
+**Title:** {data['title']}
+**Description:** {data['description']}
+
+**Main Content:**
+{data['content']}
+"""
+        
+        if data['links']:
+            formatted += "\n**Important Links:**\n"
+            for i, link in enumerate(data['links'][:5], 1):
+                formatted += f"{i}. [{link['text']}]({link['url']})\n"
+        
+        return formatted
+    
+    def generate_analysis(self, ai_prompt, gemini_model, fresh=False):
+        """Model reply to an analysis prompt (memoized when the response cache is on)"""
+        cache = get_response_cache()
+        key = cache.make_key(gemini_model.model_name, ai_prompt) if cache else None
+        if key and not fresh:
+            reply = cache.get(key)
+            if reply is not None:
+                # Non-streamed replies are rendered by the caller
+                if self.stream:
+                    self.console.print(Panel(Markdown(reply), title="Web Content Analysis (cached)", border_style="cyan"))
+                return reply
+
+        if self.stream:
+            response = get_gemini_client().generate(gemini_model, ai_prompt, stream=True, call="web_analysis")
+            reply = stream_to_panel(self.console, response, title="Web Content Analysis", border_style="cyan")
+        else:
+            response = get_gemini_client().generate(gemini_model, ai_prompt, call="web_analysis")
+            reply = response.text.strip()
+
+        if key and reply:
+            cache.put(key, gemini_model.model_name, reply)
+        return reply
+
+    def analyze_url_with_ai(self, url, user_question, message_history, gemini_model, fresh=False):
+        """Scrape URL and analyze with AI"""
+        # Scrape the content
+        scraped_data = self.scrape_url(url)
+        
+        if scraped_data['status'] == 'error':
+            self.console.print(f"[red]❌ Failed to analyze URL: {scraped_data['message']}[/red]")
+            return None
+        
+        # Display scraped content summary
+        self.console.print(Panel(
+            f"[green]✅ Successfully scraped: {scraped_data['title']}[/green]\n"
+            f"Content length: {len(scraped_data['content'])} characters",
+            title="Web Content Scraped",
+            border_style="green"
+        ))
+        
+        # Format content for AI (long pages are summarized chunk by chunk first)
+        web_content = self.format_web_content(self.condense_page(scraped_data))
+        
+        # Create AI prompt with web content
+        if user_question:
+            ai_prompt = f"Based on the following web page content, please answer this question: {user_question}\n\n{web_content}"
+        else:
+            ai_prompt = f"Please analyze and summarize the following web page content:\n\n{web_content}"
+        
+        # Add to message history and get AI response
+        message_history.append({"role": "user", "content": ai_prompt})
+        
+        try:
+            reply = self.generate_analysis(ai_prompt, gemini_model, fresh)
+            message_history.append({"role": "assistant", "content": reply})
+            return reply
+        except Exception as e:
+            error_msg = f"Error analyzing web content: {str(e)}"
+            self.console.print(f"[red]❌ {escape(error_msg)}[/red]")
+            return error_msg
+    
+    def analyze_urls_with_ai(self, urls, user_question, message_history, gemini_model, fresh=False):
+        """Scrape several URLs concurrently and analyze them in one combined prompt"""
+        urls = [url if url.startswith(('http://', 'https://')) else 'https://' + url for url in urls]
+        pages = [page for page in self.scrape_many(urls) if page['status'] == 'success']
+        
+        if not pages:
+            self.console.print("[red]❌ Failed to analyze URLs: no page could be fetched[/red]")
+            return None
+        
+        web_content = "\n\n---\n\n".join(
+            f"**Page {i}:**\n{self.format_web_content(self.condense_page(page))}" for i, page in enumerate(pages, 1)
+        )
+        
+        if user_question:
+            ai_prompt = f"Based on the following {len(pages)} web pages, please answer this question: {user_question}\n\n{web_content}"
+        else:
+            ai_prompt = f"Please analyze, summarize and compare the following {len(pages)} web pages:\n\n{web_content}"
+        
+        message_history.append({"role": "user", "content": ai_prompt})
+        
+        try:
+            reply = self.generate_analysis(ai_prompt, gemini_model, fresh)
+            message_history.append({"role": "assistant", "content": reply})
+            return reply
+        except Exception as e:
+            error_msg = f"Error analyzing web content: {str(e)}"
+            self.console.print(f"[red]❌ {escape(error_msg)}[/red]")
+            return error_msg
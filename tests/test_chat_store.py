@@ -0,0 +1,49 @@
+import json
+
+from ayre_modules import ayre_chat_store
+from ayre_modules.ayre_chat_store import JournalChatStore, SEGMENT_MESSAGES, EAGER_MESSAGES
+
+
+def write_legacy_chat(chats_dir, name, count):
+    messages = [{"role": "system", "content": "persona"}] + [
+        {"role": "user" if i % 2 else "assistant", "content": f"message {i}"} for i in range(1, count)
+    ]
+    with open(chats_dir / f"{name}.json", 'w', encoding='utf-8') as f:
+        json.dump({"created": "2024-01-01T00:00:00", "message_history": messages}, f)
+    return messages
+
+
+def test_migrated_large_chat_loads_only_the_last_segment(tmp_path, monkeypatch):
+    count = 2 * SEGMENT_MESSAGES + 1
+    messages = write_legacy_chat(tmp_path, "big", count)
+    store = JournalChatStore(tmp_path)
+    assert store.migrate_legacy() == ["big"]
+
+    meta = store.read_meta("big")
+    assert [segment["count"] for segment in meta["segments"]] == [SEGMENT_MESSAGES, SEGMENT_MESSAGES]
+    assert meta["tail_count"] == count % SEGMENT_MESSAGES
+    assert store.total_messages("big") == count
+
+    read = []
+    original = JournalChatStore.read_segment
+    monkeypatch.setattr(JournalChatStore, "read_segment",
+                        lambda self, name, segment: read.append(segment["file"]) or original(self, name, segment))
+
+    meta, loaded, elided = store.load("big", min_messages=EAGER_MESSAGES)
+    assert read == [meta["segments"][-1]["file"]]
+    assert elided == SEGMENT_MESSAGES - 1
+    assert loaded[0] == messages[0]
+    assert loaded[1:] == messages[SEGMENT_MESSAGES:]
+
+
+def test_sealing_keeps_segments_at_the_size_limit(tmp_path, monkeypatch):
+    monkeypatch.setattr(ayre_chat_store, "SEGMENT_MESSAGES", 4)
+    store = JournalChatStore(tmp_path)
+    store.create("chat", {"name": "chat"}, [{"role": "system", "content": "persona"}])
+    for i in range(1, 11):
+        store.append("chat", store.read_meta("chat"), [{"role": "user", "content": f"message {i}"}], i)
+
+    meta = store.read_meta("chat")
+    assert all(segment["count"] == 4 for segment in meta["segments"])
+    _, loaded = store.load_all("chat")
+    assert [msg["content"] for msg in loaded[1:]] == [f"message {i}" for i in range(1, 11)]